@@ -0,0 +1,91 @@
+"""
+Benchmark raw SCADA ingestion: legacy path vs. schema-driven fast path.
+
+Each variant runs in a fresh subprocess so peak RSS is measured in
+isolation. Usage:
+    python scripts/bench_ingest.py [data/raw/44.csv] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+VARIANTS = ["legacy", "schema_c", "schema_fast"]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant, raw_path):
+    import schema_registry as sr
+
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    if variant == "legacy":
+        df = sr.legacy_read_raw(raw_path)
+    else:
+        schema = sr.get_schema(raw_path)
+        engine = "c" if variant == "schema_c" else sr.FAST_ENGINE
+        df = sr.read_raw(raw_path, schema, engine=engine)
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "variant": variant,
+        "parse_s": round(elapsed, 3),
+        "rows": int(df.shape[0]),
+        "columns": int(df.shape[1]),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 2 ** 20, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "import_rss_mb": round(baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("raw_path", nargs="?", default="data/raw/44.csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--run", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_variant(args.run, args.raw_path)))
+        return
+
+    # warm the schema cache so the fast path measures a cached load
+    import schema_registry as sr
+    sr.get_schema(args.raw_path)
+
+    results = {}
+    for variant in VARIANTS:
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(
+                [sys.executable, __file__, args.raw_path, "--run", variant],
+                check=True, capture_output=True, text=True,
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r["parse_s"])
+        best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+        results[variant] = best
+
+    legacy = results["legacy"]
+    print(f"Raw file: {args.raw_path} ({os.path.getsize(args.raw_path) / 2 ** 20:.1f} MB), "
+          f"best of {args.repeat}")
+    print(f"{'variant':<12} {'parse_s':>8} {'speedup':>8} {'rows':>9} {'cols':>5} "
+          f"{'frame_mb':>9} {'peak_rss_mb':>12}")
+    for variant, r in results.items():
+        speedup = legacy["parse_s"] / max(r["parse_s"], 1e-9)
+        print(f"{variant:<12} {r['parse_s']:>8.3f} {speedup:>7.1f}x {r['rows']:>9} {r['columns']:>5} "
+              f"{r['frame_mb']:>9.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
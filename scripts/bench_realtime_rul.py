@@ -0,0 +1,62 @@
+"""
+Benchmark the real-time RUL computation: legacy per-sample loops vs. the
+vectorized rul_engine, on a synthetic degrading health index. Usage:
+    python scripts/bench_realtime_rul.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import rul_engine as re  # noqa: E402
+
+
+def synthetic_health(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, n)
+    health = 1.0 - 0.9 * t ** 2 + rng.normal(0.0, 0.01, n)
+    health[: n // 5] = 1.0 - 0.001 * t[: n // 5]  # flat start → carry-forward decay branch
+    return pd.Series(np.clip(health, 0.05, 1.0))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    health_smooth = synthetic_health(args.rows).ewm(span=re.SMOOTH_SPAN, adjust=False).mean()
+    dt = 1 / 6  # 10-minute samples
+
+    legacy_slope, t_legacy_slope = timed(re.legacy_rolling_slope, health_smooth.values)
+    slope, t_slope = timed(re.rolling_slope, health_smooth.values)
+
+    slope_series = pd.Series(slope / dt).fillna(0.0)
+    slope_series[slope_series > 0] = 0.0
+    legacy_rul, t_legacy_rul = timed(re.legacy_rul, health_smooth, slope_series, dt)
+    rul, t_rul = timed(re.rul_from_slope, health_smooth.values, slope_series.values, dt)
+
+    print(f"Rows: {args.rows}")
+    print(f"{'step':<14} {'legacy_s':>10} {'vectorized_s':>13} {'speedup':>9} {'max_abs_diff':>13}")
+    for name, tl, tv, a, b in [
+        ("rolling_slope", t_legacy_slope, t_slope, legacy_slope, slope),
+        ("rul", t_legacy_rul, t_rul, legacy_rul, rul),
+        ("total", t_legacy_slope + t_legacy_rul, t_slope + t_rul, None, None),
+    ]:
+        diff = f"{np.nanmax(np.abs(a - b)):>13.2e}" if a is not None else f"{'':>13}"
+        print(f"{name:<14} {tl:>10.3f} {tv:>13.4f} {tl / max(tv, 1e-9):>8.0f}x {diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark RUL LSTM inference: NumPy engine vs. keras.models.load_model.
+
+Each engine runs in a fresh subprocess, so startup (imports + model load)
+is measured cold. Throughput is windows/sec over sliding windows of a
+random series shaped like the model input; "numpy_series" is the NumPy
+engine's predict_windows, which shares the LSTM input projection between
+overlapping windows. Outputs are checked against Keras. Usage:
+    python scripts/bench_rul_engine.py [models/rul_lstm_model.h5] [--windows 4096]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+ENGINES = ["numpy", "numpy_series", "keras"]
+
+
+def _input_shape(model_path):
+    """(seq_len, n_features) from the model config of a Keras .h5."""
+    import h5py
+
+    with h5py.File(model_path, "r") as f:
+        layers = json.loads(f.attrs["model_config"])["config"]["layers"]
+    return tuple(layers[0]["config"]["batch_shape"][1:])
+
+
+def run_engine(engine, model_path, series_path, seq_len, out_path):
+    t0 = time.perf_counter()
+    import numpy as np
+    if engine == "keras":
+        from tensorflow.keras.models import load_model
+        model = load_model(model_path, compile=False)
+    else:
+        import numpy_engine
+        model = numpy_engine.load_model(model_path)
+    startup = time.perf_counter() - t0
+
+    series = np.load(series_path)
+    windows = np.lib.stride_tricks.sliding_window_view(series, seq_len, axis=0).transpose(0, 2, 1)
+    model.predict(windows[:8], verbose=0)  # warm-up
+
+    t0 = time.perf_counter()
+    if engine == "numpy_series":
+        preds = model.predict_windows(series, seq_len)
+    else:
+        preds = model.predict(np.ascontiguousarray(windows), verbose=0)
+    elapsed = time.perf_counter() - t0
+    np.save(out_path, np.asarray(preds).ravel())
+
+    return {
+        "engine": engine,
+        "startup_s": round(startup, 3),
+        "predict_s": round(elapsed, 3),
+        "windows_per_sec": round(len(windows) / max(elapsed, 1e-9), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("model_path", nargs="?", default="models/rul_lstm_model.h5")
+    parser.add_argument("--windows", type=int, default=4096)
+    parser.add_argument("--run", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--series", help=argparse.SUPPRESS)
+    parser.add_argument("--seq-len", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_engine(args.run, args.model_path, args.series, args.seq_len, args.out)))
+        return
+
+    import numpy as np
+    import numpy_engine
+
+    # export up front so the NumPy startup measures a plain .npz load
+    numpy_engine.load_model(args.model_path)
+    seq_len, n_features = _input_shape(args.model_path)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        series = os.path.join(tmp, "series.npy")
+        rng = np.random.default_rng(0)
+        np.save(series, rng.random((args.windows + seq_len - 1, n_features), dtype=np.float32))
+
+        for engine in ENGINES:
+            out = os.path.join(tmp, f"{engine}.npy")
+            proc = subprocess.run(
+                [sys.executable, __file__, args.model_path, "--run", engine, "--series", series,
+                 "--seq-len", str(seq_len), "--out", out],
+                check=True, capture_output=True, text=True,
+            )
+            results[engine] = json.loads(proc.stdout.strip().splitlines()[-1])
+            results[engine]["preds"] = np.load(out)
+
+    keras = results["keras"]
+    print(f"Model: {args.model_path}, {args.windows} windows of {seq_len}x{n_features}")
+    print(f"{'engine':<13} {'startup_s':>10} {'predict_s':>10} {'windows/sec':>12} {'max_abs_diff':>13}")
+    for engine, r in results.items():
+        diff = float(np.max(np.abs(r["preds"] - keras["preds"])))
+        print(f"{engine:<13} {r['startup_s']:>10.3f} {r['predict_s']:>10.3f} "
+              f"{r['windows_per_sec']:>12.1f} {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,16 @@ import numpy as np
 import json
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from sensor_store import load_processed
 
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-df = pd.read_csv("data/processed/44_processed.csv", index_col=0)
+df = load_processed()
 
 # -----------------------------
 # FEATURE EXTRACTION PER SENSOR
@@ -1,54 +1,67 @@
 import pandas as pd
-import numpy as np
 import os
 
+from health_index import STATE_PATH, HealthIndexState
+
 ANOM_PATH = "data/processed/anomaly_with_root_cause.csv"
 OUT_PATH = "data/processed/health_index.csv"
 
-df = pd.read_csv(ANOM_PATH)
-
-# Timestamp normalize
-if "time_stamp" in df.columns:
-    df["time_stamp"] = pd.to_datetime(df["time_stamp"])
-elif "timestamp" in df.columns:
-    df = df.rename(columns={"timestamp": "time_stamp"})
-    df["time_stamp"] = pd.to_datetime(df["time_stamp"])
-else:
-    raise ValueError("❌ No timestamp column found")
-
-# Select anomaly intensity
-if "anomaly_score" in df.columns:
-    raw = df["anomaly_score"].astype(float)
-elif "reconstruction_error" in df.columns:
-    raw = df["reconstruction_error"].astype(float)
-elif "is_anomaly" in df.columns:
-    raw = df["is_anomaly"].astype(float)
-else:
+
+def normalize_timestamp(df):
+    if "time_stamp" in df.columns:
+        df["time_stamp"] = pd.to_datetime(df["time_stamp"])
+    elif "timestamp" in df.columns:
+        df = df.rename(columns={"timestamp": "time_stamp"})
+        df["time_stamp"] = pd.to_datetime(df["time_stamp"])
+    else:
+        raise ValueError("❌ No timestamp column found")
+    return df
+
+
+def anomaly_intensity(df):
+    if "anomaly_score" in df.columns:
+        return df["anomaly_score"].astype(float)
+    if "reconstruction_error" in df.columns:
+        return df["reconstruction_error"].astype(float)
+    if "is_anomaly" in df.columns:
+        return df["is_anomaly"].astype(float)
     raise ValueError("❌ No anomaly intensity column found")
 
-# Smooth
-raw_smooth = raw.ewm(span=60).mean()
 
-# ✅ ROLLING BASELINE NORMALIZATION (KEY FIX)
-rolling_min = raw_smooth.rolling(500, min_periods=50).min()
-rolling_max = raw_smooth.rolling(500, min_periods=50).max()
+def build_health_index(anom_df, state=None):
+    """
+    health_index.csv frame (time_stamp, health_index) for the anomaly rows.
+    Smooth → rolling baseline normalization → running minimum, maintained
+    online in `state` (a fresh HealthIndexState by default), which is
+    returned alongside for checkpointing.
+    """
+    df = normalize_timestamp(anom_df.copy())
+    raw = anomaly_intensity(df)
+
+    state = state or HealthIndexState()
+    health = pd.Series(state.update_many(raw.values), index=raw.index)
+    health = health.bfill()
+
+    df_out = pd.DataFrame({
+        "time_stamp": df["time_stamp"],
+        "health_index": health
+    })
+    return df_out, state
+
 
-norm = (raw_smooth - rolling_min) / (rolling_max - rolling_min + 1e-6)
-norm = norm.clip(0, 1)
+def main(anom_path=ANOM_PATH, out_path=OUT_PATH, state_path=STATE_PATH):
+    df_out, state = build_health_index(pd.read_csv(anom_path))
+    state.save(state_path)
 
-# Health index
-health = 1.0 - norm
-health = np.minimum.accumulate(health.fillna(method="bfill"))
-health = health.clip(0.05, 1.0)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    df_out.to_csv(out_path, index=False)
 
-df_out = pd.DataFrame({
-    "time_stamp": df["time_stamp"],
-    "health_index": health
-})
+    print("✅ Robust Health Index generated")
+    print("📁 Saved to:", out_path)
+    print("📁 State checkpoint:", state_path)
+    print("✅ Health range:", df_out["health_index"].min(), "to", df_out["health_index"].max())
+    return df_out
 
-os.makedirs("data/processed", exist_ok=True)
-df_out.to_csv(OUT_PATH, index=False)
 
-print("✅ Robust Health Index generated")
-print("📁 Saved to:", OUT_PATH)
-print("✅ Health range:", df_out["health_index"].min(), "to", df_out["health_index"].max())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+health_index.py
+
+Incremental health index: the same pipeline as build_health_index.py,
+maintained online so each new anomaly-intensity value costs amortised O(1).
+
+    raw → EWM(span 60) → rolling-500 min/max (min_periods 50) normalisation
+        → 1 - norm → running minimum → clip(0.05, 1)
+
+ - the EWM uses pandas' adjust=True recursion (running weight + mean)
+ - rolling min / max are monotonic deques over the last 500 samples
+ - the running minimum is a single float
+
+Until the first 50 smoothed values exist the index is undefined and NaN is
+returned; the batch script back-fills those rows with the first valid
+value, as it always did.
+
+The state can be checkpointed to JSON and restored, so a live process can
+resume exactly where the last one stopped.
+"""
+
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+
+STATE_PATH = "data/processed/health_index_state.json"
+
+EWM_SPAN = 60
+ROLLING_WINDOW = 500
+MIN_PERIODS = 50
+NORM_EPS = 1e-6
+HEALTH_CLIP = (0.05, 1.0)
+STATE_VERSION = 1
+
+
+class HealthIndexState:
+    """Online health index; feed intensities with update() / update_many()."""
+
+    def __init__(self, span=EWM_SPAN, window=ROLLING_WINDOW, min_periods=MIN_PERIODS):
+        self.span = span
+        self.window = window
+        self.min_periods = min_periods
+        self._decay = 1.0 - 2.0 / (span + 1.0)
+
+        self.n = 0                  # samples seen
+        self.ewm = math.nan         # current smoothed value
+        self._ewm_weight = 1.0
+        self._min_q = deque()       # (position, value), values increasing
+        self._max_q = deque()       # (position, value), values decreasing
+        self._valid = deque()       # positions of non-NaN smoothed values in the window
+        self.running_min = math.inf
+
+    # -----------------------------
+    # UPDATES
+    # -----------------------------
+    def _smooth(self, x):
+        # pandas ewm(span, adjust=True).mean(), ignore_na=False
+        is_obs = x == x
+        if self.ewm == self.ewm:
+            self._ewm_weight *= self._decay
+            if is_obs:
+                if self.ewm != x:
+                    self.ewm = (self._ewm_weight * self.ewm + x) / (self._ewm_weight + 1.0)
+                self._ewm_weight += 1.0
+        elif is_obs:
+            self.ewm = x
+        return self.ewm
+
+    def update(self, x):
+        """Add one intensity value; returns the health index after it."""
+        i = self.n
+        self.n += 1
+        s = self._smooth(float(x))
+
+        start = i - self.window + 1
+        for q in (self._min_q, self._max_q):
+            while q and q[0][0] < start:
+                q.popleft()
+        while self._valid and self._valid[0] < start:
+            self._valid.popleft()
+
+        if s == s:
+            while self._min_q and self._min_q[-1][1] >= s:
+                self._min_q.pop()
+            self._min_q.append((i, s))
+            while self._max_q and self._max_q[-1][1] <= s:
+                self._max_q.pop()
+            self._max_q.append((i, s))
+            self._valid.append(i)
+
+        if len(self._valid) < self.min_periods or s != s:
+            return math.nan
+
+        lo, hi = self._min_q[0][1], self._max_q[0][1]
+        norm = min(max((s - lo) / (hi - lo + NORM_EPS), 0.0), 1.0)
+        self.running_min = min(self.running_min, 1.0 - norm)
+        return min(max(self.running_min, HEALTH_CLIP[0]), HEALTH_CLIP[1])
+
+    def update_many(self, values):
+        """Add a batch of intensities; returns the health index after each one."""
+        update = self.update
+        return np.array([update(x) for x in np.asarray(values, dtype=np.float64)])
+
+    # -----------------------------
+    # CHECKPOINT / RESTORE
+    # -----------------------------
+    def to_dict(self):
+        def num(v):
+            return None if v != v or math.isinf(v) else v
+
+        return {
+            "version": STATE_VERSION,
+            "span": self.span,
+            "window": self.window,
+            "min_periods": self.min_periods,
+            "n": self.n,
+            "ewm": num(self.ewm),
+            "ewm_weight": self._ewm_weight,
+            "min_q": list(self._min_q),
+            "max_q": list(self._max_q),
+            "valid": list(self._valid),
+            "running_min": num(self.running_min),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state["span"], state["window"], state["min_periods"])
+        obj.n = state["n"]
+        obj.ewm = math.nan if state["ewm"] is None else state["ewm"]
+        obj._ewm_weight = state["ewm_weight"]
+        obj._min_q = deque(tuple(p) for p in state["min_q"])
+        obj._max_q = deque(tuple(p) for p in state["max_q"])
+        obj._valid = deque(state["valid"])
+        obj.running_min = math.inf if state["running_min"] is None else state["running_min"]
+        return obj
+
+    def save(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
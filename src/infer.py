@@ -1,113 +1,181 @@
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-import json
-from collections import Counter
+import argparse
 import os
 
+import numpy_engine
+from model_client import SERVER_URL, connect
+from online_threshold import THRESHOLD_PATH, OnlineThreshold
+from rca_subsystem_mapper import anomaly_rca_frame, build_subsystem_codes, load_sensor_cluster_map
+from sensor_store import load_processed, open_store
+from stream_score import benchmark, score_stream
+
 # -----------------------------
 # PATHS
 # -----------------------------
 MODEL_PATH = "models/autoencoder.h5"
-DATA_PATH = "data/processed/44_processed.csv"
 MAP_PATH = "data/sensor_cluster_map.json"
 OUTPUT_PATH = "data/processed/anomaly_with_root_cause.csv"
 
-# -----------------------------
-# LOAD DATA
-# -----------------------------
-print("✅ Loading data...")
-df = pd.read_csv(DATA_PATH, index_col=0)
-feature_names = df.columns.tolist()
-X = df.values
+TOP_K_SENSORS = 5
+THRESHOLD_SIGMA = 4
 
-# -----------------------------
-# LOAD TRAINED MODEL
-# -----------------------------
-print("✅ Loading trained autoencoder...")
-autoencoder = tf.keras.models.load_model(MODEL_PATH,compile=False)
 
-# -----------------------------
-# RECONSTRUCTION
-# -----------------------------
-print("✅ Running inference...")
-X_reconstructed = autoencoder.predict(X, verbose=0)
+def load_threshold_state(path=THRESHOLD_PATH):
+    # without a saved state the first run fits one (= the batch rule) on its own errors
+    if os.path.exists(path):
+        print("✅ Loading threshold state:", path)
+        return OnlineThreshold.load(path)
+    return None
 
-# -----------------------------
-# RECONSTRUCTION ERROR
-# -----------------------------
-reconstruction_error = np.mean(np.square(X - X_reconstructed), axis=1)
 
-# -----------------------------
-# ANOMALY THRESHOLD (99.5 PERCENTILE)
-# -----------------------------
-threshold = np.mean(reconstruction_error) + 4 * np.std(reconstruction_error)
-anomalies = reconstruction_error > threshold
+def load_autoencoder(keras=False, server=None, model_path=MODEL_PATH):
+    if server:
+        model = connect(server, "autoencoder")
+        if model is not None:
+            print("✅ Using model server:", server)
+            return model
+        print("⚠️ Model server not reachable at", server, "- loading the model locally")
+    if keras:
+        import tensorflow as tf
+        return tf.keras.models.load_model(model_path, compile=False)
+    # exported .npz weights, refreshed automatically when the .h5 changes
+    return numpy_engine.load_model(model_path)
 
-print(f"✅ Anomaly threshold set to: {threshold:.6f}")
-print(f"✅ Total anomalies detected: {np.sum(anomalies)}")
 
-# -----------------------------
-# LOAD SENSOR → SUBSYSTEM MAP
-# -----------------------------
-if not os.path.exists(MAP_PATH):
-    raise FileNotFoundError("❌ sensor_cluster_map.json not found!")
+def load_sensor_map(map_path=MAP_PATH):
+    if not os.path.exists(map_path):
+        raise FileNotFoundError("❌ sensor_cluster_map.json not found!")
+    return load_sensor_cluster_map(map_path)
 
-with open(MAP_PATH, "r") as f:
-    SENSOR_TO_SUBSYSTEM = json.load(f)
 
 # -----------------------------
-# RCA DECODER
+# ANOMALY DETECTION + RCA
 # -----------------------------
-def decode_root_cause(sensor_list):
+def detect_anomalies(df, autoencoder, sensor_map, scorer=None, top_k=TOP_K_SENSORS):
     """
-    Converts sensor list → dominant physical subsystems
+    Anomaly/RCA frame (anomaly_with_root_cause.csv rows) for the processed
+    matrix df, plus the threshold used. With an OnlineThreshold `scorer` the
+    rows are classified (and the state updated) sample by sample; without
+    one the threshold is mean + 4 sigma of this batch's errors. An unfitted
+    scorer is fitted on this batch's errors, which are then classified
+    against that threshold without being added a second time.
     """
-    subsystems = [
-        SENSOR_TO_SUBSYSTEM.get(s, "UNKNOWN")
-        for s in sensor_list
-    ]
-
-    dominant = Counter(subsystems).most_common(3)
-    return " + ".join([x[0] for x in dominant])
-
-# -----------------------------
-# RCA + ANOMALY ANALYSIS
-# -----------------------------
-results = []
-
-for i in range(len(anomalies)):
-    if anomalies[i]:
-
-        timestamp = df.index[i]
-
-        # reconstruction error vector for time i
-        error_vector = np.abs(X[i] - X_reconstructed[i])
-
-        # top 5 contributing sensors
-        top_idx = np.argsort(error_vector)[-5:]
-        root_sensors = [feature_names[j] for j in top_idx]
-
-        # decode physical RCA
-        physical_root_cause = decode_root_cause(root_sensors)
-
-        print(f"\n🚨 ANOMALY DETECTED at {timestamp}")
-        print("Top sensors:", root_sensors)
-        print("✅ Physical RCA:", physical_root_cause)
-
-        results.append({
-            "timestamp": timestamp,
-            "anomaly": True,
-            "reconstruction_error": reconstruction_error[i],
-            "root_cause_sensors": ",".join(root_sensors),
-            "root_cause_physical": physical_root_cause
-        })
-
-# -----------------------------
-# SAVE OUTPUT
-# -----------------------------
-df_out = pd.DataFrame(results)
-df_out.to_csv(OUTPUT_PATH, index=False)
-
-print("\n✅ RCA results saved to:", OUTPUT_PATH)
-print("✅ Inference + Root Cause Analysis completed successfully.")
+    feature_names = df.columns.tolist()
+    X = df.values
+
+    # RECONSTRUCTION
+    X_reconstructed = autoencoder.predict(X, verbose=0)
+
+    # RECONSTRUCTION ERROR
+    reconstruction_error = np.mean(np.square(X - X_reconstructed), axis=1)
+
+    # ANOMALY THRESHOLD
+    if scorer is not None:
+        if np.isfinite(scorer.threshold):
+            anomalies = scorer.update_many(reconstruction_error)
+        else:
+            anomalies = scorer.fit_classify(reconstruction_error)
+        threshold = scorer.threshold
+    else:
+        threshold = np.mean(reconstruction_error) + THRESHOLD_SIGMA * np.std(reconstruction_error)
+        anomalies = reconstruction_error > threshold
+
+    # SENSOR → SUBSYSTEM CODES
+    subsystem_codes, subsystem_labels = build_subsystem_codes(feature_names, sensor_map)
+
+    # RCA (BATCHED): per-sensor error only for the anomalous rows → top 5 sensors → dominant subsystems
+    anomaly_idx = np.flatnonzero(anomalies)
+    error_matrix = np.abs(X[anomaly_idx] - X_reconstructed[anomaly_idx])
+    df_out = anomaly_rca_frame(
+        df.index[anomaly_idx], reconstruction_error[anomaly_idx], error_matrix,
+        feature_names, subsystem_codes, subsystem_labels, top_k
+    )
+    return df_out, threshold
+
+
+# -----------------------------
+# STREAMING MODE (BOUNDED MEMORY)
+# -----------------------------
+def main_streaming(args):
+    sensor_map = load_sensor_map()
+
+    print("✅ Loading trained autoencoder...")
+    autoencoder = load_autoencoder(args.keras, args.server)
+    predict = lambda X: np.asarray(autoencoder.predict_on_batch(X))
+    store = open_store()
+
+    if args.bench:
+        benchmark(predict, store, sensor_map, [int(s) for s in args.bench.split(",")])
+        return
+
+    scorer = load_threshold_state() if args.online else None
+    print("✅ Running streaming inference...")
+    summary = score_stream(predict, store, sensor_map, chunk_size=args.chunk_size,
+                           output_path=OUTPUT_PATH, scorer=scorer)
+    if args.online:
+        if scorer is None:
+            errors = pd.read_csv(summary["error_path"], usecols=["reconstruction_error"])
+            scorer = OnlineThreshold().fit(errors["reconstruction_error"].values)
+        print("✅ Threshold state saved to:", scorer.save(THRESHOLD_PATH))
+    print("\n✅ RCA results saved to:", OUTPUT_PATH)
+
+
+def main(args):
+    if args.chunk_size or args.bench:
+        return main_streaming(args)
+
+    # -----------------------------
+    # LOAD DATA
+    # -----------------------------
+    print("✅ Loading data...")
+    df = load_processed()
+
+    # -----------------------------
+    # LOAD TRAINED MODEL
+    # -----------------------------
+    print("✅ Loading trained autoencoder...")
+    autoencoder = load_autoencoder(args.keras, args.server)
+    sensor_map = load_sensor_map()
+
+    print("✅ Running inference...")
+    scorer = (load_threshold_state() or OnlineThreshold()) if args.online else None
+
+    df_out, threshold = detect_anomalies(df, autoencoder, sensor_map, scorer)
+    if args.online:
+        print("✅ Threshold state saved to:", scorer.save(THRESHOLD_PATH))
+
+    print(f"✅ Anomaly threshold set to: {threshold:.6f}")
+    print(f"✅ Total anomalies detected: {len(df_out)}")
+
+    if args.verbose:
+        for r in df_out.itertuples(index=False):
+            print(f"\n🚨 ANOMALY DETECTED at {r.timestamp}")
+            print("Top sensors:", r.root_cause_sensors.split(","))
+            print("✅ Physical RCA:", r.root_cause_physical)
+
+    # -----------------------------
+    # SAVE OUTPUT
+    # -----------------------------
+    df_out.to_csv(OUTPUT_PATH, index=False)
+
+    print("\n✅ RCA results saved to:", OUTPUT_PATH)
+    print("✅ Inference + Root Cause Analysis completed successfully.")
+    return df_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Autoencoder anomaly detection + root cause analysis.")
+    parser.add_argument("--verbose", action="store_true", help="print every detected anomaly")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream the store in chunks of N rows (bounded memory)")
+    parser.add_argument("--bench", default=None,
+                        help="comma-separated chunk sizes to benchmark, e.g. 1024,4096,16384")
+    parser.add_argument("--keras", action="store_true",
+                        help="score with TensorFlow/Keras instead of the NumPy engine")
+    parser.add_argument("--online", action="store_true",
+                        help=f"classify each sample against the persisted threshold state ({THRESHOLD_PATH})")
+    parser.add_argument("--server", nargs="?", const=SERVER_URL, default=None,
+                        help=f"score through a running model_server.py (default {SERVER_URL})")
+
+    main(parser.parse_args())
@@ -1,18 +1,48 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import numpy as np
 import pandas as pd
+import gzip
 import json
 import os
+import sys
 from datetime import datetime
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sensor_store import CSV_PATH, STORE_PATH
+from twin_data import (TELEMETRY_DEFAULTS, TwinData, anomaly_table, maintenance_table, minmax_downsample,
+                       table_records)
+from twin_stream import TwinStream
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # -----------------------------
 # CONFIG
 # -----------------------------
-DATA_TELEMETRY = "data/processed/44_processed.csv"
-DATA_RUL = "data/processed/realtime_rul.csv"
-DATA_ANOMALIES = "data/processed/anomaly_with_root_cause.csv"
-DATA_MAINTENANCE = "data/maintenance_schedule.csv"
+DATA_DIR = os.environ.get("PM_DATA_DIR", "data")      # e.g. fixture data for twin_loadtest.py
+DATA_RUL = os.path.join(DATA_DIR, "processed", "realtime_rul.csv")
+DATA_ANOMALIES = os.path.join(DATA_DIR, "processed", "anomaly_with_root_cause.csv")
+DATA_MAINTENANCE = os.path.join(DATA_DIR, "processed", "maintenance_schedule.csv")   # written by predictive_maintenance.py
+LEGACY_MAINTENANCE = os.path.join(DATA_DIR, "maintenance_schedule.csv")
+DATA_STORE = os.path.join(DATA_DIR, "processed", os.path.basename(STORE_PATH))
+DATA_SENSORS_CSV = os.path.join(DATA_DIR, "processed", os.path.basename(CSV_PATH))
+if not os.path.exists(DATA_MAINTENANCE) and os.path.exists(LEGACY_MAINTENANCE):
+    DATA_MAINTENANCE = LEGACY_MAINTENANCE
+
+GZIP_MIN_BYTES = 4096       # smaller responses are sent uncompressed
+GZIP_LEVEL = 5
+
+# parsed once, refreshed when the files change (see twin_data.py)
+data = TwinData(DATA_RUL, DATA_ANOMALIES, DATA_MAINTENANCE, DATA_STORE, DATA_SENSORS_CSV)
+# pushes one twin-state frame per new sample (see twin_stream.py)
+stream = TwinStream(data)
 
 # -----------------------------
 # INIT FASTAPI APP
@@ -32,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # -----------------------------
@@ -64,6 +95,55 @@ class MaintenanceItem(BaseModel):
     Predicted_Maintenance_Due: str
 
 
+# -----------------------------
+# FAST JSON RESPONSES
+# -----------------------------
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+def _json_response(request, snap, key, build):
+    """
+    JSON records derived from a snapshot. The ETag is the file version, so
+    an unchanged file costs a 304; with a cache `key` the body (and its
+    gzip) is encoded once per version.
+    """
+    etag = f'W/"{snap.version}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if key is not None and key in snap.cache:
+        body, gz = snap.cache[key]
+    else:
+        body = _dumps(build())
+        gz = gzip.compress(body, compresslevel=GZIP_LEVEL) if len(body) >= GZIP_MIN_BYTES else None
+        if key is not None:
+            snap.cache[key] = (body, gz)
+
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if gz is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gz
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _subsystem_rows(values, subsystem, rows=None):
+    wanted = {s.strip().upper() for s in subsystem.split(",") if s.strip()}
+    mask = np.array([v.upper() in wanted for v in values.tolist()], dtype=bool)
+    if rows is not None:
+        return rows[mask[rows]]
+    return np.flatnonzero(mask)
+
+
 # -----------------------------
 # ROUTES
 # -----------------------------
@@ -79,31 +159,81 @@ def root():
 @app.get("/api/telemetry", response_model=TelemetryOut)
 def get_realtime_telemetry():
 
-    df = pd.read_csv(DATA_TELEMETRY)
-    rul_df = pd.read_csv(DATA_RUL)
+    sensors = data.sensors.get()
+    if sensors is None or sensors.time is None:
+        raise HTTPException(status_code=503, detail="No processed sensor data yet")
+    rul = data.rul.get()
+    latest_rul = rul.latest if rul is not None else {}
 
-    latest = df.iloc[-1]
-    latest_rul = rul_df.iloc[-1]
+    # one response per (sensor, RUL) version
+    key = ("telemetry", rul.version if rul is not None else None)
+    if key in sensors.cache:
+        return sensors.cache[key]
 
-    return TelemetryOut(
-        timestamp=str(latest["time_stamp"]),
-        rpm=float(latest.get("rpm", 12)),
-        wind_speed=float(latest.get("wind_speed", 7)),
-        power_output=float(latest.get("power_output", 1200)),
-        temp_gearbox=float(latest.get("temp_gearbox", 45)),
-        temp_generator=float(latest.get("temp_generator", 50)),
+    latest = sensors.latest
+    sensors.cache[key] = TelemetryOut(
+        timestamp=str(sensors.time),
+        **{name: float(latest.get(name, default)) for name, default in TELEMETRY_DEFAULTS.items()},
         health_index=float(latest_rul.get("health_index", 1.0)),
         rul_hours=float(latest_rul.get("RealTime_RUL_hours", 200)),
     )
+    return sensors.cache[key]
 
 
 # ------------------------------------------------------------
 # 2️⃣  HISTORICAL TREND DATA (Useful for dashboards)
 # ------------------------------------------------------------
 @app.get("/api/history")
-def get_history(n: int = 500):
-    df = pd.read_csv(DATA_TELEMETRY)
-    return df.tail(n).to_dict(orient="records")
+def get_history(n: int = Query(500, ge=1), start: Optional[str] = None, end: Optional[str] = None,
+                cursor: Optional[int] = Query(None, ge=0), columns: Optional[str] = None,
+                max_points: Optional[int] = Query(None, ge=2)):
+    """
+    Sensor rows. Without start/end/cursor: the last n rows. With them: the
+    rows start <= time < end, n per page from `cursor` (the X-Next-Cursor
+    header of the previous page). `columns` is a comma-separated subset;
+    `max_points` downsamples the whole selection (min/max per bucket)
+    instead of paging it.
+    """
+    sensors = data.sensors.get()
+    if sensors is None:
+        raise HTTPException(status_code=503, detail="No processed sensor data yet")
+    store = sensors.store
+
+    cols = store.columns
+    if columns:
+        cols = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in cols if c not in store.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+
+    # binary search on the sorted timestamp index
+    try:
+        i0, i1 = store.row_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid start/end: {e}")
+
+    next_cursor = None
+    if start is None and end is None and cursor is None:
+        i0 = max(i0, i1 - n)
+    else:
+        i0 = max(i0, cursor or 0)
+        if max_points is None and i1 - i0 > n:
+            i1 = next_cursor = i0 + n
+
+    times = store.timestamps[i0:i1]
+    values = store.values[i0:i1]
+    if cols is not store.columns:
+        values = values[:, [store.columns.index(c) for c in cols]]
+    if max_points is not None:
+        times, values = minmax_downsample(times, values, max_points)
+
+    df = pd.DataFrame(np.asarray(values, dtype=np.float64), columns=cols)
+    if np.isnan(df.values).any():
+        df = df.astype(object).where(df.notna(), None)
+    df.insert(0, store.index_name or "index", pd.DatetimeIndex(np.asarray(times).view("datetime64[ns]")).astype(str))
+
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return JSONResponse(df.to_dict(orient="records"), headers=headers)
 
 
 # ------------------------------------------------------------
@@ -111,49 +241,72 @@ def get_history(n: int = 500):
 # ------------------------------------------------------------
 @app.get("/api/rul")
 def get_rul():
-    df = pd.read_csv(DATA_RUL)
-    return df.tail(200).to_dict(orient="records")
+    snap = data.rul.get()
+    if snap is None:
+        raise HTTPException(status_code=503, detail="No RUL data yet")
+    if "rul" not in snap.cache:
+        tail = snap.frame.tail(200)
+        # NaN (e.g. no health value yet) is not valid JSON → null
+        snap.cache["rul"] = tail.astype(object).where(tail.notna(), None).to_dict(orient="records")
+    return snap.cache["rul"]
 
 
 # ------------------------------------------------------------
 # 4️⃣  Anomalies + RCA Output
 # ------------------------------------------------------------
 @app.get("/api/anomalies", response_model=list[AnomalyOut])
-def get_anomalies():
-    if not os.path.exists(DATA_ANOMALIES):
+def get_anomalies(request: Request, since: Optional[str] = None, subsystem: Optional[str] = None):
+    """All anomalies, or those at/after `since` and/or of the comma-separated `subsystem`s."""
+    snap = data.anomalies.get()
+    if snap is None:
         return []
+    table = anomaly_table(snap)
 
-    df = pd.read_csv(DATA_ANOMALIES)
+    rows = None
+    if since is not None and snap.times is not None:
+        try:
+            since_ns = pd.Timestamp(since).value
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid since: {e}")
+        rows = np.flatnonzero(snap.times >= since_ns)
+    if subsystem is not None:
+        rows = _subsystem_rows(table["subsystem"], subsystem, rows)
 
-    return [
-        AnomalyOut(
-            timestamp=str(r["timestamp"]),
-            is_anomaly=bool(r["is_anomaly"]),
-            sensors=r["fault_sensors"],
-            subsystem=r["root_cause"]
-        )
-        for _, r in df.iterrows()
-    ]
+    if rows is None:
+        return _json_response(request, snap, "anomalies", lambda: table_records(table))
+    return _json_response(request, snap, None, lambda: table_records(table, rows))
 
 
 # ------------------------------------------------------------
 # 5️⃣ Predictive Maintenance Schedule
 # ------------------------------------------------------------
 @app.get("/api/maintenance", response_model=list[MaintenanceItem])
-def get_maintenance():
+def get_maintenance(request: Request, subsystem: Optional[str] = None):
 
-    if not os.path.exists(DATA_MAINTENANCE):
+    snap = data.maintenance.get()
+    if snap is None:
         return []
+    table = maintenance_table(snap)
+
+    if subsystem is None:
+        return _json_response(request, snap, "maintenance", lambda: table_records(table))
+    rows = _subsystem_rows(table["Subsystem"], subsystem)
+    return _json_response(request, snap, None, lambda: table_records(table, rows))
+
 
-    df = pd.read_csv(DATA_MAINTENANCE)
-
-    return [
-        MaintenanceItem(
-            Subsystem=row["Subsystem"],
-            Effective_RUL_hrs=float(row["Effective RUL (hrs)"]),
-            Priority_Score=float(row["Priority Score"]),
-            Recommended_Action=row["Recommended Action"],
-            Predicted_Maintenance_Due=str(row["Predicted Maintenance Due"])
-        )
-        for _, row in df.iterrows()
-    ]
+# ------------------------------------------------------------
+# 6️⃣ Live Twin State Push (Server-Sent Events, replaces polling)
+# ------------------------------------------------------------
+@app.get("/api/stream")
+async def stream_twin_state(last_event_id: Optional[str] = Header(None), last_id: Optional[int] = None):
+    """
+    One frame per new sample: {seq, timestamp, telemetry, health_index,
+    rul_hours, anomalies}. Reconnecting clients resume after their
+    Last-Event-ID header (EventSource sends it) or ?last_id=.
+    """
+    resume = last_id if last_id is not None else last_event_id
+    return StreamingResponse(
+        stream.events(resume),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,344 @@
+"""
+twin_data.py
+
+Shared in-process data layer for digital_twin_api.
+
+Each source file is parsed once and kept as an immutable snapshot. A
+request only stats the file (at most every STAT_INTERVAL seconds); the
+file is re-read when its size or mtime changed - and when it merely grew
+(the bytes consumed so far still hash the same), only the appended rows
+are parsed and added to the snapshot. The processed sensor matrix is served
+from the memory-mapped binary store, reopened when its manifest changes.
+
+Every snapshot carries a `version` (changes whenever its content may
+have), the latest row as a dict (O(1) for /api/telemetry) and a `cache`
+dict for products derived from it, which therefore live exactly as long
+as the data they were derived from.
+"""
+
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sensor_store import CSV_PATH, MANIFEST_FILE, STORE_PATH, SensorStore
+
+STAT_INTERVAL = 0.1         # seconds between change checks of one file
+HASH_BLOCK = 1 << 20        # bytes per read when re-hashing the consumed prefix
+
+TIME_COLUMNS = ("time_stamp", "timestamp")
+
+# anomaly_with_root_cause.csv columns: the API's names, else the ones infer.py writes
+ANOMALY_FLAG_COLUMNS = ("is_anomaly", "anomaly")
+ANOMALY_SENSORS_COLUMNS = ("fault_sensors", "root_cause_sensors")
+ANOMALY_SUBSYSTEM_COLUMNS = ("root_cause", "root_cause_physical")
+
+# telemetry fields served to Unity, with the value used when a sensor is absent
+TELEMETRY_DEFAULTS = {
+    "rpm": 12,
+    "wind_speed": 7,
+    "power_output": 1200,
+    "temp_gearbox": 45,
+    "temp_generator": 50,
+}
+
+
+class Snapshot:
+    """One immutable parsed version of a source."""
+
+    __slots__ = ("frame", "version", "latest", "cache", "times")
+
+    def __init__(self, frame, version, times=None):
+        self.frame = frame
+        self.version = version
+        self.latest = frame.iloc[-1].to_dict() if len(frame) else {}
+        self.times = times
+        self.cache = {}
+
+
+def first_column(df, candidates):
+    return next((c for c in candidates if c in df.columns), None)
+
+
+def time_column(df):
+    return first_column(df, TIME_COLUMNS)
+
+
+def _epoch_ns(values):
+    return pd.to_datetime(values, errors="coerce").values.astype("datetime64[ns]").view(np.int64)
+
+
+class CsvSnapshot:
+    """A CSV file kept parsed in memory, refreshed on change."""
+
+    def __init__(self, path, stat_interval=STAT_INTERVAL):
+        self.path = path
+        self.stat_interval = stat_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._sig = None            # (size, mtime_ns) of the parsed file
+        self._offset = 0            # bytes consumed (complete lines)
+        self._header = b""
+        self._digest = None         # sha1 of the first _offset bytes
+        self._checked = 0.0
+        self.reloads = 0
+        self.tail_reads = 0
+
+    def get(self):
+        """Current snapshot, or None while the file does not exist."""
+        now = time.monotonic()
+        if now - self._checked < self.stat_interval:
+            return self._snapshot
+        with self._lock:
+            if now - self._checked >= self.stat_interval:
+                self._refresh()
+                self._checked = time.monotonic()
+        return self._snapshot
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._snapshot, self._sig = None, None
+            return
+        sig = (st.st_size, st.st_mtime_ns)
+        if sig == self._sig:
+            return
+        # appended only if the file grew and everything consumed is unchanged;
+        # any other change (e.g. a to_csv rewrite of the same size) reloads
+        grew = self._sig is not None and st.st_size > self._sig[0]
+        if self._snapshot is not None and grew and self._unchanged_prefix():
+            self._read_appended(sig)
+        else:
+            self._read_full(sig)
+
+    def _unchanged_prefix(self):
+        digest = hashlib.sha1()
+        with open(self.path, "rb") as f:
+            if f.read(len(self._header)) != self._header:
+                return False
+            f.seek(0)
+            remaining = self._offset
+            while remaining:
+                block = f.read(min(HASH_BLOCK, remaining))
+                if not block:
+                    return False
+                digest.update(block)
+                remaining -= len(block)
+        return digest.digest() == self._digest.digest()
+
+    def _consume(self, data, start):
+        # only complete lines; a half-written last row waits for the next check
+        data = data[:data.rfind(b"\n") + 1]
+        if start == 0:
+            self._digest = hashlib.sha1()
+        self._digest.update(data)
+        self._offset = start + len(data)
+        return data
+
+    def _make(self, frame, sig, times=None):
+        # the frame keeps the file's values (timestamps as text, as served);
+        # parsed times go to a separate int64 array
+        col = time_column(frame)
+        if col is not None and times is None:
+            times = _epoch_ns(frame[col])
+        self._sig = sig
+        self._snapshot = Snapshot(frame, f"{sig[0]:x}-{sig[1]:x}", times)
+
+    def _read_full(self, sig):
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        self._header = raw[:raw.find(b"\n") + 1]
+        data = self._consume(raw, 0)
+        frame = pd.read_csv(io.BytesIO(data)) if data.strip() else pd.DataFrame()
+        self.reloads += 1
+        self._make(frame, sig)
+
+    def _read_appended(self, sig):
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = self._consume(f.read(), self._offset)
+        old = self._snapshot
+        if not data.strip():
+            # same rows, but never the old version for a changed file
+            self._make(old.frame, sig, old.times)
+            return
+        new = pd.read_csv(io.BytesIO(self._header + data))
+        col = time_column(new)
+        times = None
+        if col is not None and old.times is not None:
+            times = np.concatenate([old.times, _epoch_ns(new[col])])
+        self.tail_reads += 1
+        self._make(pd.concat([old.frame, new], ignore_index=True), sig, times)
+
+
+class _FrameStore(SensorStore):
+    """SensorStore interface over an in-memory timestamp-indexed frame (legacy CSV)."""
+
+    def __init__(self, df):
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind="stable")
+        self.path = None
+        self.columns = [str(c) for c in df.columns]
+        self.index_name = df.index.name
+        self.n_rows = len(df)
+        self.values = np.asarray(df.values, dtype=np.float32)
+        self.timestamps = df.index.values.astype("datetime64[ns]").view(np.int64)
+        self._col_pos = {c: i for i, c in enumerate(self.columns)}
+
+
+class SensorView:
+    """One version of the sensor matrix: the store, its last row and time."""
+
+    __slots__ = ("store", "latest", "time", "version", "cache")
+
+    def __init__(self, store, version):
+        self.store = store
+        self.version = version
+        self.latest, self.time = {}, None
+        if store.n_rows:
+            self.latest = dict(zip(store.columns, store.values[store.n_rows - 1].tolist()))
+            self.time = pd.Timestamp(int(store.timestamps[store.n_rows - 1]))
+        self.cache = {}
+
+
+class SensorSnapshot:
+    """
+    The processed sensor matrix as a SensorStore: the binary store
+    (reopened when its manifest changes), else the legacy CSV.
+    """
+
+    def __init__(self, store_path=STORE_PATH, csv_path=CSV_PATH, stat_interval=STAT_INTERVAL):
+        self.store_path, self.csv_path = store_path, csv_path
+        self.stat_interval = stat_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._sig = None
+        self._checked = 0.0
+
+    def get(self):
+        """Current SensorView, or None without processed data."""
+        now = time.monotonic()
+        if now - self._checked < self.stat_interval:
+            return self._current
+        with self._lock:
+            if now - self._checked >= self.stat_interval:
+                self._refresh()
+                self._checked = time.monotonic()
+        return self._current
+
+    def _refresh(self):
+        manifest = os.path.join(self.store_path, MANIFEST_FILE)
+        source = manifest if os.path.exists(manifest) else self.csv_path
+        try:
+            st = os.stat(source)
+        except FileNotFoundError:
+            self._current, self._sig = None, None
+            return
+        sig = (source, st.st_size, st.st_mtime_ns)
+        if sig == self._sig:
+            return
+        if source == manifest:
+            store = SensorStore(self.store_path)
+        else:
+            store = _FrameStore(pd.read_csv(self.csv_path, index_col=0, parse_dates=True))
+        self._sig = sig
+        self._current = SensorView(store, f"{store.n_rows:x}-{st.st_mtime_ns:x}")
+
+
+def minmax_downsample(times, values, max_points):
+    """
+    At most max_points rows of (times, values): per bucket of consecutive
+    rows, each column's min and max in the order they occur, at the
+    bucket's first and last timestamp. Keeps the envelope (spikes) of every
+    column while the payload size stays fixed.
+    """
+    n = len(times)
+    n_buckets = max(1, max_points // 2)
+    if n <= max_points or n_buckets >= n:
+        return times, values
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    ends = np.append(starts[1:], n)
+
+    # one bucket at a time: extra memory is one bucket's index rows, not the range
+    out = np.empty((2 * n_buckets, values.shape[1]), dtype=values.dtype)
+    for k, (a, b) in enumerate(zip(starts, ends)):
+        block = values[a:b]
+        # first position of the bucket's min / max, to keep their order
+        pos_lo = np.argmin(block, axis=0)
+        pos_hi = np.argmax(block, axis=0)
+        lo = np.take_along_axis(block, pos_lo[None, :], 0)[0]
+        hi = np.take_along_axis(block, pos_hi[None, :], 0)[0]
+        lo_first = pos_lo <= pos_hi
+        out[2 * k] = np.where(lo_first, lo, hi)
+        out[2 * k + 1] = np.where(lo_first, hi, lo)
+    out_times = np.empty(2 * n_buckets, dtype=times.dtype)
+    out_times[0::2] = times[starts]
+    out_times[1::2] = times[ends - 1]
+    return out_times, out
+
+
+# -----------------------------
+# COLUMN TABLES (built once per snapshot)
+# -----------------------------
+def _text(frame, candidates):
+    col = first_column(frame, candidates)
+    if col is None:
+        return np.full(len(frame), "", dtype=object)
+    return frame[col].fillna("").astype(str).to_numpy(dtype=object)
+
+
+def anomaly_table(snap):
+    """/api/anomalies fields of an anomaly snapshot, as column arrays."""
+    if "anomaly_table" not in snap.cache:
+        frame = snap.frame
+        flag = first_column(frame, ANOMALY_FLAG_COLUMNS)
+        snap.cache["anomaly_table"] = {
+            "timestamp": _text(frame, TIME_COLUMNS),
+            # rows of anomaly_with_root_cause.csv are anomalies unless flagged otherwise
+            "is_anomaly": frame[flag].astype(bool).to_numpy() if flag else np.ones(len(frame), dtype=bool),
+            "sensors": _text(frame, ANOMALY_SENSORS_COLUMNS),
+            "subsystem": _text(frame, ANOMALY_SUBSYSTEM_COLUMNS),
+        }
+    return snap.cache["anomaly_table"]
+
+
+def maintenance_table(snap):
+    """/api/maintenance fields of a maintenance_schedule.csv snapshot, as column arrays."""
+    if "maintenance_table" not in snap.cache:
+        frame = snap.frame
+        snap.cache["maintenance_table"] = {
+            "Subsystem": _text(frame, ["Subsystem"]),
+            "Effective_RUL_hrs": frame["Effective RUL (hrs)"].to_numpy(dtype=float),
+            "Priority_Score": frame["Priority Score"].to_numpy(dtype=float),
+            "Recommended_Action": _text(frame, ["Recommended Action"]),
+            "Predicted_Maintenance_Due": _text(frame, ["Predicted Maintenance Due"]),
+        }
+    return snap.cache["maintenance_table"]
+
+
+def table_records(table, rows=None):
+    """Records (list of dicts) for the selected rows of a column table; NaN → None."""
+    columns = []
+    for values in table.values():
+        values = (values if rows is None else values[rows]).tolist()
+        if values and isinstance(values[0], float):
+            values = [None if v != v else v for v in values]
+        columns.append(values)
+    return [dict(zip(table, row)) for row in zip(*columns)]
+
+
+class TwinData:
+    """All sources the API serves."""
+
+    def __init__(self, rul_path, anomalies_path, maintenance_path, store_path=STORE_PATH, csv_path=CSV_PATH):
+        self.sensors = SensorSnapshot(store_path, csv_path)
+        self.rul = CsvSnapshot(rul_path)
+        self.anomalies = CsvSnapshot(anomalies_path)
+        self.maintenance = CsvSnapshot(maintenance_path)
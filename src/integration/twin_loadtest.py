@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+twin_loadtest.py
+
+Offline load test for digital_twin_api.
+
+ 1. Generates fixture data of configurable size in a scratch directory:
+    sensor store, realtime_rul.csv, anomaly_with_root_cause.csv (infer.py
+    columns) and maintenance_schedule.csv (predictive_maintenance.py).
+ 2. Starts the app under uvicorn in a subprocess, pointed at the fixture
+    through PM_DATA_DIR.
+ 3. Per route, runs N concurrent keep-alive clients (asyncio, stdlib only)
+    for a fixed duration, closed-loop or at a fixed polling interval.
+    The stream scenario subscribes N clients to /api/stream, appends
+    samples to the store and measures append → frame delivery latency.
+ 4. Reports throughput, p50/p95/p99 latency and the server's RSS (from
+    /proc), and writes everything to a JSON file for comparing runs.
+
+Clients and server share the machine, so on few cores the numbers include
+client overhead; the host's CPU count is recorded with the results.
+
+Usage (from the repo root):
+    python src/integration/twin_loadtest.py --rows 50000 --clients 50 --duration 10
+    python src/integration/twin_loadtest.py --interval 0.2 --baseline data/processed/loadtest/<old>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+INTEGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(INTEGRATION_DIR, ".."))
+from predictive_maintenance import DEFAULT_CRITICALITY, maintenance_schedule
+from sensor_store import STORE_PATH, append_store, write_store
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+OUT_DIR = "data/processed/loadtest"
+HOST = "127.0.0.1"
+
+ROWS = 20000
+COLUMNS = 44
+ANOMALIES = 2000
+CLIENTS = 50
+DURATION = 5.0              # seconds per route
+STREAM_SAMPLES = 25         # rows appended in the stream scenario
+STREAM_PERIOD = 0.2         # seconds between those appends
+STARTUP_TIMEOUT = 60.0
+SAMPLE_FREQ = "10min"
+
+# route name -> (path, extra headers); {start} is the first fixture timestamp
+ROUTES = {
+    "telemetry": ("/api/telemetry", {}),
+    "history": ("/api/history?n=500", {}),
+    "history_range": ("/api/history?start={start}&max_points=500&columns=sensor_0,sensor_1,sensor_2", {}),
+    "rul": ("/api/rul", {}),
+    "anomalies": ("/api/anomalies", {"Accept-Encoding": "gzip"}),
+    "anomalies_304": ("/api/anomalies", {"If-None-Match": "{etag}"}),
+    "anomalies_since": ("/api/anomalies?since={mid}", {"Accept-Encoding": "gzip"}),
+    "maintenance": ("/api/maintenance", {}),
+    "stream": ("/api/stream", {}),
+}
+
+
+# ============================================================
+# FIXTURE DATA
+# ============================================================
+def make_fixture(data_dir, rows=ROWS, columns=COLUMNS, anomalies=ANOMALIES, seed=42):
+    """Write a synthetic processed-data tree under data_dir; returns its description."""
+    rng = np.random.default_rng(seed)
+    processed = os.path.join(data_dir, "processed")
+    os.makedirs(processed, exist_ok=True)
+
+    index = pd.date_range("2022-01-01", periods=rows, freq=SAMPLE_FREQ, name="time_stamp")
+    names = [f"sensor_{i}" for i in range(columns)]
+    values = rng.standard_normal((rows, columns)).astype(np.float32)
+    write_store(pd.DataFrame(values, index=index, columns=names),
+                os.path.join(processed, os.path.basename(STORE_PATH)))
+
+    health = np.clip(1.0 - np.linspace(0, 0.8, rows) + rng.normal(0, 0.01, rows), 0.05, 1.0)
+    rul_df = pd.DataFrame({
+        "timestamp": index.astype(str),
+        "health_index": health,
+        "health_slope_per_hour": np.gradient(health) * 6,
+        "RealTime_RUL_hours": np.linspace(600, 20, rows),
+    })
+    rul_df.to_csv(os.path.join(processed, "realtime_rul.csv"), index=False)
+
+    subsystems = np.array(list(DEFAULT_CRITICALITY))
+    pick = np.sort(rng.choice(rows, size=min(anomalies, rows), replace=False))
+    anom_df = pd.DataFrame({
+        "timestamp": index[pick].astype(str),
+        "anomaly": True,
+        "reconstruction_error": rng.gamma(4.0, 0.5, len(pick)).astype(np.float32),
+        "root_cause_sensors": [",".join(rng.choice(names, 5, replace=False)) for _ in pick],
+        "root_cause_physical": subsystems[rng.integers(0, len(subsystems), len(pick))],
+    })
+    anom_df.to_csv(os.path.join(processed, "anomaly_with_root_cause.csv"), index=False)
+
+    maintenance_schedule(rul_df, anom_df).to_csv(os.path.join(processed, "maintenance_schedule.csv"), index=False)
+
+    return {"rows": rows, "columns": columns, "anomalies": len(pick),
+            "start": str(index[0]), "mid": str(index[rows // 2])}
+
+
+def append_samples(data_dir, k, seed=0):
+    """Append k new rows (one sample period apart) to the fixture store."""
+    from sensor_store import SensorStore
+    path = os.path.join(data_dir, "processed", os.path.basename(STORE_PATH))
+    store = SensorStore(path)
+    index = pd.date_range(store.index[-1], periods=k + 1, freq=SAMPLE_FREQ, name=store.index_name)[1:]
+    values = np.random.default_rng(seed).standard_normal((k, len(store.columns))).astype(np.float32)
+    append_store(pd.DataFrame(values, index=index, columns=store.columns), path)
+    return store.n_rows + k
+
+
+# ============================================================
+# SERVER
+# ============================================================
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir, port):
+    env = dict(os.environ, PM_DATA_DIR=data_dir)
+    cmd = [sys.executable, "-m", "uvicorn", "--app-dir", INTEGRATION_DIR, "digital_twin_api:app",
+           "--host", HOST, "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, env=env)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"❌ Server exited during startup (code {proc.returncode})")
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("❌ Server did not start within %.0fs" % STARTUP_TIMEOUT)
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB, from /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return None
+
+
+async def sample_rss(pid, peaks, interval=0.1):
+    while True:
+        rss = rss_mb(pid)
+        if rss is not None:
+            peaks.append(rss)
+        await asyncio.sleep(interval)
+
+
+# ============================================================
+# HTTP CLIENT (stdlib, keep-alive)
+# ============================================================
+def build_request(path, headers):
+    lines = [f"GET {path} HTTP/1.1", f"Host: {HOST}"] + [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+    body = b""
+    if "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            n = int((await reader.readline()).split(b";")[0], 16)
+            chunks.append((await reader.readexactly(n + 2))[:n])
+            if n == 0:
+                break
+        body = b"".join(chunks)
+    return status, headers, body
+
+
+async def fetch(port, path, headers=None):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(build_request(path, headers or {}))
+        return await read_response(reader)
+    finally:
+        writer.close()
+
+
+async def poll_client(port, request, deadline, interval, result, rng):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        if interval:
+            await asyncio.sleep(rng.random() * interval)
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            writer.write(request)
+            status, _, body = await read_response(reader)
+            dt = time.perf_counter() - t0
+            result["latencies"].append(dt)
+            result["status"][status] = result["status"].get(status, 0) + 1
+            result["bytes"] += len(body)
+            if interval:
+                await asyncio.sleep(max(0.0, interval - dt))
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        result["errors"].append(repr(e))
+    finally:
+        writer.close()
+
+
+async def stream_client(port, received, ready):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(build_request("/api/stream", {}))
+        await reader.readuntil(b"\r\n\r\n")
+        first = True
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"id: "):
+                if first:
+                    ready.release()
+                    first = False
+                else:
+                    received.append((int(line[4:]), time.perf_counter()))
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+# ============================================================
+# SCENARIOS
+# ============================================================
+def summarize(latencies, elapsed, **extra):
+    lat = np.asarray(latencies) * 1e3
+    out = {"requests": len(lat), "rps": len(lat) / elapsed if elapsed else 0.0}
+    if len(lat):
+        out.update({
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "p99_ms": float(np.percentile(lat, 99)),
+            "max_ms": float(lat.max()),
+            "mean_ms": float(lat.mean()),
+        })
+    out.update(extra)
+    return out
+
+
+async def run_route(port, pid, path, headers, clients, duration, interval, seed=0):
+    result = {"latencies": [], "status": {}, "bytes": 0, "errors": []}
+    request = build_request(path, headers)
+    await fetch(port, path, headers)        # warm the server's caches
+    peaks = [rss_mb(pid) or 0.0]
+    sampler = asyncio.create_task(sample_rss(pid, peaks))
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    await asyncio.gather(*[poll_client(port, request, deadline, interval, result, rng) for _ in range(clients)])
+    elapsed = time.perf_counter() - t0
+    sampler.cancel()
+    n = len(result["latencies"])
+    return summarize(
+        result["latencies"], elapsed,
+        status={str(k): v for k, v in sorted(result["status"].items())},
+        errors=len(result["errors"]),
+        mean_bytes=result["bytes"] / n if n else 0,
+        rss_peak_mb=max(peaks),
+    )
+
+
+async def run_stream(port, pid, data_dir, clients, samples=STREAM_SAMPLES, period=STREAM_PERIOD):
+    received = []
+    ready = asyncio.Semaphore(0)
+    tasks = [asyncio.create_task(stream_client(port, received, ready)) for _ in range(clients)]
+    for _ in range(clients):
+        await asyncio.wait_for(ready.acquire(), STARTUP_TIMEOUT)
+
+    peaks = [rss_mb(pid) or 0.0]
+    sampler = asyncio.create_task(sample_rss(pid, peaks))
+    appended = {}
+    t0 = time.perf_counter()
+    for k in range(samples):
+        seq = await asyncio.to_thread(append_samples, data_dir, 1, k)
+        appended[seq] = time.perf_counter()
+        await asyncio.sleep(period)
+    await asyncio.sleep(1.0)                # let the last frames arrive
+    elapsed = time.perf_counter() - t0
+    sampler.cancel()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = [t - appended[seq] for seq, t in received if seq in appended]
+    expected = clients * samples
+    return summarize(latencies, elapsed, frames_expected=expected, frames_received=len(latencies),
+                     rss_peak_mb=max(peaks))
+
+
+async def run_all(port, pid, data_dir, fixture, routes, clients, duration, interval):
+    results = {}
+    etag = (await fetch(port, "/api/anomalies"))[1].get("etag", "")
+    if fixture is None:
+        # existing data: ranges start at its first sample
+        first = json.loads((await fetch(port, "/api/history?cursor=0&n=1"))[2])
+        start = next(iter(first[0].values())) if first else "1970-01-01"
+        fill = {"start": start, "mid": start, "etag": etag}
+    else:
+        fill = dict(fixture, etag=etag)
+    for name in routes:
+        path, headers = ROUTES[name]
+        if name == "stream":
+            if fixture is None:
+                print("⚠️ Skipping stream: it appends rows, so it only runs on generated fixture data")
+                continue
+            results[name] = await run_stream(port, pid, data_dir, clients)
+        else:
+            path = path.format(**fill).replace(" ", "%20")
+            headers = {k: v.format(**fill) for k, v in headers.items()}
+            results[name] = await run_route(port, pid, path, headers, clients, duration, interval)
+        report_line(name, results[name])
+    return results
+
+
+# ============================================================
+# REPORT
+# ============================================================
+def report_line(name, r):
+    if not r["requests"]:
+        print(f"{name:>16}: no responses")
+        return
+    unit = "frames/s" if "frames_expected" in r else "req/s"
+    print(f"{name:>16}: {r['rps']:>9,.0f} {unit:<8} p50 {r['p50_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms  "
+          f"p99 {r['p99_ms']:7.2f} ms  RSS {r['rss_peak_mb']:6.1f} MB")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print("\n📊 Compared with", baseline_path)
+    for name, r in results["routes"].items():
+        b = baseline.get("routes", {}).get(name)
+        if not b or not b.get("requests") or not r.get("requests"):
+            continue
+        print(f"{name:>16}: req/s {r['rps'] / b['rps'] - 1:+7.1%}  p99 {r['p99_ms'] - b['p99_ms']:+8.2f} ms")
+
+
+def main(args):
+    routes = args.routes.split(",") if args.routes else list(ROUTES)
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        raise ValueError(f"❌ Unknown routes: {unknown} (known: {list(ROUTES)})")
+
+    with tempfile.TemporaryDirectory(prefix="twin_loadtest_") as tmp:
+        fixture = None
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = tmp
+            t = time.perf_counter()
+            fixture = make_fixture(data_dir, args.rows, args.columns, args.anomalies)
+            print(f"✅ Fixture: {fixture['rows']:,} rows × {fixture['columns']} sensors, "
+                  f"{fixture['anomalies']:,} anomalies ({time.perf_counter() - t:.1f}s)")
+        data_dir = os.path.abspath(data_dir)
+
+        port = args.port or free_port()
+        server = start_server(data_dir, port)
+        try:
+            idle_rss = rss_mb(server.pid)
+            print(f"✅ Server on {HOST}:{port} (pid {server.pid}, RSS {idle_rss:.1f} MB)")
+            mode = f"every {args.interval}s" if args.interval else "closed loop"
+            print(f"🚀 {args.clients} clients per route, {args.duration}s each, {mode}\n")
+            route_results = asyncio.run(run_all(port, server.pid, data_dir, fixture, routes,
+                                                args.clients, args.duration, args.interval))
+            end_rss = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {"clients": args.clients, "duration": args.duration, "interval": args.interval,
+                   "routes": routes, "data_dir": args.data_dir},
+        "fixture": fixture,
+        "host": {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        "server_rss_mb": {"idle": idle_rss, "end": end_rss},
+        "routes": route_results,
+    }
+    out = args.out or os.path.join(OUT_DIR, f"twin_api_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print("\n📁 Results saved to:", out)
+
+    if args.baseline:
+        compare(results, args.baseline)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the Digital Twin API.")
+    parser.add_argument("--rows", type=int, default=ROWS, help="sensor samples in the fixture")
+    parser.add_argument("--columns", type=int, default=COLUMNS, help="sensor columns in the fixture")
+    parser.add_argument("--anomalies", type=int, default=ANOMALIES, help="anomaly rows in the fixture")
+    parser.add_argument("--clients", type=int, default=CLIENTS, help="concurrent clients per route")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds per route")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="seconds between a client's requests (0 = closed loop; Unity polls at 0.2)")
+    parser.add_argument("--routes", default=None, help=f"comma-separated subset of: {','.join(ROUTES)}")
+    parser.add_argument("--data-dir", default=None,
+                        help="serve an existing data directory instead of generated fixture data")
+    parser.add_argument("--port", type=int, default=0, help="server port (default: a free one)")
+    parser.add_argument("--out", default=None, help=f"results JSON (default: {OUT_DIR}/twin_api_<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+
+    main(parser.parse_args())
@@ -0,0 +1,226 @@
+"""
+twin_stream.py
+
+Server-Sent Events push channel for the digital twin (/api/stream).
+
+A single fan-out task polls the shared data layer (twin_data.py) and, for
+every new sensor sample, encodes one compact twin-state frame once and
+hands the batch of frames of each poll to all subscribers. Every
+subscriber has its own bounded queue: a client that falls QUEUE_SIZE
+polls behind is disconnected instead of stalling the others, and catches
+up when it reconnects.
+
+Frame ids are sample numbers in the sensor store (row index + 1), so a
+reconnecting client's Last-Event-ID stays meaningful across server
+restarts; up to REPLAY_FRAMES missed frames are rebuilt from the data.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+from twin_data import TELEMETRY_DEFAULTS, anomaly_table
+
+POLL_INTERVAL = 0.2         # seconds between checks for new samples
+QUEUE_SIZE = 64             # polls a client may lag before it is dropped
+REPLAY_FRAMES = 1000        # most frames sent to a resuming client
+MAX_BURST = 1000            # most frames published for one batch of new rows
+KEEPALIVE = 15.0            # seconds of silence before a keep-alive comment
+RETRY_MS = 1000             # reconnect delay suggested to EventSource clients
+
+
+def _number(x):
+    # NaN is not valid JSON
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+
+def _rul_arrays(snap):
+    if "stream" not in snap.cache:
+        frame = snap.frame
+        health = frame["health_index"] if "health_index" in frame else pd.Series(np.nan, index=frame.index)
+        rul = frame["RealTime_RUL_hours"] if "RealTime_RUL_hours" in frame else pd.Series(np.nan, index=frame.index)
+        snap.cache["stream"] = (health.to_numpy(dtype=float), rul.to_numpy(dtype=float))
+    return snap.cache["stream"]
+
+
+def _anomaly_items(snap):
+    if "stream" not in snap.cache:
+        table = anomaly_table(snap)
+        snap.cache["stream"] = [
+            {"timestamp": t, "sensors": s, "subsystem": sub}
+            for t, s, sub in zip(table["timestamp"].tolist(), table["sensors"].tolist(), table["subsystem"].tolist())
+        ]
+    return snap.cache["stream"]
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TwinStream:
+    """Fan-out of twin-state frames to SSE subscribers."""
+
+    def __init__(self, data, poll_interval=POLL_INTERVAL, queue_size=QUEUE_SIZE):
+        self.data = data
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.published = 0
+        self.dropped = 0
+        self._task = None
+        self._view = None           # sensor view of the last poll
+        self._n = 0                 # its row count
+        self._last_ts = None        # and its last timestamp
+
+    # -----------------------------
+    # FRAMES
+    # -----------------------------
+    def frames(self, view, i0, i1):
+        """(seq, encoded SSE event) for sample rows i0..i1-1 of a sensor view."""
+        store = view.store
+        if i1 <= i0:
+            return []
+        ts = np.asarray(store.timestamps[i0:i1])
+        values = np.asarray(store.values[i0:i1])
+        pos = [store.columns.index(name) if name in store.columns else None for name in TELEMETRY_DEFAULTS]
+
+        health = rul = r_idx = None
+        rul_snap = self.data.rul.get()
+        if rul_snap is not None and rul_snap.times is not None and len(rul_snap.times):
+            health, rul = _rul_arrays(rul_snap)
+            # latest RUL row at or before each sample
+            r_idx = np.searchsorted(rul_snap.times, ts, side="right") - 1
+
+        items = a_idx = None
+        anom_snap = self.data.anomalies.get()
+        if anom_snap is not None and anom_snap.times is not None and len(anom_snap.times):
+            items = _anomaly_items(anom_snap)
+            # anomalies in (previous sample, sample]
+            prev = store.timestamps[i0 - 1] if i0 else np.iinfo(np.int64).min
+            a_idx = np.searchsorted(anom_snap.times, np.concatenate([[prev], ts]), side="right")
+
+        out = []
+        for k in range(i1 - i0):
+            row = values[k]
+            frame = {
+                "seq": i0 + k + 1,
+                "timestamp": str(pd.Timestamp(int(ts[k]))),
+                "telemetry": {
+                    name: float(row[p]) if p is not None else float(default)
+                    for (name, default), p in zip(TELEMETRY_DEFAULTS.items(), pos)
+                },
+                "health_index": None,
+                "rul_hours": None,
+                "anomalies": [],
+            }
+            if r_idx is not None and r_idx[k] >= 0:
+                frame["health_index"] = _number(health[r_idx[k]])
+                frame["rul_hours"] = _number(rul[r_idx[k]])
+            if a_idx is not None:
+                frame["anomalies"] = items[a_idx[k]:a_idx[k + 1]]
+            body = json.dumps(frame, separators=(",", ":"))
+            out.append((frame["seq"], f"id: {frame['seq']}\nevent: twin\ndata: {body}\n\n".encode()))
+        return out
+
+    # -----------------------------
+    # FAN-OUT TASK
+    # -----------------------------
+    def _track(self, view):
+        self._view, self._n = view, view.store.n_rows
+        self._last_ts = view.store.timestamps[self._n - 1] if self._n else None
+
+    def _poll(self):
+        view = self.data.sensors.get()
+        if view is None or view is self._view:
+            return []
+        n, prev_n = view.store.n_rows, self._n
+        ts = view.store.timestamps
+        rewritten = self._view is None or n < prev_n or (prev_n > 0 and ts[prev_n - 1] != self._last_ts)
+        self._track(view)
+        if n == 0 or n == prev_n and not rewritten:
+            return []
+        if rewritten:
+            # a new store (e.g. pipeline rerun, or the first data): push its current state only
+            return self.frames(view, n - 1, n)
+        return self.frames(view, max(prev_n, n - MAX_BURST), n)
+
+    def _publish(self, frames):
+        self.published += len(frames)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frames)
+            except asyncio.QueueFull:
+                # too far behind: drop it, it resumes from its Last-Event-ID
+                self.subscribers.discard(queue)
+                self.dropped += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _run(self):
+        while True:
+            try:
+                frames = await asyncio.to_thread(self._poll)
+            except Exception as e:
+                print("⚠️ Twin stream poll failed:", e)
+                frames = []
+            if frames:
+                self._publish(frames)
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            # the view polls are compared against; taken now, before any
+            # subscriber's backlog, so rows appended after it are published
+            view = self.data.sensors.get()
+            if view is not None and self._view is None:
+                self._track(view)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    # -----------------------------
+    # SUBSCRIBERS
+    # -----------------------------
+    def _backlog(self, last_id):
+        view = self.data.sensors.get()
+        if view is None or view.store.n_rows == 0:
+            return []
+        n = view.store.n_rows
+        if last_id == n:
+            return []
+        if last_id is None or not 0 <= last_id < n:
+            # new client (or an id from a replaced store): current state
+            return self.frames(view, n - 1, n)
+        return self.frames(view, max(last_id, n - REPLAY_FRAMES), n)
+
+    async def events(self, last_id=None):
+        """Encoded SSE stream for one client, resuming after frame `last_id`."""
+        self.start()
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            backlog = await asyncio.to_thread(self._backlog, _parse_id(last_id))
+            if backlog:
+                yield b"".join(event for _, event in backlog)
+            # frames published while the backlog was built may repeat it
+            skip_until = backlog[-1][0] if backlog else 0
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                events = [event for seq, event in item if seq > skip_until]
+                if events:
+                    skip_until = 0
+                    yield b"".join(events)
+        finally:
+            self.subscribers.discard(queue)
@@ -0,0 +1,166 @@
+"""
+model_client.py
+
+Thin client for model_server.py. Arrays travel as .npy / .npz over one
+kept-alive connection, so scoring a few rows costs a round trip instead
+of importing TensorFlow and loading the models.
+
+    client = ModelClient()                     # http://127.0.0.1:8765
+    client = ModelClient("unix:///tmp/pm.sock")
+    client.score(X)["reconstruction_error"]
+    client.rul(X)["rul"]
+"""
+
+import http.client
+import io
+import json
+import os
+import socket
+import threading
+
+import numpy as np
+
+SERVER_URL = os.environ.get("PM_MODEL_SERVER", "http://127.0.0.1:8765")
+TIMEOUT = 30.0
+
+NPY = "application/x-npy"
+NPZ = "application/x-npz"
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ModelClient:
+    """One persistent connection per thread to the scoring service."""
+
+    def __init__(self, url=SERVER_URL, timeout=TIMEOUT):
+        self.url, self.timeout = url, timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.url.startswith("unix://"):
+                conn = _UnixHTTPConnection(self.url[len("unix://"):], self.timeout)
+            else:
+                host = self.url.split("://", 1)[-1].rstrip("/")
+                conn = http.client.HTTPConnection(host, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, body=None, headers=None):
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # server restarted or dropped the idle connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if resp.status != 200:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError):
+                message = data[:200]
+            raise ModelServerError(f"❌ {path} → {resp.status}: {message}")
+        return resp.getheader("Content-Type", ""), data
+
+    def _post(self, route, X, **params):
+        buf = io.BytesIO()
+        np.save(buf, np.ascontiguousarray(X), allow_pickle=False)
+        headers = {"Content-Type": NPY, "Accept": NPZ, "X-Params": json.dumps(params)}
+        content_type, data = self._request("POST", "/" + route, buf.getvalue(), headers)
+        if not content_type.startswith(NPZ):
+            return json.loads(data)
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            out = {k: npz[k] for k in npz.files}
+        if "columns" in out:
+            out["columns"] = json.loads(str(out["columns"]))
+        return out
+
+    def health(self):
+        return json.loads(self._request("GET", "/health")[1])
+
+    def available(self):
+        try:
+            self.health()
+            return True
+        except (OSError, ModelServerError):
+            return False
+
+    def score(self, X, sensor_error=False, reconstruction=False):
+        """Processed rows → reconstruction_error (+ is_anomaly, threshold, sensor_error, reconstruction)."""
+        return self._post("score", np.asarray(X, dtype=np.float32),
+                          sensor_error=sensor_error, reconstruction=reconstruction)
+
+    def reconstruction_error(self, X):
+        return self.score(X)["reconstruction_error"]
+
+    def rul(self, X, seq_len=None, scaled=False):
+        """Processed rows → RUL for every window X[i:i + seq_len]."""
+        params = {"scaled": scaled}
+        if seq_len is not None:
+            params["seq_len"] = seq_len
+        return self._post("rul", np.asarray(X, dtype=np.float64), **params)
+
+    def preprocess(self, X, columns=None):
+        """Raw sensor rows (columns: their names) → processed rows in the scaler's column order."""
+        params = {"columns": list(columns)} if columns is not None else {}
+        return self._post("preprocess", np.asarray(X, dtype=np.float64), **params)
+
+
+class RemoteModel:
+    """
+    Stand-in for the loaded autoencoder in the pipeline scripts: its predict
+    calls, answered by the server.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def predict_on_batch(self, X):
+        return self.client.score(X, reconstruction=True)["reconstruction"]
+
+    def predict(self, X, batch_size=None, verbose=0):
+        return self.predict_on_batch(X)
+
+    __call__ = predict_on_batch
+
+
+class RemoteRulModel:
+    """
+    Stand-in for the loaded RUL LSTM (inputs already scaled): predictions
+    for every sliding window of a series, answered by the server.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def predict_windows(self, series, seq_len, batch_size=None):
+        return self.client.rul(series, seq_len=seq_len, scaled=True)["rul"].reshape(-1, 1)
+
+
+REMOTE_MODELS = {"autoencoder": RemoteModel, "rul": RemoteRulModel}
+
+
+def connect(url=SERVER_URL, kind="autoencoder"):
+    """Remote stand-in for model `kind` when the server at url answers, else None."""
+    client = ModelClient(url)
+    return REMOTE_MODELS[kind](client) if client.available() else None
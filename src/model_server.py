@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+model_server.py
+
+Long-lived local scoring service: loads the autoencoder, the RUL LSTM (as
+NumPy engine models, no TensorFlow) and the preprocessing artifacts once,
+and serves them over HTTP on localhost or a Unix socket.
+
+ - POST /score       processed rows → reconstruction error (+ per-sensor
+                     error, anomaly flag against models/anomaly_threshold.json)
+ - POST /rul         processed rows → RUL for every window rows[i:i+seq_len]
+ - POST /preprocess  raw sensor rows → imputed, clipped, scaled rows
+ - GET  /health      loaded artifact versions and request counters
+
+Score requests that arrive together are scored in one forward pass
+(micro-batching: a batch closes after BATCH_WINDOW seconds or BATCH_ROWS
+rows). RUL requests run the windows straight off the posted series, in
+chunks of RUL_CHUNK_WINDOWS.
+A watcher thread polls the artifact files and, when one changes (and has
+stopped changing for SETTLE_SECONDS), loads the new version and swaps the
+whole artifact set in one reference assignment - a batch always sees one
+consistent version; a failed load keeps the old one.
+
+Bodies are JSON ({"rows": [[...], ...], "columns": [...]}) or, for bulk
+data, .npy (request) / .npz (response, with Accept: application/x-npz) -
+see model_client.py.
+
+    python src/model_server.py [--port 8765 | --socket /tmp/pm.sock]
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import numpy_engine
+from online_threshold import THRESHOLD_PATH, OnlineThreshold
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+AUTOENCODER_PATH = numpy_engine.AUTOENCODER_PATH
+RUL_MODEL_PATH = numpy_engine.RUL_MODEL_PATH
+RUL_SCALER_PATH = "models/rul_scaler.pkl"
+SCALER_PATH = "models/scaler.joblib"
+IMPUTER_PATH = "models/imputer.joblib"
+CLIP_PATH = "models/clip_bounds.joblib"
+
+RUL_SEQUENCE_LENGTH = 30    # as rul_infer.py
+BATCH_WINDOW = 0.002        # seconds a batch waits for more requests
+BATCH_ROWS = numpy_engine.PREDICT_BATCH
+RUL_CHUNK_WINDOWS = 4 * BATCH_ROWS  # windows per predict_windows call on /rul
+POLL_SECONDS = 1.0          # artifact change checks
+SETTLE_SECONDS = 1.0        # a changed file must be this old before it is loaded
+
+NPY = "application/x-npy"
+NPZ = "application/x-npz"
+
+
+# -----------------------------
+# ARTIFACTS (HOT-SWAPPED)
+# -----------------------------
+ARTIFACTS = {
+    "autoencoder": (AUTOENCODER_PATH, numpy_engine.load_model),
+    "rul_model": (RUL_MODEL_PATH, numpy_engine.load_model),
+    "rul_scaler": (RUL_SCALER_PATH, joblib.load),
+    "scaler": (SCALER_PATH, joblib.load),
+    "imputer": (IMPUTER_PATH, joblib.load),
+    "clip": (CLIP_PATH, joblib.load),
+    "threshold": (THRESHOLD_PATH, OnlineThreshold.load),
+}
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ArtifactRegistry:
+    """The current artifact set; replaced as a whole when a file changes."""
+
+    def __init__(self, artifacts=ARTIFACTS):
+        self.artifacts = artifacts
+        self.current = {"objects": {}, "versions": {}, "generation": 0}
+        self._signatures = {}
+        self.reload(initial=True)
+
+    def reload(self, initial=False):
+        changed = {}
+        for name, (path, _) in self.artifacts.items():
+            sig = _signature(path)
+            if sig == self._signatures.get(name):
+                continue
+            if sig is not None and not initial and time.time() - sig[0] / 1e9 < SETTLE_SECONDS:
+                continue    # still being written; next poll
+            changed[name] = sig
+        if not changed:
+            return False
+
+        objects = dict(self.current["objects"])
+        versions = dict(self.current["versions"])
+        for name, sig in changed.items():
+            path, loader = self.artifacts[name]
+            if sig is None:
+                objects.pop(name, None)
+                versions.pop(name, None)
+            else:
+                try:
+                    objects[name] = loader(path)
+                except Exception as exc:
+                    print(f"⚠️ Could not load {path} ({type(exc).__name__}: {exc}); keeping the previous version")
+                    continue
+                versions[name] = {"path": path, "mtime": sig[0] / 1e9, "size": sig[1]}
+                if not initial:
+                    print(f"✅ Reloaded {name}: {path}")
+            self._signatures[name] = sig
+
+        # one assignment: readers see the old set or the new one, never a mix
+        self.current = {"objects": objects, "versions": versions,
+                        "generation": self.current["generation"] + 1}
+        return True
+
+    def watch(self, interval=POLL_SECONDS):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as exc:
+                    print(f"⚠️ Artifact check failed: {exc}")
+        threading.Thread(target=loop, name="artifact-watcher", daemon=True).start()
+
+
+# -----------------------------
+# MICRO-BATCHING
+# -----------------------------
+class MicroBatcher:
+    """
+    Concatenates the inputs of requests that arrive within `window` seconds
+    and runs fn(registry snapshot, X) once for all of them.
+    """
+
+    def __init__(self, registry, fn, window=BATCH_WINDOW, max_rows=BATCH_ROWS):
+        self.registry, self.fn = registry, fn
+        self.window, self.max_rows = window, max_rows
+        self.queue = queue.Queue()
+        self.batches = 0
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, X):
+        fut = Future()
+        self.queue.put((X, fut))
+        return fut
+
+    def _loop(self):
+        while True:
+            items = [self.queue.get()]
+            rows = len(items[0][0])
+            deadline = time.perf_counter() + self.window
+            while rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                rows += len(items[-1][0])
+
+            snapshot = self.registry.current
+            groups = {}
+            for item in items:
+                # a malformed request must not fail the others: batch by shape
+                groups.setdefault(item[0].shape[1:], []).append(item)
+            for group in groups.values():
+                self._run(snapshot, group)
+
+    def _run(self, snapshot, items):
+        try:
+            out = self.fn(snapshot["objects"], np.concatenate([X for X, _ in items]))
+        except Exception as exc:
+            for _, fut in items:
+                fut.set_exception(exc)
+            return
+        self.batches += 1
+        start = 0
+        for X, fut in items:
+            fut.set_result((out[start:start + len(X)], snapshot["generation"]))
+            start += len(X)
+
+
+def _require(objects, name):
+    if name not in objects:
+        path = ARTIFACTS[name][0]
+        raise FileNotFoundError(f"{name} not loaded ({path} missing)")
+    return objects[name]
+
+
+def _reconstruct(objects, X):
+    return _require(objects, "autoencoder").predict(X)
+
+
+# -----------------------------
+# HANDLERS
+# -----------------------------
+class ScoringService:
+    def __init__(self, registry):
+        self.registry = registry
+        self.ae_batcher = MicroBatcher(registry, _reconstruct)
+        self.rul_batches = 0
+        self.started = time.time()
+        self.requests = {"score": 0, "rul": 0, "preprocess": 0}
+
+    def score(self, X, params):
+        X = np.asarray(X, dtype=np.float32)
+        recon, generation = self.ae_batcher.submit(X).result()
+        error = np.mean(np.square(X - recon), axis=1)
+        out = {"reconstruction_error": error, "generation": generation}
+        threshold = self.registry.current["objects"].get("threshold")
+        if threshold is not None:
+            out["threshold"] = float(threshold.threshold)
+            out["is_anomaly"] = error > threshold.threshold
+        if params.get("sensor_error"):
+            out["sensor_error"] = np.abs(X - recon)
+        if params.get("reconstruction"):
+            out["reconstruction"] = recon
+        return out
+
+    def rul(self, X, params):
+        seq_len = int(params.get("seq_len", RUL_SEQUENCE_LENGTH))
+        current = self.registry.current
+        objects = current["objects"]
+        X = np.asarray(X, dtype=np.float64)
+        if not params.get("scaled"):
+            scaler = _require(objects, "rul_scaler")
+            cols = getattr(scaler, "feature_names_in_", None)
+            X = scaler.transform(pd.DataFrame(X, columns=cols) if cols is not None else X)
+        if len(X) < seq_len:
+            raise ValueError(f"need at least seq_len={seq_len} rows, got {len(X)}")
+        # every window rows[i:i + seq_len], predicted straight off the series
+        # RUL_CHUNK_WINDOWS at a time - the windows are never materialised
+        model = _require(objects, "rul_model")
+        series = X.astype(np.float32)
+        n_windows = len(series) - seq_len + 1
+        rul = []
+        for i in range(0, n_windows, RUL_CHUNK_WINDOWS):
+            rul.append(model.predict_windows(series[i:i + RUL_CHUNK_WINDOWS + seq_len - 1], seq_len).reshape(-1))
+            self.rul_batches += 1
+        return {"rul": np.concatenate(rul), "generation": current["generation"]}
+
+    def preprocess(self, X, params):
+        objects = self.registry.current["objects"]
+        imputer, scaler, clip = (_require(objects, n) for n in ("imputer", "scaler", "clip"))
+        cols = list(scaler.feature_names_in_)
+        columns = params.get("columns")
+        if columns is not None:
+            X = pd.DataFrame(X, columns=columns).reindex(columns=cols).to_numpy(np.float64)
+        X = imputer.transform(pd.DataFrame(X, columns=cols))
+        X = np.clip(X, clip["q_low"][cols].to_numpy(), clip["q_high"][cols].to_numpy())
+        return {"rows": scaler.transform(pd.DataFrame(X, columns=cols)), "columns": cols}
+
+    def health(self):
+        current = self.registry.current
+        return {"status": "ok", "uptime": round(time.time() - self.started, 1),
+                "generation": current["generation"], "artifacts": current["versions"],
+                "requests": self.requests,
+                "batches": {"score": self.ae_batcher.batches, "rul": self.rul_batches}}
+
+
+def _jsonable(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(type(obj).__name__)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"     # keep-alive: the client reuses its connection
+        wbufsize = 1 << 16                # headers + body in one send (no Nagle / delayed-ACK stall)
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def address_string(self):
+            return str(self.client_address)
+
+        def _send(self, code, body, content_type="application/json"):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_result(self, result):
+            if NPZ in self.headers.get("Accept", ""):
+                buf = io.BytesIO()
+                arrays = {k: np.asarray(v) for k, v in result.items() if k != "columns"}
+                if "columns" in result:
+                    arrays["columns"] = np.array(json.dumps(result["columns"]))
+                np.savez(buf, **arrays)
+                self._send(200, buf.getvalue(), NPZ)
+            else:
+                self._send(200, json.dumps(result, default=_jsonable).encode())
+
+        def _error(self, code, message):
+            self._send(code, json.dumps({"error": message}).encode())
+
+        def do_GET(self):
+            if self.path.split("?")[0] == "/health":
+                self._send(200, json.dumps(service.health(), default=_jsonable).encode())
+            else:
+                self._error(404, f"unknown path {self.path}")
+
+        def do_POST(self):
+            route = self.path.split("?")[0].strip("/")
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if route not in service.requests:
+                return self._error(404, f"unknown path {self.path}")
+            try:
+                if self.headers.get("Content-Type", "").startswith(NPY):
+                    X = np.load(io.BytesIO(body), allow_pickle=False)
+                    params = json.loads(self.headers.get("X-Params", "{}"))
+                else:
+                    params = json.loads(body or b"{}")
+                    X = np.asarray(params.pop("rows"), dtype=np.float64)
+                if X.ndim != 2:
+                    raise ValueError(f"rows must be 2-D, got shape {X.shape}")
+                service.requests[route] += 1
+                result = getattr(service, route)(X, params)
+            except (ValueError, KeyError, FileNotFoundError) as exc:
+                return self._error(400, f"{type(exc).__name__}: {exc}")
+            except Exception as exc:
+                return self._error(500, f"{type(exc).__name__}: {exc}")
+            self._send_result(result)
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host=HOST, port=PORT, socket_path=None):
+    t0 = time.perf_counter()
+    registry = ArtifactRegistry()
+    registry.watch()
+    service = ScoringService(registry)
+    print(f"✅ Loaded {len(registry.current['objects'])} artifacts in {time.perf_counter() - t0:.2f}s:",
+          ", ".join(sorted(registry.current["objects"])))
+
+    handler = make_handler(service)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        print("✅ Serving on unix://" + socket_path)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        print(f"✅ Serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident scoring service for the trained models.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", default=None, help="serve on this Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.socket)
@@ -0,0 +1,229 @@
+"""
+numpy_engine.py
+
+TensorFlow-free inference for the project's Keras models.
+
+`export_h5` reads the layer stack (model_config) and weights out of a
+Keras .h5 file with h5py and writes them to a compact .npz next to it.
+`load_model` returns a NumpyModel with the same predict / predict_on_batch
+calls as the Keras model, running a pure float32 NumPy forward pass.
+Only NumPy is needed at inference time; h5py only for exporting.
+
+Supported layers: Dense (relu / linear / sigmoid / tanh) and LSTM;
+Dropout and InputLayer are identities at inference. Models must be a
+linear stack.
+
+Export from the command line:
+    python src/numpy_engine.py models/autoencoder.h5 models/rul_lstm_model.h5
+"""
+
+import json
+import os
+
+import numpy as np
+
+AUTOENCODER_PATH = "models/autoencoder.h5"
+RUL_MODEL_PATH = "models/rul_lstm_model.h5"
+PREDICT_BATCH = 8192        # rows (timesteps for sequence input) per forward pass
+
+IDENTITY_LAYERS = {"InputLayer", "Dropout"}
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+def npz_path_for(h5_path):
+    return os.path.splitext(h5_path)[0] + ".npz"
+
+
+# -----------------------------
+# EXPORT (.h5 → .npz)
+# -----------------------------
+def _layer_weights(weights_group, name):
+    group = weights_group[name]
+    return [np.asarray(group[w], dtype=np.float32) for w in group.attrs.get("weight_names", [])]
+
+
+def export_h5(h5_path, npz_path=None):
+    """Write the layer specs and weights of a Keras .h5 model to an .npz."""
+    import h5py
+
+    npz_path = npz_path or npz_path_for(h5_path)
+    with h5py.File(h5_path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        weights_group = f["model_weights"] if "model_weights" in f else f
+
+        layers, arrays = [], {}
+        for layer in config["config"]["layers"]:
+            kind, cfg = layer["class_name"], layer["config"]
+            if kind in IDENTITY_LAYERS:
+                continue
+            if kind not in ("Dense", "LSTM"):
+                raise ValueError(f"❌ Unsupported layer type for NumPy export: {kind}")
+            spec = {"type": kind, "name": cfg["name"], "activation": cfg.get("activation", "linear")}
+            if kind == "LSTM":
+                if cfg.get("go_backwards") or cfg.get("stateful"):
+                    raise ValueError(f"❌ Unsupported LSTM options in {cfg['name']}")
+                spec["recurrent_activation"] = cfg.get("recurrent_activation", "sigmoid")
+                spec["return_sequences"] = bool(cfg.get("return_sequences", False))
+            for key in ("activation", "recurrent_activation"):
+                if spec.get(key, "linear") not in ACTIVATIONS:
+                    raise ValueError(f"❌ Unsupported activation: {spec[key]}")
+
+            weights = _layer_weights(weights_group, cfg["name"])
+            i = len(layers)
+            n_out = weights[0].shape[1]
+            arrays[f"{i}_kernel"] = weights[0]
+            if kind == "LSTM":
+                # kernel, recurrent_kernel, bias; gates in Keras order i, f, c, o
+                arrays[f"{i}_recurrent_kernel"] = weights[1]
+                weights = weights[:1] + weights[2:]
+            arrays[f"{i}_bias"] = weights[1] if len(weights) > 1 else np.zeros(n_out, np.float32)
+            layers.append(spec)
+
+    spec = {"source": os.path.basename(h5_path), "layers": layers}
+    np.savez(npz_path, spec=np.array(json.dumps(spec)), **arrays)
+    return npz_path
+
+
+# -----------------------------
+# NUMPY MODEL
+# -----------------------------
+def _dense(x, layer, w):
+    x = x @ w["kernel"]
+    x += w["bias"]
+    return ACTIVATIONS[layer["activation"]](x)
+
+
+def _lstm(x, layer, w):
+    """
+    x: (batch, timesteps, features). The input projection of every timestep
+    is one matmul up front; each step then adds a single fused h @ U for
+    all four gates.
+    """
+    batch, steps, _ = x.shape
+    kernel = w["kernel"]
+    z_in = (x.reshape(batch * steps, x.shape[2]) @ kernel).reshape(batch, steps, kernel.shape[1])
+    z_in += w["bias"]
+    return _lstm_recurrence(z_in, layer, w)
+
+
+def _lstm_recurrence(z_in, layer, w):
+    """Recurrent part of an LSTM over precomputed input projections (batch, timesteps, 4 * units)."""
+    batch, steps, _ = z_in.shape
+    U = w["recurrent_kernel"]
+    units = U.shape[0]
+    act = ACTIVATIONS[layer["activation"]]
+    rec_act = ACTIVATIONS[layer["recurrent_activation"]]
+
+    h = np.zeros((batch, units), np.float32)
+    c = np.zeros((batch, units), np.float32)
+    seq = np.empty((batch, steps, units), np.float32) if layer["return_sequences"] else None
+    for t in range(steps):
+        z = z_in[:, t] + h @ U
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        g = act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * act(c)
+        if seq is not None:
+            seq[:, t] = h
+    return seq if seq is not None else h
+
+
+FORWARD = {"Dense": _dense, "LSTM": _lstm}
+
+
+class NumpyModel:
+    """Forward pass over exported weights; mirrors the Keras predict API."""
+
+    def __init__(self, npz_path):
+        self.path = npz_path
+        with np.load(npz_path) as data:
+            spec = json.loads(str(data["spec"]))
+            self.layers = []
+            for i, layer in enumerate(spec["layers"]):
+                prefix = f"{i}_"
+                weights = {k[len(prefix):]: data[k] for k in data.files if k.startswith(prefix)}
+                self.layers.append((layer, weights))
+
+    def predict_on_batch(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        for layer, weights in self.layers:
+            x = FORWARD[layer["type"]](x, layer, weights)
+        return x
+
+    def predict(self, X, batch_size=PREDICT_BATCH, verbose=0):
+        # batched, so intermediate activations stay bounded for long inputs
+        X = np.asarray(X, dtype=np.float32)
+        step = max(1, batch_size // int(np.prod(X.shape[1:-1], dtype=np.int64)))
+        if len(X) <= step:
+            return self.predict_on_batch(X)
+        return np.concatenate([self.predict_on_batch(X[i:i + step])
+                               for i in range(0, len(X), step)])
+
+    def predict_windows(self, series, seq_len, batch_size=PREDICT_BATCH):
+        """
+        Predictions for every sliding window series[i:i + seq_len], i in
+        range(len(series) - seq_len + 1), without materialising the windows.
+        When the first layer is an LSTM its input projection is computed
+        once per row instead of once per (row, window) - seq_len times less
+        work for the dominant matmul.
+        """
+        series = np.asarray(series, dtype=np.float32)
+        n_windows = len(series) - seq_len + 1
+        if n_windows <= 0:
+            return self.predict_on_batch(np.zeros((0, seq_len, series.shape[1]), np.float32))
+
+        first, w = self.layers[0]
+        if first["type"] != "LSTM":
+            windows = np.lib.stride_tricks.sliding_window_view(series, seq_len, axis=0)
+            return self.predict(windows.transpose(0, 2, 1), batch_size)
+
+        z_rows = series @ w["kernel"]
+        z_rows += w["bias"]
+        # (n_windows, seq_len, 4 * units) view over the per-row projections
+        z_windows = np.lib.stride_tricks.sliding_window_view(z_rows, seq_len, axis=0).transpose(0, 2, 1)
+
+        step = max(1, batch_size // seq_len)
+        out = []
+        for i in range(0, n_windows, step):
+            x = _lstm_recurrence(z_windows[i:i + step], first, w)
+            for layer, weights in self.layers[1:]:
+                x = FORWARD[layer["type"]](x, layer, weights)
+            out.append(x)
+        return np.concatenate(out)
+
+    __call__ = predict_on_batch
+
+
+def load_model(path):
+    """
+    NumpyModel for a .npz, or for a .h5 via its sibling .npz - which is
+    (re-)exported first when missing or older than the .h5.
+    """
+    if path.endswith(".npz"):
+        return NumpyModel(path)
+
+    npz_path = npz_path_for(path)
+    if not os.path.exists(npz_path) or (
+        os.path.exists(path) and os.path.getmtime(npz_path) < os.path.getmtime(path)
+    ):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"❌ No model at {path} or {npz_path}")
+        print(f"✅ Exporting {path} → {npz_path}")
+        export_h5(path, npz_path)
+    return NumpyModel(npz_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for h5 in sys.argv[1:] or [AUTOENCODER_PATH, RUL_MODEL_PATH]:
+        out = export_h5(h5)
+        print(f"✅ {h5} → {out} ({os.path.getsize(out) / 2 ** 20:.1f} MB)")
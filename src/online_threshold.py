@@ -0,0 +1,237 @@
+"""
+online_threshold.py
+
+Stateful anomaly threshold for per-sample reconstruction-error scoring.
+
+Keeps running moments of the error (Welford / Chan merges) and, optionally,
+a streaming quantile sketch, so every new sample is classified in O(1)
+against the current threshold instead of waiting for a batch rerun:
+
+ - frozen   : the threshold is fixed when the state is fitted
+ - adaptive : non-anomalous samples keep feeding the statistics and the
+              threshold is refreshed every `refresh_every` of them, so it
+              follows slow drift without being dragged up by anomalies
+
+The rule is mean + sigma * std (the batch rule of infer.py) or, with
+`quantile`, the sketch's q-quantile of the error. State is saved as JSON
+next to the model (models/anomaly_threshold.json).
+
+Fit a state from the errors written by the streaming scorer:
+    python src/online_threshold.py [--adaptive] [--quantile 0.999]
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import QuantileSketch
+
+THRESHOLD_PATH = "models/anomaly_threshold.json"
+ERROR_PATH = "data/processed/reconstruction_error.csv"
+THRESHOLD_SIGMA = 4.0
+REFRESH_EVERY = 256         # accepted samples between adaptive threshold refreshes
+SKETCH_ALPHA = 0.01         # relative accuracy of the quantile threshold
+STATE_VERSION = 1
+
+
+def merge_moments(moments, values):
+    """Chan/Welford merge of (count, mean, M2) with a block of values."""
+    n_a, mean_a, m2_a = moments
+    n_b = len(values)
+    if n_b == 0:
+        return moments
+    mean_b = float(np.mean(values, dtype=np.float64))
+    m2_b = float(np.sum((values - mean_b) ** 2, dtype=np.float64))
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+
+
+class OnlineThreshold:
+    """Running error statistics + the threshold derived from them."""
+
+    def __init__(self, sigma=THRESHOLD_SIGMA, quantile=None, adaptive=False,
+                 refresh_every=REFRESH_EVERY, sketch_alpha=SKETCH_ALPHA):
+        self.sigma = float(sigma)
+        self.quantile = quantile
+        self.adaptive = bool(adaptive)
+        self.refresh_every = int(refresh_every)
+
+        self.moments = (0, 0.0, 0.0)
+        self.sketch = QuantileSketch(1, sketch_alpha) if quantile is not None else None
+        self.threshold = np.inf
+        self.seen = 0
+        self.anomalies = 0
+        self._since_refresh = 0
+        self._pending = []          # accepted samples not yet in the sketch
+
+    # -----------------------------
+    # STATISTICS
+    # -----------------------------
+    @property
+    def mean(self):
+        return self.moments[1]
+
+    @property
+    def std(self):
+        n, _, m2 = self.moments
+        return float(np.sqrt(m2 / n)) if n else 0.0
+
+    def _flush(self):
+        if self.sketch is not None and self._pending:
+            self.sketch.update(np.concatenate(self._pending)[:, None])
+        self._pending = []
+
+    def _refresh(self):
+        self._flush()
+        if self.moments[0] == 0:
+            return
+        if self.quantile is not None:
+            self.threshold = float(self.sketch.quantile(self.quantile)[0])
+        else:
+            self.threshold = self.mean + self.sigma * self.std
+        self._since_refresh = 0
+
+    def _accept(self, values):
+        self.moments = merge_moments(self.moments, values)
+        if self.sketch is not None:
+            self._pending.append(np.asarray(values, dtype=np.float64))
+
+    def fit(self, errors):
+        """(Re)set the statistics and the threshold from reference errors."""
+        errors = np.asarray(errors, dtype=np.float64)
+        errors = errors[~np.isnan(errors)]
+        self.moments = (0, 0.0, 0.0)
+        if self.sketch is not None:
+            self.sketch = QuantileSketch(1, self.sketch.alpha)
+        self._pending = []
+        self._accept(errors)
+        self._refresh()
+        return self
+
+    def fit_classify(self, errors):
+        """
+        fit() on a batch, then classify that batch against the fitted
+        threshold; the samples are counted once, not added a second time.
+        """
+        self.fit(errors)
+        flags = np.asarray(errors, dtype=np.float64) > self.threshold
+        self.seen += len(flags)
+        self.anomalies += int(flags.sum())
+        return flags
+
+    # -----------------------------
+    # SCORING
+    # -----------------------------
+    def update(self, error):
+        """Classify one sample, then fold it into the statistics if adaptive."""
+        is_anomaly = bool(error > self.threshold)
+        self.seen += 1
+        self.anomalies += is_anomaly
+        if self.adaptive and not is_anomaly and not np.isnan(error):
+            self._accept(np.array([error], dtype=np.float64))
+            self._since_refresh += 1
+            if self._since_refresh >= self.refresh_every:
+                self._refresh()
+        return is_anomaly
+
+    def update_many(self, errors):
+        """
+        Same result as calling update() per sample, vectorized between
+        threshold refreshes.
+        """
+        errors = np.asarray(errors, dtype=np.float64)
+        flags = errors > self.threshold
+        if not self.adaptive:
+            self.seen += len(errors)
+            self.anomalies += int(flags.sum())
+            return flags
+
+        i = 0
+        while i < len(errors):
+            seg = errors[i:]
+            seg_flags = seg > self.threshold
+            accepted = ~seg_flags & ~np.isnan(seg)
+            # the refresh happens right after the refresh_every-th accepted sample
+            hits = np.flatnonzero(np.cumsum(accepted) == self.refresh_every - self._since_refresh)
+            end = hits[0] + 1 if len(hits) else len(seg)
+
+            flags[i:i + end] = seg_flags[:end]
+            self.seen += end
+            self.anomalies += int(seg_flags[:end].sum())
+            self._accept(seg[:end][accepted[:end]])
+            self._since_refresh += int(accepted[:end].sum())
+            if len(hits):
+                self._refresh()
+            i += end
+        return flags
+
+    # -----------------------------
+    # PERSISTENCE
+    # -----------------------------
+    def to_dict(self):
+        self._flush()
+        count, mean, m2 = self.moments
+        return {
+            "version": STATE_VERSION,
+            "sigma": self.sigma,
+            "quantile": self.quantile,
+            "adaptive": self.adaptive,
+            "refresh_every": self.refresh_every,
+            "threshold": self.threshold if np.isfinite(self.threshold) else None,
+            "count": count,
+            "mean": mean,
+            "m2": m2,
+            "seen": self.seen,
+            "anomalies": self.anomalies,
+            "since_refresh": self._since_refresh,
+            "sketch": self.sketch.to_dict() if self.sketch is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state["sigma"], state["quantile"], state["adaptive"], state["refresh_every"])
+        obj.threshold = state["threshold"] if state["threshold"] is not None else np.inf
+        obj.moments = (state["count"], state["mean"], state["m2"])
+        obj.seen = state["seen"]
+        obj.anomalies = state["anomalies"]
+        obj._since_refresh = state["since_refresh"]
+        if state["sketch"] is not None:
+            obj.sketch = QuantileSketch.from_dict(state["sketch"])
+        return obj
+
+    def save(self, path=THRESHOLD_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path=THRESHOLD_PATH):
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit the online anomaly threshold from scored errors.")
+    parser.add_argument("--errors", default=ERROR_PATH, help="CSV with a reconstruction_error column")
+    parser.add_argument("--out", default=THRESHOLD_PATH)
+    parser.add_argument("--sigma", type=float, default=THRESHOLD_SIGMA)
+    parser.add_argument("--quantile", type=float, default=None,
+                        help="use this quantile of the error instead of mean + sigma * std")
+    parser.add_argument("--adaptive", action="store_true", help="keep adapting the threshold while scoring")
+    parser.add_argument("--refresh-every", type=int, default=REFRESH_EVERY)
+    args = parser.parse_args()
+
+    errors = pd.read_csv(args.errors, usecols=["reconstruction_error"])["reconstruction_error"].values
+    state = OnlineThreshold(args.sigma, args.quantile, args.adaptive, args.refresh_every).fit(errors)
+    state.save(args.out)
+    print(f"✅ Threshold {state.threshold:.6f} from {len(errors)} errors "
+          f"({'adaptive' if state.adaptive else 'frozen'})")
+    print("📁 Saved to:", args.out)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+pipeline.py
+
+Dependency-aware runner for the processing chain
+
+    preprocess → infer → build_health_index → realtime_rul
+        → predictive_maintenance | generate_health_report | generate_unity_telemetry
+
+Each stage declares its input and output files. A stage is skipped when
+its key - a hash of its command, its code (the script plus the project
+modules it imports, transitively) and the content of its inputs - matches
+the last successful run and its outputs are still the files that run
+wrote. A stage that reruns but writes byte-identical outputs therefore
+does not invalidate the stages after it.
+
+File hashes are cached by (size, mtime) in the state file, so an unchanged
+tree costs one stat per file. Stages whose dependencies are done run in
+parallel (the three leaf stages at the end). Per-stage timings and logs:
+ - data/processed/pipeline_state.json
+ - data/processed/pipeline_logs/<stage>.log
+
+    python src/pipeline.py [--force STAGE ...] [--only STAGE ...] [--dry-run]
+
+--in-process instead runs infer → health index → RUL → maintenance + report
+in this process, handing DataFrames from stage to stage (no intermediate
+CSV is parsed), and writes the usual output files once at the end.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = "data/processed/pipeline_state.json"
+LOG_DIR = "data/processed/pipeline_logs"
+
+STORE = "data/processed/44_processed.store"
+ANOMALIES = "data/processed/anomaly_with_root_cause.csv"
+HEALTH = "data/processed/health_index.csv"
+RUL = "data/processed/realtime_rul.csv"
+
+# name → script, deps, inputs, outputs (paths relative to the repo root)
+STAGES = {
+    "preprocess": {
+        "script": "src/preprocess.py", "deps": [],
+        "inputs": ["data/raw/44.csv"],
+        "outputs": [STORE, "models/scaler.joblib", "models/imputer.joblib", "models/clip_bounds.joblib"],
+    },
+    "infer": {
+        "script": "src/infer.py", "deps": ["preprocess"],
+        "inputs": [STORE, "models/autoencoder.h5", "data/sensor_cluster_map.json"],
+        "outputs": [ANOMALIES],
+    },
+    "health_index": {
+        "script": "src/build_health_index.py", "deps": ["infer"],
+        "inputs": [ANOMALIES],
+        "outputs": [HEALTH, "data/processed/health_index_state.json"],
+    },
+    "realtime_rul": {
+        "script": "src/realtime_rul.py", "deps": ["health_index"],
+        "inputs": [HEALTH],
+        "outputs": [RUL],
+    },
+    "maintenance": {
+        "script": "src/predictive_maintenance.py", "deps": ["realtime_rul", "infer"],
+        "inputs": [RUL, ANOMALIES],
+        "outputs": ["data/processed/maintenance_schedule.csv"],
+    },
+    "report": {
+        "script": "src/generate_health_report.py", "deps": ["health_index", "realtime_rul", "infer"],
+        "inputs": [HEALTH, RUL, ANOMALIES],
+        "outputs": ["data/processed/health_report.html", "data/processed/health_report_summary.csv"],
+    },
+    "unity_telemetry": {
+        "script": "src/integration/generate_unity_telemetry.py", "deps": ["realtime_rul"],
+        "inputs": [RUL],
+        "outputs": ["data/processed/telemetry_history.csv"],
+    },
+}
+
+
+# -----------------------------
+# HASHING (CACHED BY SIZE + MTIME)
+# -----------------------------
+class FileHasher:
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+
+    def file(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.cache.get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha1"]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+        return h.hexdigest()
+
+    def path(self, path):
+        """Hash of a file, or of every file under a directory (e.g. the binary store)."""
+        if not os.path.isdir(path):
+            return self.file(path)
+        h = hashlib.sha1()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                p = os.path.join(root, name)
+                h.update(f"{os.path.relpath(p, path)}:{self.file(p)}\n".encode())
+        return h.hexdigest()
+
+
+def code_files(script, _seen=None):
+    """The script and the project modules (in src/) it imports, transitively."""
+    seen = _seen if _seen is not None else set()
+    if script in seen or not os.path.exists(script):
+        return seen
+    seen.add(script)
+    with open(script, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            for base in (os.path.dirname(script), SRC_DIR):
+                candidate = os.path.join(base, *name.split(".")) + ".py"
+                if os.path.exists(candidate):
+                    code_files(os.path.relpath(candidate), seen)
+                    break
+    return seen
+
+
+def stage_key(name, stage, hasher):
+    parts = {
+        "script": stage["script"],
+        "code": {p: hasher.file(p) for p in sorted(code_files(stage["script"]))},
+        "inputs": {p: hasher.path(p) for p in stage["inputs"]},
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# -----------------------------
+# STATE
+# -----------------------------
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {"files": {}, "stages": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def is_fresh(name, stage, key, state, hasher):
+    last = state["stages"].get(name)
+    if not last or last.get("status") != "ok" or last.get("key") != key:
+        return False
+    # outputs must still be exactly what that run wrote
+    return all(hasher.path(p) == last["outputs"].get(p) for p in stage["outputs"])
+
+
+def run_stage(name, stage, log_dir=LOG_DIR):
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{name}.log")
+    t0 = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run([sys.executable, stage["script"]], stdout=log, stderr=subprocess.STDOUT,
+                              env={**os.environ, "MPLBACKEND": os.environ.get("MPLBACKEND", "Agg")})
+    return proc.returncode, time.perf_counter() - t0, log_path
+
+
+# -----------------------------
+# RUNNER
+# -----------------------------
+def run(stages=STAGES, force=(), only=None, dry_run=False, workers=None, state_path=STATE_PATH):
+    t_start = time.perf_counter()
+    state = load_state(state_path)
+    hasher = FileHasher(state.get("files"))
+
+    selected = set(only) if only else set(stages)
+    pending = {n for n in stages if n in selected}
+    done, failed, timings = set(n for n in stages if n not in selected), set(), {}
+    would_run = set()           # dry run: stages that would run, so their dependants would too
+
+    def ready():
+        return sorted(n for n in pending if all(d in done for d in stages[n]["deps"]))
+
+    with ThreadPoolExecutor(max_workers=workers or len(stages)) as pool:
+        running = {}
+        while pending or running:
+            for name in ready():
+                pending.discard(name)
+                stage = stages[name]
+                if dry_run and would_run.intersection(stage["deps"]):
+                    # its inputs would be rewritten first: fresh now says nothing
+                    print(f"⚠️ {name}: would run (upstream stale)")
+                    timings[name] = {"status": "stale", "seconds": 0.0}
+                    would_run.add(name)
+                    done.add(name)
+                    continue
+                key = stage_key(name, stage, hasher)
+                if name not in force and is_fresh(name, stage, key, state, hasher):
+                    print(f"✅ {name}: up to date")
+                    timings[name] = {"status": "cached", "seconds": 0.0}
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"⚠️ {name}: would run")
+                    timings[name] = {"status": "stale", "seconds": 0.0}
+                    would_run.add(name)
+                    done.add(name)
+                    continue
+                print(f"▶ {name}: running {stage['script']}")
+                running[pool.submit(run_stage, name, stage)] = (name, key)
+
+            if not running:
+                if ready():
+                    continue    # unblocked by stages that were up to date
+                if pending:
+                    # every remaining stage depends on a failed one
+                    for name in sorted(pending):
+                        print(f"⚠️ {name}: skipped (upstream failed)")
+                        timings[name] = {"status": "skipped", "seconds": 0.0}
+                    pending.clear()
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, key = running.pop(fut)
+                code, seconds, log_path = fut.result()
+                stage = stages[name]
+                if code == 0:
+                    outputs = {p: hasher.path(p) for p in stage["outputs"]}
+                    missing = [p for p, h in outputs.items() if h is None]
+                    if missing:
+                        print(f"⚠️ {name}: finished but did not write {missing}")
+                    state["stages"][name] = {
+                        "status": "ok", "key": key, "outputs": outputs, "seconds": round(seconds, 3),
+                        "ran_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    }
+                    timings[name] = {"status": "ran", "seconds": round(seconds, 3)}
+                    done.add(name)
+                    print(f"✅ {name}: done in {seconds:.2f}s")
+                else:
+                    state["stages"][name] = {"status": "failed", "key": key, "seconds": round(seconds, 3)}
+                    timings[name] = {"status": "failed", "seconds": round(seconds, 3)}
+                    failed.add(name)
+                    print(f"❌ {name}: exit code {code} - see {log_path}")
+                    with open(log_path, "r", errors="replace") as f:
+                        print("".join(f.readlines()[-10:]).rstrip())
+                    # its dependants stay pending and are reported as skipped
+
+    state["files"] = hasher.cache
+    state["last_run"] = {
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "total_seconds": round(time.perf_counter() - t_start, 3),
+        "stages": timings,
+    }
+    if not dry_run:
+        save_state(state, state_path)
+
+    print(f"\n✅ Pipeline finished in {state['last_run']['total_seconds']:.2f}s")
+    for name in stages:
+        if name in timings:
+            t = timings[name]
+            print(f"   {name:<16} {t['status']:<8} {t['seconds']:>8.2f}s")
+    return not failed, state["last_run"]
+
+
+# -----------------------------
+# IN-PROCESS CHAIN
+# -----------------------------
+def run_in_process(causal=False, write=True):
+    """
+    The chain through the library functions, frames passed in memory:
+    every stage of STAGES after preprocess. Returns the frames; writes the
+    stage outputs (CSVs, health state, report, plots) only when `write`.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "integration"))
+    import build_health_index
+    import generate_health_report
+    import generate_unity_telemetry
+    import infer
+    import predictive_maintenance
+    import realtime_rul
+    from health_index import STATE_PATH as HEALTH_STATE_PATH
+    from sensor_store import load_processed
+
+    timings = {}
+
+    def timed(name, fn, *a, **kw):
+        t0 = time.perf_counter()
+        out = fn(*a, **kw)
+        timings[name] = round(time.perf_counter() - t0, 3)
+        print(f"✅ {name}: {timings[name]:.2f}s")
+        return out
+
+    t_start = time.perf_counter()
+    df = timed("load", load_processed)
+    model = infer.load_autoencoder()
+    anom_df, _ = timed("infer", infer.detect_anomalies, df, model, infer.load_sensor_map())
+    health_df, health_state = timed("health_index", build_health_index.build_health_index, anom_df)
+    rul_df = timed("realtime_rul", realtime_rul.realtime_rul, health_df, causal)
+    sched_df = timed("maintenance", predictive_maintenance.maintenance_schedule, rul_df, anom_df)
+    report = timed("report", generate_health_report.compute_report, health_df, rul_df, anom_df)
+    telemetry_df = timed("unity_telemetry", generate_unity_telemetry.unity_telemetry, rul_df)
+
+    if write:
+        t0 = time.perf_counter()
+        anom_df.to_csv(infer.OUTPUT_PATH, index=False)
+        health_df.to_csv(build_health_index.OUT_PATH, index=False)
+        health_state.save(HEALTH_STATE_PATH)
+        rul_df.to_csv(realtime_rul.OUT_PATH, index=False)
+        sched_df.to_csv(predictive_maintenance.OUT_PATH, index=False)
+        generate_health_report.save_report(report)
+        telemetry_df.to_csv(generate_unity_telemetry.OUTPUT_CSV, index=False)
+        timings["write"] = round(time.perf_counter() - t0, 3)
+        print(f"✅ write outputs: {timings['write']:.2f}s")
+
+    print(f"\n✅ In-process pipeline finished in {time.perf_counter() - t_start:.2f}s "
+          f"({len(anom_df)} anomalies, latest RUL {rul_df['RealTime_RUL_hours'].iloc[-1]:.1f} h)")
+    return {"anomalies": anom_df, "health": health_df, "rul": rul_df, "schedule": sched_df,
+            "report": report["summary"], "telemetry": telemetry_df, "timings": timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the processing chain, skipping up-to-date stages.")
+    parser.add_argument("--force", nargs="*", default=[], help="rerun these stages even if up to date")
+    parser.add_argument("--only", nargs="*", default=None, help="consider only these stages")
+    parser.add_argument("--dry-run", action="store_true", help="report which stages would run")
+    parser.add_argument("--workers", type=int, default=None, help="parallel stages (default: all ready)")
+    parser.add_argument("--list", action="store_true", help="list the stages and exit")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the chain in this process, passing DataFrames between stages")
+    args = parser.parse_args()
+
+    if args.in_process:
+        run_in_process()
+        raise SystemExit(0)
+
+    if args.list:
+        for name, stage in STAGES.items():
+            print(f"{name:<16} {stage['script']:<45} after: {', '.join(stage['deps']) or '-'}")
+        raise SystemExit(0)
+
+    unknown = (set(args.force) | set(args.only or [])) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"❌ Unknown stages: {sorted(unknown)}")
+
+    ok, _ = run(force=set(args.force), only=args.only, dry_run=args.dry_run, workers=args.workers)
+    raise SystemExit(0 if ok else 1)
@@ -22,6 +22,8 @@ RUL_PATH = "data/processed/realtime_rul.csv"
 ANOMALY_PATH = "data/processed/anomaly_with_root_cause.csv"
 OUT_PATH = "data/processed/maintenance_schedule.csv"
 
+LOOKBACK_DAYS = 30          # window of "recent" anomalies
+
 # ==============================
 # SUBSYSTEM CRITICALITY
 # ==============================
@@ -70,147 +72,160 @@ def detect_subsystem_column(df):
 
 
 # ==============================
-# LOAD DATA
-# ==============================
-if not os.path.exists(RUL_PATH):
-    raise FileNotFoundError(f"Missing file: {RUL_PATH}")
-
-if not os.path.exists(ANOMALY_PATH):
-    raise FileNotFoundError(f"Missing file: {ANOMALY_PATH}")
-
-rul_df = pd.read_csv(RUL_PATH)
-anom_df = pd.read_csv(ANOMALY_PATH)
-
-rul_df = normalize_timestamp(rul_df)
-anom_df = normalize_timestamp(anom_df)
-
-rul_df = rul_df.dropna(subset=["time_stamp"])
-anom_df = anom_df.dropna(subset=["time_stamp"])
-
-# ==============================
-# RUL COLUMN SAFETY
-# ==============================
-if "RealTime_RUL_hours" not in rul_df.columns:
-    alt = [c for c in rul_df.columns if "rul" in c.lower()]
-    if not alt:
-        raise ValueError("No RUL column found in realtime_rul.csv")
-    rul_df = rul_df.rename(columns={alt[0]: "RealTime_RUL_hours"})
-
-# ==============================
-# SUBSYSTEM COLUMN SAFETY
-# ==============================
-subsystem_col = detect_subsystem_column(anom_df)
+# SCHEDULE
+# ==============================
+def maintenance_schedule(rul_df, anom_df, criticality_map=DEFAULT_CRITICALITY, lookback_days=LOOKBACK_DAYS):
+    """
+    maintenance_schedule.csv frame from the real-time RUL and the anomaly/RCA
+    rows: one row per subsystem, highest priority first.
+    """
+    rul_df = normalize_timestamp(rul_df.copy())
+    anom_df = normalize_timestamp(anom_df.copy())
+
+    rul_df = rul_df.dropna(subset=["time_stamp"])
+    anom_df = anom_df.dropna(subset=["time_stamp"])
+
+    # ==============================
+    # RUL COLUMN SAFETY
+    # ==============================
+    if "RealTime_RUL_hours" not in rul_df.columns:
+        alt = [c for c in rul_df.columns if "rul" in c.lower()]
+        if not alt:
+            raise ValueError("No RUL column found in realtime_rul.csv")
+        rul_df = rul_df.rename(columns={alt[0]: "RealTime_RUL_hours"})
+
+    # ==============================
+    # SUBSYSTEM COLUMN SAFETY
+    # ==============================
+    subsystem_col = detect_subsystem_column(anom_df)
+
+    if subsystem_col is None:
+        anom_df["pred_subsystem"] = "UNKNOWN"
+        subsystem_col = "pred_subsystem"
+
+    # ==============================
+    # BASE RUL & TIME
+    # ==============================
+    latest_row = rul_df.sort_values("time_stamp").iloc[-1]
+    now_ts = latest_row["time_stamp"]
+    base_rul = float(latest_row["RealTime_RUL_hours"])
+
+    MAX_RUL = max(1.0, base_rul)
+
+    # ==============================
+    # RECENT ANOMALIES (30 DAYS)
+    # ==============================
+    time_cut = now_ts - pd.Timedelta(days=lookback_days)
+
+    recent_anom = anom_df[anom_df["time_stamp"] >= time_cut]
+
+    anom_stats = (
+        recent_anom
+        .groupby(subsystem_col)
+        .agg(
+            recent_anom_count=("time_stamp", "count"),
+            last_anomaly_time=("time_stamp", "max")
+        )
+        .reset_index()
+    )
 
-if subsystem_col is None:
-    anom_df["pred_subsystem"] = "UNKNOWN"
-    subsystem_col = "pred_subsystem"
+    # ==============================
+    # MAINTENANCE SCHEDULING
+    # ==============================
+    records = []
 
-# ==============================
-# BASE RUL & TIME
-# ==============================
-latest_row = rul_df.sort_values("time_stamp").iloc[-1]
-now_ts = latest_row["time_stamp"]
-base_rul = float(latest_row["RealTime_RUL_hours"])
+    for subsystem, criticality in criticality_map.items():
 
-MAX_RUL = max(1.0, base_rul)
+        row = anom_stats[anom_stats[subsystem_col] == subsystem]
 
-# ==============================
-# RECENT ANOMALIES (30 DAYS)
-# ==============================
-LOOKBACK_DAYS = 30
-time_cut = now_ts - pd.Timedelta(days=LOOKBACK_DAYS)
+        if len(row) == 0:
+            anom_count = 0
+            recency_factor = 0.1
+        else:
+            anom_count = int(row["recent_anom_count"].iloc[0])
 
-recent_anom = anom_df[anom_df["time_stamp"] >= time_cut]
+            last_time = row["last_anomaly_time"].iloc[0]
+            recency_hours = max(
+                1.0,
+                (now_ts - last_time).total_seconds() / 3600
+            )
 
-anom_stats = (
-    recent_anom
-    .groupby(subsystem_col)
-    .agg(
-        recent_anom_count=("time_stamp", "count"),
-        last_anomaly_time=("time_stamp", "max")
-    )
-    .reset_index()
-)
+            recency_factor = np.exp(-recency_hours / 72)  # 3-day decay
 
-# ==============================
-# MAINTENANCE SCHEDULING
-# ==============================
-records = []
+        # ✅ FIXED SUBSYSTEM-SPECIFIC DEGRADATION
+        degradation = (
+            0.15 * anom_count +
+            0.50 * recency_factor +
+            0.35 * criticality
+        )
 
-for subsystem, criticality in DEFAULT_CRITICALITY.items():
+        degradation = np.clip(degradation, 0.05, 0.9)
 
-    row = anom_stats[anom_stats[subsystem_col] == subsystem]
+        effective_rul = base_rul * (1.0 - degradation)
 
-    if len(row) == 0:
-        anom_count = 0
-        recency_factor = 0.1
-    else:
-        anom_count = int(row["recent_anom_count"].iloc[0])
+        # ✅ PRIORITY SCORE
+        score_rul = 1.0 - (effective_rul / MAX_RUL)
+        score_anom = min(1.0, anom_count / 12.0)
 
-        last_time = row["last_anomaly_time"].iloc[0]
-        recency_hours = max(
-            1.0,
-            (now_ts - last_time).total_seconds() / 3600
+        priority = (
+            0.5 * score_rul +
+            0.3 * score_anom +
+            0.2 * criticality
         )
 
-        recency_factor = np.exp(-recency_hours / 72)  # 3-day decay
-
-    # ✅ FIXED SUBSYSTEM-SPECIFIC DEGRADATION
-    degradation = (
-        0.15 * anom_count +
-        0.50 * recency_factor +
-        0.35 * criticality
+        predicted_due = now_ts + pd.Timedelta(hours=effective_rul)
+
+        # ✅ ACTION WINDOWS (FIXED)
+        if effective_rul < 24:
+            action = "Emergency Shutdown & Repair"
+        elif effective_rul < 72:
+            action = "Immediate Maintenance (48–72 hrs)"
+        elif effective_rul < 168:
+            action = "High Priority Maintenance (1 week)"
+        elif effective_rul < 500:
+            action = "Schedule Maintenance (2–3 weeks)"
+        else:
+            action = "Routine Monitoring Only"
+
+        records.append({
+            "Subsystem": subsystem,
+            "Base RUL (hrs)": round(base_rul, 2),
+            "Effective RUL (hrs)": round(effective_rul, 2),
+            "Recent Anomalies": anom_count,
+            "Criticality": round(criticality, 2),
+            "Recency Factor": round(recency_factor, 3),
+            "Priority Score": round(priority, 4),
+            "Predicted Maintenance Due": predicted_due,
+            "Recommended Action": action
+        })
+
+    return pd.DataFrame(records).sort_values(
+        "Priority Score", ascending=False
     )
 
-    degradation = np.clip(degradation, 0.05, 0.9)
 
-    effective_rul = base_rul * (1.0 - degradation)
+def main(rul_path=RUL_PATH, anomaly_path=ANOMALY_PATH, out_path=OUT_PATH):
+    # ==============================
+    # LOAD DATA
+    # ==============================
+    if not os.path.exists(rul_path):
+        raise FileNotFoundError(f"Missing file: {rul_path}")
 
-    # ✅ PRIORITY SCORE
-    score_rul = 1.0 - (effective_rul / MAX_RUL)
-    score_anom = min(1.0, anom_count / 12.0)
+    if not os.path.exists(anomaly_path):
+        raise FileNotFoundError(f"Missing file: {anomaly_path}")
 
-    priority = (
-        0.5 * score_rul +
-        0.3 * score_anom +
-        0.2 * criticality
-    )
+    sched_df = maintenance_schedule(pd.read_csv(rul_path), pd.read_csv(anomaly_path))
 
-    predicted_due = now_ts + pd.Timedelta(hours=effective_rul)
-
-    # ✅ ACTION WINDOWS (FIXED)
-    if effective_rul < 24:
-        action = "Emergency Shutdown & Repair"
-    elif effective_rul < 72:
-        action = "Immediate Maintenance (48–72 hrs)"
-    elif effective_rul < 168:
-        action = "High Priority Maintenance (1 week)"
-    elif effective_rul < 500:
-        action = "Schedule Maintenance (2–3 weeks)"
-    else:
-        action = "Routine Monitoring Only"
-
-    records.append({
-        "Subsystem": subsystem,
-        "Base RUL (hrs)": round(base_rul, 2),
-        "Effective RUL (hrs)": round(effective_rul, 2),
-        "Recent Anomalies": anom_count,
-        "Criticality": round(criticality, 2),
-        "Recency Factor": round(recency_factor, 3),
-        "Priority Score": round(priority, 4),
-        "Predicted Maintenance Due": predicted_due,
-        "Recommended Action": action
-    })
+    # ==============================
+    # SAVE OUTPUT
+    # ==============================
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    sched_df.to_csv(out_path, index=False)
 
-# ==============================
-# SAVE OUTPUT
-# ==============================
-sched_df = pd.DataFrame(records).sort_values(
-    "Priority Score", ascending=False
-)
+    print("✅ Predictive maintenance schedule created successfully!")
+    print("📁 Saved to:", out_path)
+    return sched_df
 
-os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-sched_df.to_csv(OUT_PATH, index=False)
 
-print("✅ Predictive maintenance schedule created successfully!")
-print("📁 Saved to:", OUT_PATH)
+if __name__ == "__main__":
+    main()
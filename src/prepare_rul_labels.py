@@ -1,15 +1,24 @@
 import pandas as pd
-import numpy as np
+import argparse
 import os
 
-DATA_PATH = "data/processed/44_processed.csv"
+from rul_labels import ASSET_COL, failure_events, label_rul
+from sensor_store import load_processed
+
 FAILURE_LOG = "data/failure_log.csv"
 OUT_PATH = "data/processed/rul_labeled.csv"
 
+parser = argparse.ArgumentParser(description="Label every sensor row with the RUL to the next failure of its asset.")
+parser.add_argument("--censor", action="store_true",
+                    help="leave rows after an asset's last failure unlabelled instead of RUL 0")
+parser.add_argument("--asset-id", default=None,
+                    help="asset id of the processed data when it has no asset_id column")
+args = parser.parse_args()
+
 # ----------------------------
 # LOAD FILES
 # ----------------------------
-df = pd.read_csv(DATA_PATH)
+df = load_processed().reset_index()
 fail_log = pd.read_csv(FAILURE_LOG)
 
 print("✅ Sensor columns:", df.columns.tolist())
@@ -46,39 +55,28 @@ if "asset_id" in df.columns and "id" in df.columns:
         print("✅ Dropping redundant 'id' column")
         df = df.drop(columns=["id"])
 
-# ----------------------------
-# NORMALIZE 'failed' COLUMN
-# ----------------------------
-if "failed" not in fail_log.columns:
-    raise ValueError("❌ failure_log.csv must contain a 'failed' column")
-
-fail_log["failed"] = fail_log["failed"].astype(str).str.lower()
-fail_log["failed"] = fail_log["failed"].map({
-    "1": 1, "true": 1, "yes": 1,
-    "0": 0, "false": 0, "no": 0
-})
-
-fail_log = fail_log.dropna(subset=["failed"])
-fail_log["failed"] = fail_log["failed"].astype(int)
+if args.asset_id is not None and ASSET_COL not in df.columns:
+    df[ASSET_COL] = args.asset_id
 
 # ----------------------------
-# SINGLE-TURBINE MODE (FOR YOUR DATASET)
+# FAILURE EVENTS (failed = 1/true/yes)
 # ----------------------------
-print("✅ SINGLE-TURBINE MODE ENABLED")
-
-fdf = fail_log[fail_log["failed"] == 1]
+fdf = failure_events(fail_log, f_ts_col)
 
 if len(fdf) == 0:
     raise ValueError("❌ No failure rows with failed=1 found in failure_log.csv")
 
-# Take earliest real failure
-t_fail = fdf.sort_values(f_ts_col).iloc[0][f_ts_col]
+if ASSET_COL in df.columns and ASSET_COL in fdf.columns:
+    print(f"✅ FLEET MODE: {df[ASSET_COL].nunique()} assets, {len(fdf)} failures")
+else:
+    print(f"✅ SINGLE-ASSET MODE: {len(fdf)} failures")
+    if ASSET_COL in fdf.columns and fdf[ASSET_COL].nunique() > 1:
+        print("⚠️ Failure log covers several assets; pass --asset-id to use only this turbine's failures")
 
 # ----------------------------
-# CREATE RUL (HOURS)
+# CREATE RUL (HOURS) → NEXT FAILURE OF THE SAME ASSET
 # ----------------------------
-df["RUL"] = (t_fail - df[ts_col]).dt.total_seconds() / 3600
-df["RUL"] = df["RUL"].clip(lower=0)
+df["RUL"] = label_rul(df, fdf, ts_col, f_ts_col, censor=args.censor)
 
 # ----------------------------
 # FINAL CLEANING & SAVE
@@ -91,6 +89,6 @@ df.to_csv(OUT_PATH, index=False)
 print("✅ RUL labels created successfully!")
 print("📁 Saved to:", OUT_PATH)
 print("✅ Total labeled samples:", len(df))
-print("✅ Failure timestamp used:", t_fail)
+print("✅ Failures used:", len(fdf), "from", fdf[f_ts_col].min(), "to", fdf[f_ts_col].max())
 print("✅ Sensor time range:",
       df[ts_col].min(), "to", df[ts_col].max())
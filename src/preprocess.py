@@ -3,30 +3,66 @@ import numpy as np
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler
 import joblib
+import argparse
+import io
 import os
 
+from quantile_sketch import QuantileSketch, select_exact
+from schema_registry import get_schema, read_raw
+from sensor_store import STORE_PATH, append_store, write_store
+
 RAW_PATH = "data/raw/44.csv"
 PROCESSED_PATH = "data/processed/44_processed.csv"
-SCALER_PATH = "models/scaler.joblib"
-IMPUTER_PATH = "models/imputer.joblib"
+MODELS_DIR = "models"
+SCALER_PATH = os.path.join(MODELS_DIR, "scaler.joblib")
+IMPUTER_PATH = os.path.join(MODELS_DIR, "imputer.joblib")
+CLIP_PATH = os.path.join(MODELS_DIR, "clip_bounds.joblib")
+STATE_PATH = os.path.join(MODELS_DIR, "preprocess_state.joblib")
+
+MAX_MISSING = 0.30          # drop sensors with more missing values than this
+INTERP_LIMIT = 5            # longest gap filled by interpolation
+CLIP_QUANTILES = (0.01, 0.99)
+
+# Chunked (out-of-core) mode
+CHUNK_SIZE = 100_000
+SKETCH_ALPHA = 0.001        # bucket width that brackets the exact median / clip bounds
+
+
+def _artifact(models_dir, path):
+    return os.path.join(models_dir, os.path.basename(path))
+
+
+def _save_artifacts(models_dir, imputer, scaler, q_low, q_high):
+    os.makedirs(models_dir, exist_ok=True)
+    joblib.dump(imputer, _artifact(models_dir, IMPUTER_PATH))
+    joblib.dump(scaler, _artifact(models_dir, SCALER_PATH))
+    joblib.dump({"q_low": q_low, "q_high": q_high}, _artifact(models_dir, CLIP_PATH))
+
+
+def _save_state(models_dir, raw_path, raw_offset, raw_tail):
+    """
+    High-watermark for append mode: how far the raw file has been consumed,
+    the last processed timestamp, and the last raw rows (pre-interpolation)
+    that serve as interpolation anchors for the next delta.
+    """
+    joblib.dump({
+        "raw_path": os.path.abspath(raw_path),
+        "raw_offset": raw_offset,
+        "watermark": raw_tail.index[-1],
+        "tail": raw_tail.tail(INTERP_LIMIT + 1),
+    }, _artifact(models_dir, STATE_PATH))
 
 
-def main():
+def main(export_csv=False, raw_path=RAW_PATH, store_path=STORE_PATH, models_dir=MODELS_DIR,
+         csv_path=PROCESSED_PATH):
+    """Preprocess one raw export; returns the row count and kept columns."""
     print("Loading data...")
-    df = pd.read_csv(RAW_PATH, sep=";", engine="python")
+    # Cached schema: fixed timestamp format, float32 sensors, text columns pruned
+    schema = get_schema(raw_path)
+    df = read_raw(raw_path, schema).sort_index()
     print(f"Loaded shape: {df.shape}")
     print(f"Columns: {df.columns.tolist()}")
 
-    # Parse timestamp (assumes first column is datetime)
-    df.iloc[:, 0] = pd.to_datetime(df.iloc[:, 0], errors="coerce")
-    df = df.dropna(subset=[df.columns[0]])
-    print(f"After timestamp parsing: {df.shape}")
-    df = df.set_index(df.columns[0]).sort_index()
-
-    # Convert all columns to numeric if possible
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
     # Keep only numeric sensor columns
     sensor_cols = [c for c in df.columns if df[c].dtype.kind in "fi"]
     print(f"Numeric columns found: {len(sensor_cols)}")
@@ -39,11 +75,12 @@ def main():
 
     
     # Drop sensors with >30% missing values
-    keep = df.isna().mean() <= 0.30
+    keep = df.isna().mean() <= MAX_MISSING
     df = df.loc[:, keep]
+    raw_tail = df.tail(INTERP_LIMIT + 1)
 
     # Interpolate short gaps
-    df = df.interpolate(limit=5)
+    df = df.interpolate(limit=INTERP_LIMIT)
 
     # Impute remaining NaNs with median
     imputer = SimpleImputer(strategy="median")
@@ -54,8 +91,8 @@ def main():
     )
 
     # Clip outliers
-    q_low = df_imputed.quantile(0.01)
-    q_high = df_imputed.quantile(0.99)
+    q_low = df_imputed.quantile(CLIP_QUANTILES[0])
+    q_high = df_imputed.quantile(CLIP_QUANTILES[1])
     df_clipped = df_imputed.clip(q_low, q_high, axis=1)
 
     # Scale
@@ -67,14 +104,336 @@ def main():
     )
 
     # Save artifacts
-    os.makedirs("models", exist_ok=True)
-    joblib.dump(imputer, IMPUTER_PATH)
-    joblib.dump(scaler, SCALER_PATH)
-    df_scaled.to_csv(PROCESSED_PATH)
+    _save_artifacts(models_dir, imputer, scaler, q_low, q_high)
+    _save_state(models_dir, raw_path, os.path.getsize(raw_path), raw_tail)
+    write_store(df_scaled, store_path)
+    if export_csv:
+        df_scaled.to_csv(csv_path)
 
     print("✅ Preprocessing complete")
-    print("Saved:", PROCESSED_PATH)
+    print("Saved:", store_path)
+    return {"rows": len(df_scaled), "kept_columns": df_scaled.columns.tolist()}
+
+
+# -----------------------------
+# CHUNKED (OUT-OF-CORE) MODE
+# -----------------------------
+def _read_chunks(path, chunksize):
+    """Parse the raw export in fixed-size chunks, indexed by timestamp."""
+    last_ts = None
+    for chunk in read_raw(path, get_schema(path), chunksize=chunksize):
+        if len(chunk) == 0:
+            continue
+
+        if not chunk.index.is_monotonic_increasing or (last_ts is not None and chunk.index[0] < last_ts):
+            raise ValueError("❌ Chunked mode needs a time-sorted export; use main() instead")
+        last_ts = chunk.index[-1]
+
+        yield chunk
+
+
+def _interpolated_chunks(chunks, limit=INTERP_LIMIT, max_carry=CHUNK_SIZE):
+    """
+    Chunk-wise equivalent of df.interpolate(limit=limit).
+
+    Rows are held back until every column has a valid value after them, and
+    each column's last valid value is carried as the left anchor of the next
+    buffer. Results are identical to the in-memory path except for gaps
+    longer than max_carry rows that cross a chunk boundary: their first
+    `limit` cells are forward-filled instead of linearly interpolated.
+    """
+    buf = None
+    n_context = 0  # leading rows of buf that were already emitted
+
+    for chunk in chunks:
+        buf = chunk if buf is None else pd.concat([buf, chunk])
+        n = len(buf)
+        valid = buf.notna().to_numpy()
+
+        seen = valid.any(axis=0)
+        if seen.any():
+            last_valid = n - 1 - np.argmax(valid[::-1], axis=0)
+            cut = int(last_valid[seen].min())
+        else:
+            cut = n
+        cut = max(cut, n_context, n - max_carry)
+
+        yield buf.interpolate(limit=limit).iloc[n_context:cut]
+
+        head = valid[:cut]
+        anchored = head.any(axis=0)
+        if anchored.any():
+            anchors = cut - 1 - np.argmax(head[::-1], axis=0)
+            start = int(anchors[anchored].min())
+        else:
+            start = cut
+        start = max(start, cut - max_carry)
+
+        buf = buf.iloc[start:]
+        n_context = cut - start
+
+    if buf is not None:
+        yield buf.interpolate(limit=limit).iloc[n_context:]
+
+
+def _fitted_scaler(columns, mean, var, n_samples):
+    """StandardScaler carrying externally computed moments."""
+    var = np.where(var <= 10 * np.finfo(np.float64).eps * np.maximum(1.0, mean ** 2), 0.0, var)
+
+    scaler = StandardScaler().fit(pd.DataFrame([mean], columns=columns))
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+    scaler.n_samples_seen_ = n_samples
+    return scaler
+
+
+def _exact_bounds(blocks, sketch, missing_after):
+    """
+    Exact per-column median of the interpolated data and CLIP_QUANTILES of
+    the median-imputed data, as computed by main().
+    """
+    n_valid = sketch.counts()
+    n_total = n_valid + missing_after
+    top = np.maximum(n_valid - 1, 0)
+
+    # raw order statistics wanted: the median pair, and for each clip
+    # quantile the pair at the same rank in the imputed data - either below
+    # the inserted median copies (rank k) or above them (rank k - copies)
+    med = 0.5 * top
+    first, last, clip_ranks = [np.floor(med)], [np.ceil(med)], []
+    for q in CLIP_QUANTILES:
+        pos = q * np.maximum(n_total - 1, 0)
+        k = np.floor(pos)
+        k1 = np.minimum(k + 1, np.maximum(n_total - 1, 0))
+        clip_ranks.append((k, k1, pos - k))
+        for shift in (0, missing_after):
+            first.append(np.clip(k - shift, 0, top))
+            last.append(np.clip(k1 - shift, 0, top))
+    stats = select_exact(blocks, sketch, np.stack(first, axis=1), np.stack(last, axis=1))
+
+    median = np.full(sketch.n_columns, np.nan)
+    bounds = np.full((len(CLIP_QUANTILES), sketch.n_columns), np.nan)
+    for c in np.flatnonzero(n_valid > 0):
+        median[c] = 0.5 * (stats.value(c, 0, first[0][c]) + stats.value(c, 0, last[0][c]))
+        n_less = stats.count_less(c, 0, median[c])
+        n_median = stats.count_equal(c, 0, median[c]) + missing_after[c]
+
+        def imputed_value(i, rank):
+            if rank < n_less:
+                return stats.value(c, 1 + 2 * i, rank)
+            if rank < n_less + n_median:
+                return median[c]
+            return stats.value(c, 2 + 2 * i, rank - missing_after[c])
+
+        for i, (k, k1, frac) in enumerate(clip_ranks):
+            pair = np.array([imputed_value(i, k[c]), imputed_value(i, k1[c])])
+            # numpy's linear interpolation, as used by DataFrame.quantile
+            bounds[i, c] = np.quantile(pair, frac[c])
+    return median, bounds[0], bounds[1]
+
+
+def main_chunked(chunksize=CHUNK_SIZE, export_csv=False, raw_path=RAW_PATH, store_path=STORE_PATH,
+                 models_dir=MODELS_DIR, csv_path=PROCESSED_PATH):
+    """
+    Streaming version of main() for exports that do not fit in memory.
+
+    Pass 1 counts rows and missing values and builds per-column quantile
+    sketches; the sketches only bracket the median and clip quantiles, which
+    are then selected exactly over further passes (usually one). One more
+    pass computes the clipped mean and variance, and the last one transforms
+    and appends each chunk to the binary store (pre-sized to the row count
+    seen in pass 1). Peak memory is a few chunks plus the sketches.
+
+    Medians, clip bounds and scaler moments are those of main(), so scaled
+    values agree with it to floating-point rounding. Rows must be
+    time-sorted.
+    """
+    # ---------- PASS 1: FIT ----------
+    print(f"Pass 1: sketching in chunks of {chunksize} rows...")
+    columns = None
+    sketch = None
+    n_rows = 0
+    missing = None
+    missing_after = None
+
+    def counted(chunks):
+        nonlocal columns, n_rows, missing
+        for chunk in chunks:
+            if columns is None:
+                columns = chunk.columns
+                missing = np.zeros(len(columns))
+            n_rows += len(chunk)
+            missing += chunk.isna().sum().to_numpy()
+            yield chunk
+
+    for block in _interpolated_chunks(counted(_read_chunks(raw_path, chunksize)), max_carry=chunksize):
+        if sketch is None:
+            sketch = QuantileSketch(block.shape[1], alpha=SKETCH_ALPHA)
+            missing_after = np.zeros(block.shape[1])
+        X = block.to_numpy()
+        sketch.update(X)
+        missing_after += np.isnan(X).sum(axis=0)
+
+    if n_rows == 0:
+        raise ValueError("No rows with a valid timestamp found in data!")
+    print(f"Loaded shape: ({n_rows}, {len(columns) + 1})")
+
+    keep = missing / n_rows <= MAX_MISSING
+    kept_cols = columns[keep]
+    if len(kept_cols) == 0:
+        raise ValueError("No numeric columns found in data!")
+    print(f"After column filtering: ({n_rows}, {len(kept_cols)})")
+
+    # ---------- EXACT MEDIAN AND CLIP BOUNDS ----------
+    print("Selecting exact median and clip bounds...")
+
+    def blocks():
+        for block in _interpolated_chunks(_read_chunks(raw_path, chunksize), max_carry=chunksize):
+            yield block.to_numpy()
+
+    median, q_low, q_high = _exact_bounds(blocks, sketch, missing_after)
+    median, q_low, q_high = median[keep], q_low[keep], q_high[keep]
+
+    # ---------- CLIPPED MOMENTS ----------
+    print("Computing scaler moments...")
+    # shifted by the median so large offsets do not cancel the variance
+    total = np.zeros(len(kept_cols))
+    total_sq = np.zeros(len(kept_cols))
+    for block in _interpolated_chunks((chunk[kept_cols] for chunk in _read_chunks(raw_path, chunksize)),
+                                      max_carry=chunksize):
+        X = block.to_numpy()
+        X = np.clip(np.where(np.isnan(X), median, X), q_low, q_high) - median
+        total += X.sum(axis=0)
+        total_sq += (X * X).sum(axis=0)
+    shift = total / n_rows
+    mean = median + shift
+    var = np.maximum(total_sq / n_rows - shift ** 2, 0.0)
+
+    imputer = SimpleImputer(strategy="median").fit(pd.DataFrame([median], columns=kept_cols))
+    scaler = _fitted_scaler(kept_cols, mean, var, n_rows)
+
+    # ---------- TRANSFORM ----------
+    print("Transforming...")
+    first = True
+    raw_tail = None
+    raw_size = os.path.getsize(raw_path)
+
+    def tracked(chunks):
+        nonlocal raw_tail
+        for chunk in chunks:
+            chunk = chunk[kept_cols]
+            raw_tail = chunk if raw_tail is None else pd.concat([raw_tail, chunk]).tail(INTERP_LIMIT + 1)
+            yield chunk
+
+    for block in _interpolated_chunks(tracked(_read_chunks(raw_path, chunksize)), max_carry=chunksize):
+        X = block.to_numpy()
+        X = np.where(np.isnan(X), median, X)
+        X = np.clip(X, q_low, q_high)
+        X = (X - scaler.mean_) / scaler.scale_
+
+        out = pd.DataFrame(X, index=block.index, columns=kept_cols)
+        if first:
+            write_store(out, store_path, capacity=n_rows)
+        else:
+            append_store(out, store_path)
+        if export_csv:
+            out.to_csv(csv_path, mode="w" if first else "a", header=first)
+        first = False
+
+    _save_artifacts(models_dir, imputer, scaler,
+                    pd.Series(q_low, index=kept_cols), pd.Series(q_high, index=kept_cols))
+    _save_state(models_dir, raw_path, raw_size, raw_tail)
+
+    print("✅ Chunked preprocessing complete")
+    print("Saved:", store_path)
+    return {"rows": n_rows, "kept_columns": kept_cols.tolist()}
+
+
+# -----------------------------
+# INCREMENTAL APPEND MODE
+# -----------------------------
+def _read_delta(raw_path, state, columns):
+    """
+    Raw rows appended since the last run, read from the saved byte offset.
+    Falls back to a full read (filtered by the watermark) if the file was
+    replaced or truncated. Returns the frame and the new offset.
+    """
+    with open(raw_path, "rb") as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        offset = state["raw_offset"]
+        if state["raw_path"] != os.path.abspath(raw_path) or offset > size or offset < len(header):
+            print("⚠️ Raw file changed since the last run, rescanning it")
+            offset = len(header)
+        f.seek(offset)
+        data = f.read()
+
+    # only consume complete lines; a partially written last row waits for the next run
+    data = data[:data.rfind(b"\n") + 1]
+    if not data.strip():
+        return None, offset + len(data)
+
+    df = read_raw(io.BytesIO(header + data), get_schema(raw_path), usecols=columns)
+    return df, offset + len(data)
+
+
+def main_append(raw_path=RAW_PATH, store_path=STORE_PATH, models_dir=MODELS_DIR):
+    """
+    Transform only the rows newer than the high-watermark with the frozen
+    imputer, clip bounds and scaler, and append them to the store. Rows
+    already in the store are final: a gap that was open at the end of the
+    previous run keeps its forward-filled values.
+    """
+    state = joblib.load(_artifact(models_dir, STATE_PATH))
+    imputer = joblib.load(_artifact(models_dir, IMPUTER_PATH))
+    scaler = joblib.load(_artifact(models_dir, SCALER_PATH))
+    clip = joblib.load(_artifact(models_dir, CLIP_PATH))
+    cols = list(scaler.feature_names_in_)
+
+    df, new_offset = _read_delta(raw_path, state, cols)
+    if df is None:
+        print("✅ No new rows since", state["watermark"])
+        return {"rows": 0, "kept_columns": cols}
+
+    df = df.sort_index()
+    df = df[df.index > state["watermark"]]
+    print(f"New rows after {state['watermark']}: {len(df)}")
+
+    if len(df) == 0:
+        state["raw_offset"] = new_offset
+        joblib.dump(state, _artifact(models_dir, STATE_PATH))
+        return {"rows": 0, "kept_columns": cols}
+
+    # interpolate with the previous raw rows as left anchors
+    context = state["tail"]
+    raw = pd.concat([context, df])
+    filled = raw.interpolate(limit=INTERP_LIMIT).iloc[len(context):]
+
+    X = imputer.transform(filled)
+    X = np.clip(X, clip["q_low"][cols].to_numpy(), clip["q_high"][cols].to_numpy())
+    X = scaler.transform(pd.DataFrame(X, columns=cols))
+
+    append_store(pd.DataFrame(X, index=filled.index, columns=cols), store_path)
+    _save_state(models_dir, raw_path, new_offset, raw)
+
+    print("✅ Appended", len(filled), "rows to", store_path)
+    return {"rows": len(filled), "kept_columns": cols}
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Clean, impute, clip and scale raw SCADA data.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the raw export in chunks of this many rows (out-of-core mode)")
+    parser.add_argument("--csv", action="store_true",
+                        help=f"also export {PROCESSED_PATH}")
+    parser.add_argument("--append", action="store_true",
+                        help="only transform rows newer than the last run, with the saved artifacts")
+    args = parser.parse_args()
+
+    if args.append:
+        main_append()
+    elif args.chunksize:
+        main_chunked(args.chunksize, export_csv=args.csv)
+    else:
+        main(export_csv=args.csv)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+preprocess_fleet.py
+
+Preprocesses every turbine export in data/raw/ in parallel.
+
+Produces, per asset (asset id = raw file name without extension):
+ - data/fleet/<asset_id>/processed.store
+ - data/fleet/<asset_id>/scaler.joblib, imputer.joblib
+ - data/fleet/<asset_id>/preprocess.log
+and a run summary:
+ - data/fleet/fleet_summary.csv
+"""
+
+import argparse
+import contextlib
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import preprocess
+
+RAW_DIR = "data/raw"
+FLEET_DIR = "data/fleet"
+SUMMARY_FILE = "fleet_summary.csv"
+
+
+def asset_id_from_path(raw_path):
+    return os.path.splitext(os.path.basename(raw_path))[0]
+
+
+def asset_dir(asset_id, fleet_dir=FLEET_DIR):
+    return os.path.join(fleet_dir, asset_id)
+
+
+def _init_worker():
+    # one BLAS/OpenMP thread per process, so N workers use N cores
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def process_asset(raw_path, fleet_dir=FLEET_DIR, chunksize=None):
+    """Preprocess one raw export into its asset directory (runs in a worker)."""
+    asset_id = asset_id_from_path(raw_path)
+    out_dir = asset_dir(asset_id, fleet_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    record = {"asset_id": asset_id, "raw_path": raw_path, "rows": 0,
+              "kept_columns": 0, "wall_time_s": 0.0, "status": "ok", "error": ""}
+    paths = dict(raw_path=raw_path, store_path=os.path.join(out_dir, "processed.store"), models_dir=out_dir)
+
+    t0 = time.perf_counter()
+    with open(os.path.join(out_dir, "preprocess.log"), "w") as log, contextlib.redirect_stdout(log):
+        try:
+            if chunksize:
+                result = preprocess.main_chunked(chunksize, **paths)
+            else:
+                result = preprocess.main(**paths)
+            record["rows"] = result["rows"]
+            record["kept_columns"] = len(result["kept_columns"])
+        except Exception as exc:
+            traceback.print_exc(file=log)
+            record["status"] = "error"
+            record["error"] = f"{type(exc).__name__}: {exc}"
+    record["wall_time_s"] = round(time.perf_counter() - t0, 3)
+    return record
+
+
+def main(raw_dir=RAW_DIR, fleet_dir=FLEET_DIR, workers=None, chunksize=None):
+    raw_paths = glob.glob(os.path.join(raw_dir, "*.csv"))
+    if not raw_paths:
+        raise FileNotFoundError(f"❌ No raw exports found in {raw_dir}")
+
+    # largest files first, so the pool does not end on one long straggler
+    raw_paths.sort(key=os.path.getsize, reverse=True)
+    workers = min(workers or os.cpu_count() or 1, len(raw_paths))
+    print(f"✅ Preprocessing {len(raw_paths)} assets on {workers} workers...")
+
+    t0 = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(process_asset, p, fleet_dir, chunksize) for p in raw_paths]
+        for fut in as_completed(futures):
+            rec = fut.result()
+            records.append(rec)
+            mark = "✅" if rec["status"] == "ok" else "❌"
+            print(f"{mark} {rec['asset_id']}: {rec['rows']} rows, {rec['kept_columns']} columns, "
+                  f"{rec['wall_time_s']:.1f}s {rec['error']}")
+    wall = time.perf_counter() - t0
+
+    summary = pd.DataFrame(records).sort_values("asset_id")
+    summary_path = os.path.join(fleet_dir, SUMMARY_FILE)
+    os.makedirs(fleet_dir, exist_ok=True)
+    summary.to_csv(summary_path, index=False)
+
+    busy = summary["wall_time_s"].sum()
+    print(f"✅ Fleet preprocessing done in {wall:.1f}s "
+          f"({busy:.1f}s of work, {busy / max(wall, 1e-9):.1f}x parallel speed-up)")
+    print("📁 Summary saved to:", summary_path)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess every turbine in data/raw/ in parallel.")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--fleet-dir", default=FLEET_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="use the out-of-core chunked mode per asset")
+    args = parser.parse_args()
+
+    main(args.raw_dir, args.fleet_dir, args.workers, args.chunksize)
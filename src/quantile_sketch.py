@@ -0,0 +1,339 @@
+"""
+quantile_sketch.py
+
+Mergeable relative-error quantile sketch (DDSketch-style log buckets),
+kept independently for every column of a sensor matrix.
+
+Each bucket also stores the exact sum, sum of squares, min and max of the
+values that fell into it, so quantiles can be interpolated inside a bucket
+and the moments of clipped data can be recovered once the clip bounds are
+known - without a second pass over the data.
+
+The error is relative to the value, so on sensors with a large offset and
+a narrow spread a whole distribution can share a few buckets. Where exact
+quantiles matter, select_exact() uses the sketch only to bracket the wanted
+order statistics and narrows them down over further passes.
+"""
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Per-column quantile sketch with relative accuracy `alpha`.
+
+    Values with |x| <= min_value share a single zero bucket; NaNs are ignored.
+    Two sketches with the same n_columns/alpha/min_value can be merged.
+    """
+
+    def __init__(self, n_columns, alpha=0.001, min_value=1e-9):
+        self.n_columns = int(n_columns)
+        self.alpha = float(alpha)
+        self.min_value = float(min_value)
+
+        self._gamma = (1.0 + alpha) / (1.0 - alpha)
+        self._log_gamma = np.log(self._gamma)
+        self._offset = int(np.ceil(-np.log(min_value) / self._log_gamma)) + 1
+        max_key = self._offset + int(np.ceil(np.log(np.finfo(np.float64).max) / self._log_gamma))
+        self._half_span = max_key + 1
+        self._span = 2 * self._half_span + 1
+
+        # sorted combined keys (column * span + bucket) and per-bucket stats
+        self._keys = np.empty(0, dtype=np.int64)
+        self._count = np.empty(0, dtype=np.float64)
+        self._sum = np.empty(0, dtype=np.float64)
+        self._sumsq = np.empty(0, dtype=np.float64)
+        self._min = np.empty(0, dtype=np.float64)
+        self._max = np.empty(0, dtype=np.float64)
+
+    # -----------------------------
+    # BUILDING
+    # -----------------------------
+    def _bucket(self, values):
+        mag = np.abs(values)
+        keys = np.zeros(values.shape, dtype=np.int64)
+        big = mag > self.min_value
+        keys[big] = np.ceil(np.log(mag[big]) / self._log_gamma).astype(np.int64) + self._offset
+        keys[values < -self.min_value] *= -1
+        return keys
+
+    def _insert(self, keys, counts, sums, sumsqs, mins, maxs):
+        keys = np.concatenate([self._keys, keys])
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.intp)
+
+        def reduce(ufunc, old, new):
+            values = np.concatenate([old, new])[order]
+            return ufunc.reduceat(values, starts) if len(values) else values
+
+        self._count = reduce(np.add, self._count, counts)
+        self._sum = reduce(np.add, self._sum, sums)
+        self._sumsq = reduce(np.add, self._sumsq, sumsqs)
+        self._min = reduce(np.minimum, self._min, mins)
+        self._max = reduce(np.maximum, self._max, maxs)
+        self._keys = keys[starts]
+
+    def update(self, X, weights=None):
+        """Add a (n_rows, n_columns) block of values, optionally weighted."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_columns)
+        cols = np.broadcast_to(np.arange(self.n_columns), X.shape)
+        mask = ~np.isnan(X)
+
+        if weights is None:
+            w = np.ones(X.shape)
+        else:
+            w = np.broadcast_to(np.asarray(weights, dtype=np.float64), X.shape)
+            mask &= w > 0
+
+        vals = X[mask]
+        w = w[mask]
+        keys = cols[mask] * self._span + self._bucket(vals) + self._half_span
+        self._insert(keys, w, w * vals, w * vals * vals, vals, vals)
+        return self
+
+    def merge(self, other):
+        """Fold another sketch of the same shape into this one."""
+        if (other.n_columns, other.alpha, other.min_value) != (self.n_columns, self.alpha, self.min_value):
+            raise ValueError("❌ Cannot merge sketches with different parameters")
+        self._insert(other._keys, other._count, other._sum, other._sumsq, other._min, other._max)
+        return self
+
+    def copy(self):
+        return QuantileSketch(self.n_columns, self.alpha, self.min_value).merge(self)
+
+    def to_dict(self):
+        """JSON-serialisable state (parameters + non-empty buckets)."""
+        return {
+            "n_columns": self.n_columns, "alpha": self.alpha, "min_value": self.min_value,
+            "keys": self._keys.tolist(), "count": self._count.tolist(), "sum": self._sum.tolist(),
+            "sumsq": self._sumsq.tolist(), "min": self._min.tolist(), "max": self._max.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["n_columns"], state["alpha"], state["min_value"])
+        sketch._keys = np.asarray(state["keys"], dtype=np.int64)
+        for name in ("count", "sum", "sumsq", "min", "max"):
+            setattr(sketch, "_" + name, np.asarray(state[name], dtype=np.float64))
+        return sketch
+
+    # -----------------------------
+    # QUERIES
+    # -----------------------------
+    def _columns(self):
+        return self._keys // self._span
+
+    def counts(self):
+        """Number of (weighted) values seen per column."""
+        return np.bincount(self._columns(), weights=self._count, minlength=self.n_columns)
+
+    def _value_at(self, cum, positions):
+        """Value at global order-statistic positions, interpolated inside buckets."""
+        i = np.minimum(np.searchsorted(cum, positions, side="right"), len(cum) - 1)
+        count = self._count[i]
+        first = cum[i] - count
+        frac = np.clip((positions - first) / np.maximum(count - 1, 1), 0.0, 1.0)
+        return self._min[i] + frac * (self._max[i] - self._min[i])
+
+    def bracket(self, ranks):
+        """
+        For (n_columns, k) 0-based ranks: min and max of the bucket holding
+        each order statistic, and the number of values before / up to it.
+        """
+        ranks = np.asarray(ranks, dtype=np.float64)
+        cum = np.cumsum(self._count)
+        start = np.concatenate([[0.0], np.cumsum(self.counts())[:-1]])[:, None]
+        i = np.minimum(np.searchsorted(cum, start + ranks, side="right"), len(cum) - 1)
+        return self._min[i], self._max[i], cum[i] - self._count[i] - start, cum[i] - start
+
+    def quantile(self, q):
+        """
+        Per-column q-quantile, interpolated linearly between order statistics
+        (pandas' default). Within `alpha` relative error; exact when the
+        neighbouring order statistics fall in buckets holding a single value.
+        """
+        total = self.counts()
+        out = np.full(self.n_columns, np.nan)
+        if len(self._keys) == 0:
+            return out
+
+        cum = np.cumsum(self._count)
+        start = np.concatenate([[0.0], np.cumsum(total)[:-1]])
+
+        rank = q * np.maximum(total - 1, 0)
+        frac = rank - np.floor(rank)
+        v_lo = self._value_at(cum, start + np.floor(rank))
+        v_hi = self._value_at(cum, start + np.ceil(rank))
+
+        has = total > 0
+        out[has] = (v_lo + frac * (v_hi - v_lo))[has]
+        return out
+
+    def clipped_moments(self, lower, upper):
+        """
+        Per-column mean and population variance of the data after clipping
+        to [lower, upper]. Exact except for the buckets straddling a bound,
+        which are clipped at their mean.
+        """
+        cols = self._columns()
+        lo = np.asarray(lower, dtype=np.float64)[cols]
+        hi = np.asarray(upper, dtype=np.float64)[cols]
+        count = self._count
+
+        below = self._max <= lo
+        above = self._min >= hi
+        inside = (self._min >= lo) & (self._max <= hi) & ~below & ~above
+        straddle = ~(below | above | inside)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            clipped_mean = np.clip(self._sum / count, lo, hi)
+        s = np.select([inside, below, above, straddle],
+                      [self._sum, count * lo, count * hi, count * clipped_mean])
+        ss = np.select([inside, below, above, straddle],
+                       [self._sumsq, count * lo * lo, count * hi * hi, count * clipped_mean ** 2])
+
+        n = self.counts()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(cols, weights=s, minlength=self.n_columns) / n
+            var = np.bincount(cols, weights=ss, minlength=self.n_columns) / n - mean ** 2
+        return mean, np.maximum(var, 0.0)
+
+
+# -----------------------------
+# EXACT SELECTION
+# -----------------------------
+class OrderStatistics:
+    """
+    Result of select_exact(): per column and target, the sorted values of a
+    narrow interval holding the wanted order statistics and the number of
+    values below it. An interval holding a single repeated value is kept
+    as that value and its multiplicity.
+    """
+
+    def __init__(self, below):
+        self.below = below
+        self._values = np.empty(below.shape, dtype=object)
+        self._repeats = np.zeros(below.shape, dtype=np.int64)
+
+    def value(self, col, target, rank):
+        """Value of the 0-based order statistic `rank` (inside the target's window)."""
+        values = self._values[col, target]
+        if self._repeats[col, target]:
+            return values[0]
+        return values[int(rank - self.below[col, target])]
+
+    def count_less(self, col, target, x):
+        """Number of values < x, for x inside the target's interval."""
+        values = self._values[col, target]
+        if self._repeats[col, target]:
+            return self.below[col, target] + (self._repeats[col, target] if values[0] < x else 0)
+        return self.below[col, target] + np.searchsorted(values, x, side="left")
+
+    def count_equal(self, col, target, x):
+        values = self._values[col, target]
+        if self._repeats[col, target]:
+            return self._repeats[col, target] if values[0] == x else 0
+        return np.searchsorted(values, x, side="right") - np.searchsorted(values, x, side="left")
+
+
+def select_exact(blocks, sketch, first, last, bins=1024, cap=4096, max_passes=64):
+    """
+    Exact order statistics first..last (0-based, (n_columns, k) arrays,
+    last - first small) of the data summarised by `sketch`.
+
+    `blocks()` must yield the same (n_rows, n_columns) blocks as were fed to
+    the sketch. Each target starts from the sketch bucket holding it; every
+    pass histograms the values inside the current interval into `bins` and
+    keeps the bins holding the target, until at most `cap` values are left
+    (then collected and sorted) or all of them are equal. Memory is bounded
+    by n_columns * k * max(bins, cap).
+    """
+    first = np.asarray(first, dtype=np.float64)
+    last = np.asarray(last, dtype=np.float64)
+    n_cols, n_targets = first.shape
+
+    lo, _, below, _ = sketch.bracket(first)
+    _, hi, _, upto = sketch.bracket(last)
+    hi = np.nextafter(hi, np.inf)          # half-open [lo, hi)
+    count = upto - below
+    done = np.broadcast_to((sketch.counts() == 0)[:, None], first.shape).copy()
+    result = OrderStatistics(below)
+
+    def edge(j, lo, hi, width):
+        return np.where(j >= bins, hi, lo + j * width)
+
+    for _ in range(max_passes):
+        if done.all():
+            return result
+        collect = ~done & (count <= cap)
+        width = (hi - lo) / bins
+        hist = np.zeros((n_cols, n_targets, bins))
+        vmin = np.full(first.shape, np.inf)
+        vmax = np.full(first.shape, -np.inf)
+        gathered = [[] for _ in range(n_targets)]
+
+        for X in blocks():
+            X = np.asarray(X, dtype=np.float64)
+            for t in range(n_targets):
+                active = ~done[:, t]
+                if not active.any():
+                    continue
+                inside = (X >= lo[:, t]) & (X < hi[:, t]) & active
+                col, row = np.nonzero(inside.T)     # grouped by column
+                x = X[row, col]
+
+                take = collect[col, t]
+                gathered[t].append((col[take], x[take]))
+                col, x = col[~take], x[~take]
+                if len(x) == 0:
+                    continue
+
+                l, h, w = lo[col, t], hi[col, t], width[col, t]
+                b = np.clip(np.floor((x - l) / w), 0, bins - 1).astype(np.int64)
+                # snap to the edges used for the next interval
+                b -= x < edge(b, l, h, w)
+                b += x >= edge(b + 1, l, h, w)
+                hist[:, t, :] += np.bincount(col * bins + b, minlength=n_cols * bins).reshape(n_cols, bins)
+
+                starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+                np.minimum.at(vmin[:, t], col[starts], np.minimum.reduceat(x, starts))
+                np.maximum.at(vmax[:, t], col[starts], np.maximum.reduceat(x, starts))
+
+        for t in range(n_targets):
+            if not gathered[t]:
+                continue
+            col = np.concatenate([c for c, _ in gathered[t]])
+            x = np.concatenate([v for _, v in gathered[t]])
+            order = np.lexsort((x, col))
+            col, x = col[order], x[order]
+            for c in np.flatnonzero(collect[:, t]):
+                a, b = np.searchsorted(col, [c, c + 1])
+                result._values[c, t] = x[a:b]
+        done |= collect
+
+        # narrow the histogrammed targets down to the bins holding them
+        refine = ~done
+        repeated = refine & (vmin == vmax)
+        for c, t in zip(*np.nonzero(repeated)):
+            result._values[c, t] = np.array([vmin[c, t]])
+            result._repeats[c, t] = int(count[c, t])
+        done |= repeated
+        refine &= ~repeated
+
+        cum = np.cumsum(hist, axis=2)
+        b_first = (cum <= (first - below)[..., None]).sum(axis=2)
+        b_last = np.minimum((cum <= (last - below)[..., None]).sum(axis=2), bins - 1)
+        b_first = np.minimum(b_first, b_last)
+        before = np.where(b_first > 0, np.take_along_axis(cum, np.maximum(b_first - 1, 0)[..., None], 2)[..., 0], 0)
+        through = np.take_along_axis(cum, b_last[..., None], 2)[..., 0]
+
+        new_lo = edge(b_first, lo, hi, width)
+        new_hi = edge(b_last + 1, lo, hi, width)
+        lo = np.where(refine, new_lo, lo)
+        hi = np.where(refine, new_hi, hi)
+        below = np.where(refine, below + before, below)
+        count = np.where(refine, through - before, count)
+        result.below = below
+
+    raise RuntimeError("❌ Exact quantile selection did not converge")
@@ -1,6 +1,9 @@
 import json
 from typing import List
 
+import numpy as np
+import pandas as pd
+
 
 def load_sensor_cluster_map(json_path: str):
     """Load sensor → subsystem mapping."""
@@ -32,3 +35,99 @@ def map_sensors_to_subsystems(
 def format_rca_output(sensor_list: List[str], sensor_map: dict):
     subsystems = map_sensors_to_subsystems(sensor_list, sensor_map)
     return " + ".join(subsystems)
+
+
+# -----------------------------
+# BATCH API (vectorized RCA)
+# -----------------------------
+def build_subsystem_codes(feature_names: List[str], sensor_map: dict):
+    """
+    Integer subsystem code per feature column, plus the code → name table.
+    Unmapped sensors get "UNKNOWN".
+    """
+    labels = []
+    lookup = {}
+    codes = np.empty(len(feature_names), dtype=np.int64)
+
+    for j, s in enumerate(feature_names):
+        subsystem = sensor_map.get(s, "UNKNOWN")
+        if subsystem not in lookup:
+            lookup[subsystem] = len(labels)
+            labels.append(subsystem)
+        codes[j] = lookup[subsystem]
+
+    return codes, labels
+
+
+def top_k_sensors(errors: np.ndarray, k: int = 5):
+    """
+    Column indices of the k largest errors per row, ordered by increasing
+    error (same as np.argsort(row)[-k:]), via argpartition.
+    """
+    k = min(k, errors.shape[1])
+    part = np.argpartition(errors, -k, axis=1)[:, -k:]
+    order = np.argsort(np.take_along_axis(errors, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def batch_root_cause(top_idx: np.ndarray, codes: np.ndarray, n_subsystems: int, n_dominant: int = 3):
+    """
+    Vectorized Counter(subsystems).most_common(n_dominant) for every row of
+    top_idx: most votes first, ties broken by first appearance.
+    Returns (subsystem codes, vote counts), both (n_rows, n_dominant);
+    slots without votes have count 0.
+    """
+    n, k = top_idx.shape
+    rows = np.arange(n)
+    sub = codes[top_idx]
+
+    flat = (rows[:, None] * n_subsystems + sub).ravel()
+    votes = np.bincount(flat, minlength=n * n_subsystems).reshape(n, n_subsystems)
+
+    first = np.full((n, n_subsystems), k)
+    for j in range(k - 1, -1, -1):
+        first[rows, sub[:, j]] = j
+
+    score = np.where(votes > 0, votes * (k + 1) - first, -1)
+    m = min(n_dominant, n_subsystems)
+    best = np.argsort(-score, axis=1, kind="stable")[:, :m]
+    return best, np.take_along_axis(votes, best, axis=1)
+
+
+def format_batch_rca(best: np.ndarray, best_votes: np.ndarray, labels: List[str]):
+    """Join dominant subsystems per row ("GEARBOX + GENERATOR"), once per distinct combination."""
+    if len(best) == 0:
+        return []
+    masked = np.where(best_votes > 0, best, -1)
+    combos, inverse = np.unique(masked, axis=0, return_inverse=True)
+    text = [" + ".join(labels[c] for c in combo if c >= 0) for combo in combos]
+    return [text[i] for i in inverse.ravel()]
+
+
+def join_sensor_names(top_idx: np.ndarray, feature_names: List[str], sep: str = ","):
+    """Comma-joined sensor names per row of top_idx."""
+    names = np.asarray(feature_names, dtype=object)[top_idx]
+    if names.shape[1] == 0:
+        return [""] * len(names)
+    out = names[:, 0]
+    for j in range(1, names.shape[1]):
+        out = out + sep + names[:, j]
+    return out.tolist()
+
+
+def anomaly_rca_frame(timestamps, reconstruction_error, error_matrix: np.ndarray,
+                      feature_names: List[str], codes: np.ndarray, labels: List[str], top_k: int = 5):
+    """
+    Anomaly/RCA rows (as written to anomaly_with_root_cause.csv) for a batch
+    of anomalous samples and their per-sensor absolute errors.
+    """
+    top_idx = top_k_sensors(error_matrix, top_k)
+    best, best_votes = batch_root_cause(top_idx, codes, len(labels))
+
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "anomaly": True,
+        "reconstruction_error": reconstruction_error,
+        "root_cause_sensors": join_sensor_names(top_idx, feature_names),
+        "root_cause_physical": format_batch_rca(best, best_votes, labels),
+    })
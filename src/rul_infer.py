@@ -1,28 +1,48 @@
 import pandas as pd
 import numpy as np
 import joblib
-from tensorflow.keras.models import load_model
+import argparse
+
+import numpy_engine
+from model_client import SERVER_URL, connect
+from sensor_store import load_processed
+from sequence_windows import sliding_windows
 
 # -------------------------------
 # PATHS
 # -------------------------------
-DATA_PATH = "data/processed/44_processed.csv"
 MODEL_PATH = "models/rul_lstm_model.h5"
 SCALER_PATH = "models/rul_scaler.pkl"
 OUT_PATH = "data/processed/rul_predictions.csv"
 
 SEQUENCE_LENGTH = 30
+KERAS_BATCH = 1024          # windows per Keras predict_on_batch call
+
+parser = argparse.ArgumentParser(description="Predict RUL with the trained LSTM.")
+parser.add_argument("--keras", action="store_true",
+                    help="predict with TensorFlow/Keras instead of the NumPy engine")
+parser.add_argument("--server", nargs="?", const=SERVER_URL, default=None,
+                    help=f"predict through a running model_server.py (default {SERVER_URL})")
+args = parser.parse_args()
 
 # -------------------------------
 # LOAD MODEL & SCALER
 # -------------------------------
-model = load_model(MODEL_PATH, compile=False)
+model = connect(args.server, "rul") if args.server else None
+use_keras = model is None and args.keras
+if model is not None:
+    print("✅ Using model server:", args.server)
+elif use_keras:
+    from tensorflow.keras.models import load_model
+    model = load_model(MODEL_PATH, compile=False)
+else:
+    model = numpy_engine.load_model(MODEL_PATH)
 scaler = joblib.load(SCALER_PATH)
 
 # -------------------------------
 # LOAD DATA
 # -------------------------------
-df = pd.read_csv(DATA_PATH)
+df = load_processed().reset_index()
 
 # -------------------------------
 # DROP NON-NUMERICAL META COLUMNS
@@ -38,20 +58,22 @@ df_sensors = df[SENSOR_COLS]
 # -------------------------------
 X_scaled = scaler.transform(df_sensors.values)
 
-# -------------------------------
-# BUILD SEQUENCES
-# -------------------------------
-X_seq = []
-
-for i in range(len(X_scaled) - SEQUENCE_LENGTH):
-    X_seq.append(X_scaled[i:i + SEQUENCE_LENGTH])
-
-X_seq = np.array(X_seq)
-
 # -------------------------------
 # PREDICT RUL
 # -------------------------------
-rul_preds = model.predict(X_seq, verbose=1).flatten()
+# one window per row after the first SEQUENCE_LENGTH: X_scaled[i:i + SEQUENCE_LENGTH]
+if use_keras:
+    # Keras copies whatever array it is given, so hand it one batch of
+    # windows at a time instead of the whole strided view
+    X_seq = sliding_windows(X_scaled.astype(np.float32), SEQUENCE_LENGTH)
+    rul_preds = np.concatenate([np.empty(0, np.float32)] + [
+        np.asarray(model.predict_on_batch(np.ascontiguousarray(X_seq[i:i + KERAS_BATCH]))).flatten()
+        for i in range(0, len(X_seq), KERAS_BATCH)
+    ])
+else:
+    # NumPy engine or model server: windows straight off the series;
+    # the LSTM input projection is shared
+    rul_preds = model.predict_windows(X_scaled[:-1], SEQUENCE_LENGTH).flatten()
 
 # -------------------------------
 # ALIGN PREDICTIONS TO TIMESTAMPS
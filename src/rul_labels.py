@@ -0,0 +1,93 @@
+"""
+rul_labels.py
+
+Run-to-failure labels for a fleet with repeated failures.
+
+For every sensor row the RUL is the time (hours) to the next failure of the
+same asset (exact timestamp matches give RUL 0), found for all rows and
+assets in one vectorized pass - a grouped forward merge_asof done as a
+lookup over (asset code, failure-time rank) keys. Rows after an asset's
+last failure are either labelled 0 - as the single-turbine labelling always
+did - or censored (left unlabelled) with censor=True. Rows of assets without
+any failure stay unlabelled.
+"""
+
+import numpy as np
+import pandas as pd
+
+ASSET_COL = "asset_id"
+DENSE_TABLE_MAX = 50_000_000    # assets x failure times up to which next-failure lookup is a table
+
+FAILED_VALUES = {"1": 1, "true": 1, "yes": 1, "0": 0, "false": 0, "no": 0}
+
+
+def failure_events(fail_log, ts_col="time_stamp"):
+    """Rows of the failure log with failed == 1 (accepts 1/true/yes, any case)."""
+    if "failed" not in fail_log.columns:
+        raise ValueError("❌ failure_log.csv must contain a 'failed' column")
+    failed = fail_log["failed"].astype(str).str.lower().map(FAILED_VALUES)
+    events = fail_log[failed == 1]
+    return events.dropna(subset=[ts_col])
+
+
+def _asset_codes(df_ids, failure_ids):
+    """Integer codes for the sensor rows' assets and the failures' assets (-1: not in df)."""
+    codes, uniques = pd.factorize(df_ids)
+    # match on the (few) unique ids as strings: ints in one file, text in the other
+    fail_codes = pd.Index(pd.Index(uniques).astype(str)).get_indexer(pd.Index(failure_ids).astype(str))
+    return codes, fail_codes, len(uniques)
+
+
+def label_rul(df, failures, ts_col="time_stamp", f_ts_col="time_stamp", asset_col=ASSET_COL,
+              censor=False):
+    """
+    RUL in hours for every row of `df` (NaN where unlabelled), aligned to df.
+    Grouped by `asset_col` when both frames have it, else a single asset.
+    """
+    by = asset_col in df.columns and asset_col in failures.columns
+    t = pd.to_datetime(df[ts_col]).values.astype("datetime64[ns]").view(np.int64)
+    ft = pd.to_datetime(failures[f_ts_col]).values.astype("datetime64[ns]").view(np.int64)
+    nat = np.iinfo(np.int64).min
+
+    if by:
+        codes, fail_codes, _ = _asset_codes(df[asset_col].values, failures[asset_col].values)
+    else:
+        codes, fail_codes = np.zeros(len(t), np.int64), np.zeros(len(ft), np.int64)
+
+    keep = (fail_codes >= 0) & (ft != nat)
+    ft, fail_codes = ft[keep], fail_codes[keep].astype(np.int64)
+
+    # rank of a time among the distinct failure times: first failure time >= t
+    times = np.unique(ft)
+    stride = len(times) + 1
+    fail_keys = fail_codes * stride + np.searchsorted(times, ft, side="left")
+    order = np.argsort(fail_keys, kind="stable")
+    fail_keys, ft, fail_codes = fail_keys[order], ft[order], fail_codes[order]
+
+    row_keys = np.maximum(codes, 0).astype(np.int64) * stride + np.searchsorted(times, t, side="left")
+    n_codes = max(codes.max(initial=-1) + 1, 1)
+    if n_codes * stride <= DENSE_TABLE_MAX:
+        # next failure at or after every key: first failure per key, then a
+        # reverse running minimum within each asset's row of the table
+        table = np.full(n_codes * stride, len(fail_keys))
+        first = np.r_[True, fail_keys[1:] != fail_keys[:-1]] if len(fail_keys) else np.empty(0, bool)
+        table[fail_keys[first]] = np.flatnonzero(first)
+        table = np.minimum.accumulate(table.reshape(n_codes, stride)[:, ::-1], axis=1)[:, ::-1].ravel()
+        k = table[row_keys]
+    else:
+        k = np.searchsorted(fail_keys, row_keys, side="left")
+    k_safe = np.minimum(k, max(len(fail_keys) - 1, 0))
+    found = (k < len(fail_keys)) & (codes >= 0) & (t != nat)
+    if len(fail_keys):
+        found &= fail_codes[k_safe] == codes
+
+    rul = np.full(len(t), np.nan)
+    rul[found] = (ft[k_safe[found]] - t[found]) / 3.6e12
+
+    if not censor:
+        # past the last failure of an asset that did fail → 0, as before
+        failed_asset = np.zeros(n_codes, dtype=bool)
+        failed_asset[fail_codes] = True
+        past_last = ~found & (codes >= 0) & (t != nat) & failed_asset[np.maximum(codes, 0)]
+        rul[past_last] = 0.0
+    return rul
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+rul_sweep.py
+
+Hyperparameter sweep for the RUL LSTM (rul_train.py).
+
+Trials run in a process pool; each worker pins TensorFlow (and BLAS) to
+cpu_count // workers threads so concurrent trials do not oversubscribe the
+machine. Every finished trial is cached under its key - a hash of the
+training data file and the trial config - so a rerun only trains what is
+new. Produces, in models/rul_sweep/:
+ - trials/<key>.json, trials/<key>.h5 : per-trial result cache + model
+ - leaderboard.csv                    : all trials of the space, best first
+ - best_model.h5, best_config.json    : the winning trial
+ - rul_scaler.pkl                     : the scaler the models expect
+
+The search space is a JSON object of parameter → list of values (grid
+search over all combinations, or random search sampling n trials), e.g.
+    {"sequence_length": [20, 30, 50], "lstm_units": [[64, 32], [128, 64]],
+     "dropout": [0.2, 0.3], "batch_size": [64, 128]}
+A {"low": a, "high": b} value samples uniformly in random mode
+("log": true for log-uniform); it is rounded to an integer when both
+bounds are integers or with "int": true.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import pandas as pd
+
+from warm_start import file_sha1
+
+SWEEP_DIR = "models/rul_sweep"
+DATA_PATH = "data/processed/rul_labeled.csv"
+
+DEFAULT_SPACE = {
+    "sequence_length": [20, 30, 50],
+    "lstm_units": [[64, 32], [128, 64], [32, 16]],
+    "dropout": [0.2, 0.3],
+    "batch_size": [64, 128],
+}
+
+
+# -----------------------------
+# SEARCH SPACE
+# -----------------------------
+def grid_configs(space):
+    keys = sorted(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_configs(space, n_trials, seed=0):
+    rng = random.Random(seed)
+
+    def draw(spec):
+        if isinstance(spec, dict):
+            low, high = spec["low"], spec["high"]
+            integer = spec.get("int", isinstance(low, int) and isinstance(high, int))
+            if spec.get("log"):
+                value = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                value = rng.uniform(low, high)
+            # batch_size, sequence_length, lstm_units ... must stay integers
+            return min(max(int(round(value)), math.ceil(low)), math.floor(high)) if integer else value
+        return rng.choice(spec)
+
+    for _ in range(n_trials):
+        yield {k: draw(space[k]) for k in sorted(space)}
+
+
+def trial_key(data_hash, config):
+    payload = json.dumps({"data": data_hash, "config": config}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+# -----------------------------
+# WORKERS
+# -----------------------------
+_DATA = {}
+
+
+def _init_worker(threads):
+    # must run before TensorFlow is imported in this process
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(key, config, data_path, trials_dir):
+    """Train one config (in a worker) and cache its result."""
+    import rul_train
+
+    if data_path not in _DATA:
+        # once per worker process, not once per trial
+        X_scaled, y, _ = rul_train.load_training_data(data_path)
+        _DATA[data_path] = (X_scaled, y)
+    X_scaled, y = _DATA[data_path]
+
+    t0 = time.perf_counter()
+    model, history, n_train, n_val = rul_train.train_model(X_scaled, y, config, verbose=0)
+    model_path = os.path.join(trials_dir, f"{key}.h5")
+    model.save(model_path)
+
+    val_mae = history.history["val_mae"]
+    result = {
+        "key": key,
+        "config": config,
+        "val_mae": float(min(val_mae)),
+        "best_epoch": int(val_mae.index(min(val_mae)) + 1),
+        "epochs_run": len(val_mae),
+        "train_windows": n_train,
+        "val_windows": n_val,
+        "seconds": round(time.perf_counter() - t0, 1),
+        "model_path": model_path,
+    }
+    tmp = os.path.join(trials_dir, f"{key}.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp, os.path.join(trials_dir, f"{key}.json"))
+    return result
+
+
+# -----------------------------
+# SWEEP
+# -----------------------------
+def sweep(space=None, mode="grid", n_trials=10, seed=0, workers=None, data_path=DATA_PATH,
+          sweep_dir=SWEEP_DIR, base_config=None):
+    import rul_train
+
+    space = space or DEFAULT_SPACE
+    trials_dir = os.path.join(sweep_dir, "trials")
+    os.makedirs(trials_dir, exist_ok=True)
+
+    data_hash = file_sha1(data_path)
+    configs = grid_configs(space) if mode == "grid" else random_configs(space, n_trials, seed)
+
+    trials = {}
+    for cfg in configs:
+        config = {**rul_train.DEFAULT_CONFIG, **(base_config or {}), **cfg}
+        trials.setdefault(trial_key(data_hash, config), config)
+
+    results, pending = [], []
+    for key, config in trials.items():
+        cached = os.path.join(trials_dir, f"{key}.json")
+        if os.path.exists(cached):
+            with open(cached, "r") as f:
+                results.append(json.load(f))
+        else:
+            pending.append((key, config))
+    print(f"✅ {len(trials)} trials: {len(results)} cached, {len(pending)} to run")
+
+    if pending:
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"✅ Running on {workers} workers x {threads} TF threads...")
+
+        # spawn: TensorFlow does not survive fork
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = {pool.submit(run_trial, key, config, data_path, trials_dir): key
+                       for key, config in pending}
+            for fut in as_completed(futures):
+                try:
+                    res = fut.result()
+                except Exception as exc:
+                    print(f"❌ Trial {futures[fut]} failed: {type(exc).__name__}: {exc}")
+                    continue
+                results.append(res)
+                print(f"✅ {res['key']}: val_mae={res['val_mae']:.3f} "
+                      f"({res['epochs_run']} epochs, {res['seconds']:.0f}s) {res['config']}")
+
+    if not results:
+        raise RuntimeError("❌ No trial finished")
+
+    # -----------------------------
+    # LEADERBOARD + BEST ARTIFACT
+    # -----------------------------
+    rows = [{"rank": 0, "key": r["key"], "val_mae": r["val_mae"], "best_epoch": r["best_epoch"],
+             "epochs_run": r["epochs_run"], "seconds": r["seconds"],
+             **{k: json.dumps(v) if isinstance(v, list) else v for k, v in r["config"].items()}}
+            for r in results]
+    board = pd.DataFrame(rows).sort_values("val_mae").reset_index(drop=True)
+    board["rank"] = board.index + 1
+    board.to_csv(os.path.join(sweep_dir, "leaderboard.csv"), index=False)
+
+    best = min(results, key=lambda r: r["val_mae"])
+    shutil.copyfile(best["model_path"], os.path.join(sweep_dir, "best_model.h5"))
+    with open(os.path.join(sweep_dir, "best_config.json"), "w") as f:
+        json.dump(best, f, indent=2)
+
+    # all trials share the scaler fitted on the full labelled data
+    _, _, scaler = rul_train.load_training_data(data_path)
+    pd.to_pickle(scaler, os.path.join(sweep_dir, "rul_scaler.pkl"))
+
+    print("\n🏆 Leaderboard (top 10):")
+    print(board.head(10).to_string(index=False))
+    print("\n📁 Best model:", os.path.join(sweep_dir, "best_model.h5"), f"(val_mae={best['val_mae']:.3f})")
+    return board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the RUL LSTM.")
+    parser.add_argument("--space", default=None, help="JSON file with the search space (default: built-in)")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-trials", type=int, default=10, help="trials for random search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="parallel trials (default: one per CPU)")
+    parser.add_argument("--epochs", type=int, default=None, help="override max epochs for every trial")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--out", default=SWEEP_DIR)
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space, "r") as f:
+            space = json.load(f)
+    base = {"epochs": args.epochs} if args.epochs else None
+
+    sweep(space, args.mode, args.n_trials, args.seed, args.workers, args.data, args.out, base)
@@ -1,100 +1,258 @@
 import pandas as pd
 import numpy as np
+import argparse
 import os
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.models import load_model
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.utils import Sequence
+
+from sequence_windows import n_windows, time_split, window_batch, window_targets
+from warm_start import (FINETUNE_EPOCHS, FINETUNE_LR, REPLAY_RATIO, file_sha1, get_watermark,
+                        record_run, replay_sample)
 
 DATA_PATH = "data/processed/rul_labeled.csv"
 MODEL_OUT = "models/rul_lstm_model.h5"
+SCALER_OUT = "models/rul_scaler.pkl"
+
+MODEL_NAME = "rul_lstm"
+
+META_COLS = ["timestamp", "time_stamp", "asset_id", "id", "RUL"]
 
 # -------------------------------
-# LOAD DATA
+# DEFAULT HYPERPARAMETERS
 # -------------------------------
-df = pd.read_csv(DATA_PATH)
+DEFAULT_CONFIG = {
+    "sequence_length": 30,
+    "lstm_units": [64, 32],
+    "dropout": 0.3,
+    "batch_size": 64,
+    "epochs": 50,
+    "patience": 10,
+}
+
 
 # -------------------------------
-# REMOVE META COLUMNS SAFELY
+# LOAD + SCALE DATA
 # -------------------------------
-META_COLS = ["timestamp", "time_stamp", "asset_id", "id", "RUL"]
+def load_training_data(data_path=DATA_PATH, scaler=None, return_time=False):
+    """
+    Scaled sensor matrix (float32), RUL targets and the scaler - fitted here
+    unless an already fitted one is given. With return_time, also the row
+    timestamps (None when the file has no time column).
+    """
+    df = pd.read_csv(data_path)
 
-SENSOR_COLS = [c for c in df.columns if c not in META_COLS]
+    # remove meta columns safely
+    sensor_cols = [c for c in df.columns if c not in META_COLS]
 
-X_raw = df[SENSOR_COLS]
-y = df["RUL"].values
+    y = df["RUL"].values
 
-# -------------------------------
-# SCALE FEATURES (VECTOR SAFE)
-# -------------------------------
-scaler = MinMaxScaler()
-X_scaled = scaler.fit_transform(X_raw)
+    if scaler is None:
+        scaler = MinMaxScaler()
+        X_scaled = scaler.fit_transform(df[sensor_cols]).astype(np.float32)
+    else:
+        cols = list(getattr(scaler, "feature_names_in_", sensor_cols))
+        X_scaled = scaler.transform(df[cols]).astype(np.float32)
+
+    if not return_time:
+        return X_scaled, y, scaler
+    ts_col = next((c for c in ("time_stamp", "timestamp") if c in df.columns), None)
+    t = pd.to_datetime(df[ts_col]) if ts_col else None
+    return X_scaled, y, scaler, t
 
-# Save scaler
-os.makedirs("models", exist_ok=True)
-pd.to_pickle(scaler, "models/rul_scaler.pkl")
 
 # -------------------------------
 # SEQUENCE GENERATION (LSTM)
 # -------------------------------
-SEQUENCE_LENGTH = 30
+class WindowSequence(Sequence):
+    """
+    Batches of windows X[i:i+seq_len] → y[i+seq_len], cut from the scaled
+    matrix on demand instead of a seq_len-times copy of it.
+    """
 
-X_seq = []
-y_seq = []
+    def __init__(self, X, y, indices, seq_len, batch_size, shuffle=False, **kwargs):
+        super().__init__(**kwargs)
+        self.X, self.y = X, y
+        self.indices = np.array(indices)
+        self.seq_len = seq_len
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.on_epoch_end()
 
-for i in range(len(X_scaled) - SEQUENCE_LENGTH):
-    X_seq.append(X_scaled[i:i+SEQUENCE_LENGTH])
-    y_seq.append(y[i+SEQUENCE_LENGTH])
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
 
-X_seq = np.array(X_seq)
-y_seq = np.array(y_seq)
+    def __getitem__(self, k):
+        idx = self.indices[k * self.batch_size:(k + 1) * self.batch_size]
+        return window_batch(self.X, self.seq_len, idx), self.y[idx]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.indices)
 
-# -------------------------------
-# TRAIN / VALIDATION SPLIT
-# -------------------------------
-X_train, X_val, y_train, y_val = train_test_split(
-    X_seq, y_seq, test_size=0.2, shuffle=False
-)
 
 # -------------------------------
 # BUILD LSTM MODEL
 # -------------------------------
-model = Sequential([
-    LSTM(64, return_sequences=True, input_shape=(X_seq.shape[1], X_seq.shape[2])),
-    Dropout(0.3),
-    LSTM(32),
-    Dropout(0.3),
-    Dense(1)
-])
-
-model.compile(
-    optimizer="adam",
-    loss="mse",
-    metrics=["mae"]
-)
+def build_model(config, n_features):
+    units = config["lstm_units"]
+    units = [units] if isinstance(units, int) else list(units)   # an int: one LSTM layer
+    layers = []
+    for k, u in enumerate(units):
+        last = k == len(units) - 1
+        kwargs = {"input_shape": (config["sequence_length"], n_features)} if k == 0 else {}
+        layers.append(LSTM(u, return_sequences=not last, **kwargs))
+        layers.append(Dropout(config["dropout"]))
+    layers.append(Dense(1))
+
+    model = Sequential(layers)
+    model.compile(
+        optimizer="adam",
+        loss="mse",
+        metrics=["mae"]
+    )
+    return model
+
 
 # -------------------------------
 # TRAIN
 # -------------------------------
-early_stop = EarlyStopping(patience=10, restore_best_weights=True)
-
-history = model.fit(
-    X_train,
-    y_train,
-    validation_data=(X_val, y_val),
-    epochs=50,
-    batch_size=64,
-    callbacks=[early_stop],
-    verbose=1
-)
+def train_model(X_scaled, y, config=None, verbose=1):
+    """
+    Train one LSTM on a time-ordered 80/20 split (same sizes as
+    train_test_split(test_size=0.2, shuffle=False)).
+    Returns (model, history, n_train, n_val).
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    seq_len = config["sequence_length"]
+
+    y_seq = window_targets(y, seq_len)
+    train_idx, val_idx = time_split(n_windows(len(X_scaled), seq_len), test_size=0.2)
+
+    train_seq = WindowSequence(X_scaled, y_seq, train_idx, seq_len, config["batch_size"], shuffle=True)
+    val_seq = WindowSequence(X_scaled, y_seq, val_idx, seq_len, config["batch_size"])
+
+    model = build_model(config, X_scaled.shape[1])
+    early_stop = EarlyStopping(patience=config["patience"], restore_best_weights=True)
+
+    history = model.fit(
+        train_seq,
+        validation_data=val_seq,
+        epochs=config["epochs"],
+        callbacks=[early_stop],
+        verbose=verbose
+    )
+    return model, history, len(train_idx), len(val_idx)
+
 
 # -------------------------------
-# SAVE MODEL
+# FINE-TUNE (WARM START)
 # -------------------------------
-model.save(MODEL_OUT)
+def finetune_model(model, X_scaled, y, new_idx, old_idx, batch_size=64, epochs=FINETUNE_EPOCHS,
+                   replay_ratio=REPLAY_RATIO, verbose=1):
+    """
+    Continue training `model` on the windows new_idx (time-split 80/20 into
+    train/val) plus a replay sample of the older windows old_idx.
+    """
+    seq_len = model.input_shape[1]
+    y_seq = window_targets(y, seq_len)
+
+    train_pos, val_pos = time_split(len(new_idx), test_size=0.2) if len(new_idx) >= 5 else \
+        (np.arange(len(new_idx)), np.arange(0))
+    replay = old_idx[replay_sample(len(old_idx), len(train_pos), replay_ratio)]
+    train_idx = np.concatenate([new_idx[train_pos], replay])
+
+    train_seq = WindowSequence(X_scaled, y_seq, train_idx, seq_len, batch_size, shuffle=True)
+    val_seq = WindowSequence(X_scaled, y_seq, new_idx[val_pos], seq_len, batch_size) if len(val_pos) else None
+
+    model.compile(optimizer=Adam(FINETUNE_LR), loss="mse", metrics=["mae"])
+    history = model.fit(train_seq, validation_data=val_seq, epochs=epochs, verbose=verbose)
+    return history, len(train_idx) - len(replay), len(replay), len(val_pos)
+
+
+def finetune(data_path=DATA_PATH, model_path=MODEL_OUT, scaler_path=SCALER_OUT, epochs=FINETUNE_EPOCHS,
+             replay_ratio=REPLAY_RATIO):
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        raise FileNotFoundError(f"❌ {model_path} / {scaler_path} not found; run a full training first")
+
+    # keep the scaling the current model was trained with
+    scaler = pd.read_pickle(scaler_path)
+    X_scaled, y, _, t = load_training_data(data_path, scaler, return_time=True)
+
+    parent_sha1 = file_sha1(model_path)
+    model = load_model(model_path, compile=False)
+    seq_len = model.input_shape[1]
+    n = n_windows(len(X_scaled), seq_len)
+
+    # a window is new when its target row is past the watermark
+    watermark = get_watermark(MODEL_NAME)
+    if t is None or watermark is None:
+        print("⚠️ No training watermark (or time column); fine-tuning on all windows")
+        is_new = np.ones(n, dtype=bool)
+    else:
+        is_new = (t.values[seq_len:seq_len + n] > np.datetime64(watermark)).astype(bool)
+    new_idx, old_idx = np.flatnonzero(is_new), np.flatnonzero(~is_new)
+    if len(new_idx) == 0:
+        print("✅ No new data since the last training watermark; model unchanged")
+        return None
+
+    history, n_new, n_replay, n_val = finetune_model(model, X_scaled, y, new_idx, old_idx,
+                                                     epochs=epochs, replay_ratio=replay_ratio)
+    model.save(model_path)
+
+    final = {k: float(v[-1]) for k, v in history.history.items()}
+    run = record_run(MODEL_NAME, model_path, t.max() if t is not None else None, "finetune", parent_sha1,
+                     since=str(watermark) if watermark is not None else None, epochs=epochs,
+                     n_new=n_new, n_replay=n_replay, n_val=n_val, **final)
+
+    print("✅ RUL LSTM fine-tuned!")
+    print("📁 Model saved to:", model_path)
+    print(f"✅ New windows: {n_new} (+{n_val} validation), replayed: {n_replay}")
+    print(f"✅ Manifest: {MODEL_NAME} v{run['version']}, watermark {run['watermark']}")
+    return model, history
+
+
+def main(data_path=DATA_PATH, model_out=MODEL_OUT, scaler_out=SCALER_OUT, config=None):
+    X_scaled, y, scaler, t = load_training_data(data_path, return_time=True)
+
+    # Save scaler
+    os.makedirs(os.path.dirname(scaler_out) or ".", exist_ok=True)
+    pd.to_pickle(scaler, scaler_out)
+
+    model, history, n_train, n_val = train_model(X_scaled, y, config)
+
+    # -------------------------------
+    # SAVE MODEL
+    # -------------------------------
+    model.save(model_out)
+
+    final = {k: float(v[-1]) for k, v in history.history.items()}
+    record_run(MODEL_NAME, model_out, t.max() if t is not None else None, "full",
+               epochs=len(history.history["loss"]), n_train=n_train, n_val=n_val, **final)
+
+    print("✅ RUL LSTM model trained successfully!")
+    print("📁 Model saved to:", model_out)
+    print("✅ Training samples:", n_train)
+    print("✅ Validation samples:", n_val)
+    return model, history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the RUL LSTM.")
+    parser.add_argument("--finetune", action="store_true",
+                        help="warm-start from the current model on data since the last watermark")
+    parser.add_argument("--epochs", type=int, default=None,
+                        help=f"epochs (default: {DEFAULT_CONFIG['epochs']} with early stopping, "
+                             f"or {FINETUNE_EPOCHS} with --finetune)")
+    parser.add_argument("--replay-ratio", type=float, default=REPLAY_RATIO,
+                        help="older windows replayed per new window when fine-tuning")
+    args = parser.parse_args()
 
-print("✅ RUL LSTM model trained successfully!")
-print("📁 Model saved to:", MODEL_OUT)
-print("✅ Training samples:", X_train.shape[0])
-print("✅ Validation samples:", X_val.shape[0])
+    if args.finetune:
+        finetune(epochs=args.epochs or FINETUNE_EPOCHS, replay_ratio=args.replay_ratio)
+    else:
+        main(config={"epochs": args.epochs} if args.epochs else None)
@@ -0,0 +1,221 @@
+"""
+schema_registry.py
+
+Infers the layout of a raw SCADA export once - delimiter, timestamp column
+and format, which columns carry numbers - and caches it per raw source
+under data/schemas/. Later loads use the C (or Arrow, if installed) parser
+with explicit float32 dtypes and skip the non-numeric columns entirely.
+
+A cached schema is re-inferred automatically when the header line of the
+raw file changes.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import warnings
+
+import pandas as pd
+
+SCHEMA_DIR = "data/schemas"
+SAMPLE_ROWS = 10_000
+SENSOR_DTYPE = "float32"
+
+TIMESTAMP_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+]
+
+try:
+    import pyarrow  # noqa: F401
+    FAST_ENGINE = "pyarrow"
+except ImportError:
+    FAST_ENGINE = "c"
+
+
+# -----------------------------
+# INFERENCE
+# -----------------------------
+def _header(raw_path):
+    with open(raw_path, "rb") as f:
+        return f.readline()
+
+
+def _schema_path(raw_path, schema_dir=SCHEMA_DIR):
+    name = os.path.splitext(os.path.basename(raw_path))[0]
+    return os.path.join(schema_dir, f"{name}.schema.json")
+
+
+def _detect_timestamp_format(values):
+    """First candidate format that parses every sampled value."""
+    values = values.dropna().astype(str)
+    if len(values) == 0:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+        if parsed.notna().all():
+            return fmt
+    return None
+
+
+def infer_schema(raw_path, sample_rows=SAMPLE_ROWS):
+    header = _header(raw_path)
+    text = header.decode("utf-8", errors="replace")
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=";,\t|").delimiter
+    except csv.Error:
+        delimiter = ";"
+
+    sample = pd.read_csv(raw_path, sep=delimiter, nrows=sample_rows, dtype=str)
+    ts_col = sample.columns[0]
+
+    columns = {}
+    for col in sample.columns[1:]:
+        values = sample[col].dropna()
+        numeric = pd.to_numeric(values, errors="coerce")
+        # keep anything with at least one number; text-only columns are skipped
+        columns[col] = SENSOR_DTYPE if len(values) == 0 or numeric.notna().any() else "skip"
+
+    return {
+        "source": os.path.abspath(raw_path),
+        "header_sha1": hashlib.sha1(header).hexdigest(),
+        "delimiter": delimiter,
+        "timestamp_column": ts_col,
+        "timestamp_format": _detect_timestamp_format(sample[ts_col]),
+        "columns": columns,
+    }
+
+
+def get_schema(raw_path, schema_dir=SCHEMA_DIR, refresh=False):
+    """Cached schema for a raw source, (re-)inferred when missing or stale."""
+    path = _schema_path(raw_path, schema_dir)
+    header_sha1 = hashlib.sha1(_header(raw_path)).hexdigest()
+
+    if not refresh and os.path.exists(path):
+        with open(path, "r") as f:
+            schema = json.load(f)
+        if schema.get("header_sha1") == header_sha1:
+            return schema
+
+    schema = infer_schema(raw_path)
+    os.makedirs(schema_dir, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(schema, f, indent=2)
+    return schema
+
+
+def sensor_columns(schema):
+    return [c for c, dtype in schema["columns"].items() if dtype != "skip"]
+
+
+# -----------------------------
+# FAST LOADING
+# -----------------------------
+def _finish(df, schema):
+    ts_col = schema["timestamp_column"]
+    raw = df[ts_col]
+    ts = pd.to_datetime(raw, format=schema["timestamp_format"], errors="coerce")
+    # rows outside the sampled format fall back to per-value inference
+    failed = ts.isna() & raw.notna()
+    if failed.any():
+        ts[failed] = pd.to_datetime(raw[failed], format="mixed", errors="coerce")
+    df[ts_col] = ts
+    n_dropped = int(ts.isna().sum())
+    if n_dropped:
+        warnings.warn(f"Dropped {n_dropped} rows without a parseable timestamp")
+    return df.dropna(subset=[ts_col]).set_index(ts_col)
+
+
+def _coerce(df, cols):
+    for col in cols:
+        if df[col].dtype != SENSOR_DTYPE:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(SENSOR_DTYPE)
+    return df
+
+
+def _opener(source):
+    """Callable returning a fresh readable for a path or an in-memory file."""
+    if isinstance(source, (str, os.PathLike)):
+        return lambda: source
+    data = source.read()
+    return lambda: io.BytesIO(data) if isinstance(data, bytes) else io.StringIO(data)
+
+
+def _iter_chunks(path, kwargs, ts_col, chunksize):
+    done = 0
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunksize, engine="c", **kwargs):
+            done += len(chunk)
+            yield chunk
+    except ValueError:
+        # resume after the rows already yielded, letting the parser infer dtypes
+        warnings.warn("Non-numeric values in a sensor column; falling back to coercion")
+        kwargs = dict(kwargs, dtype={ts_col: str})
+        for chunk in pd.read_csv(path, chunksize=chunksize, engine="c",
+                                 skiprows=range(1, done + 1), **kwargs):
+            yield chunk
+
+
+def read_raw(source, schema, usecols=None, chunksize=None, engine=None):
+    """
+    Load a raw export (path or file-like) with the cached schema: explicit
+    float32 sensor dtypes, pruned columns and a fixed timestamp format.
+    Returns a timestamp-indexed frame, or an iterator of them with chunksize
+    (paths only). If a sensor column turns out to hold text, the read falls
+    back to coercing it, as the legacy path did.
+    """
+    cols = list(usecols) if usecols is not None else sensor_columns(schema)
+    ts_col = schema["timestamp_column"]
+    kwargs = dict(
+        sep=schema["delimiter"],
+        usecols=[ts_col] + cols,
+        dtype={ts_col: str, **{c: SENSOR_DTYPE for c in cols}},
+    )
+
+    if chunksize:
+        return (_finish(_coerce(c, cols), schema)
+                for c in _iter_chunks(source, kwargs, ts_col, chunksize))
+
+    open_source = _opener(source)
+    try:
+        df = pd.read_csv(open_source(), engine=engine or FAST_ENGINE, **kwargs)
+    except (ValueError, TypeError):
+        warnings.warn("Non-numeric values in a sensor column; falling back to coercion")
+        kwargs["dtype"] = {ts_col: str}
+        df = pd.read_csv(open_source(), engine="c", **kwargs)
+    return _finish(_coerce(df, cols), schema)
+
+
+def legacy_read_raw(raw_path):
+    """The original parsing path (Python engine, float64), kept for benchmarks."""
+    df = pd.read_csv(raw_path, sep=";", engine="python")
+    df.iloc[:, 0] = pd.to_datetime(df.iloc[:, 0], errors="coerce")
+    df = df.dropna(subset=[df.columns[0]])
+    df = df.set_index(df.columns[0])
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+if __name__ == "__main__":
+    import sys
+
+    for raw in sys.argv[1:] or ["data/raw/44.csv"]:
+        schema = get_schema(raw, refresh=True)
+        n_sensors = len(sensor_columns(schema))
+        print(f"✅ {raw}: delimiter={schema['delimiter']!r}, "
+              f"timestamp={schema['timestamp_column']} ({schema['timestamp_format']}), "
+              f"{n_sensors} sensor columns, {len(schema['columns']) - n_sensors} skipped")
+        print("📁 Saved to:", _schema_path(raw))
@@ -0,0 +1,240 @@
+"""
+sensor_store.py
+
+Binary, memory-mapped store for the processed sensor matrix.
+
+Layout of a store directory (default: data/processed/44_processed.store):
+ - manifest.json   : columns, index name, row count, allocated capacity
+ - values.f32      : float32 matrix, column-major, (capacity, n_columns)
+ - timestamps.i8   : int64 epoch nanoseconds, sorted, (capacity,)
+
+Opening a store only parses the manifest and maps the two files, so it is
+O(1) in the number of rows. Because the matrix is column-major, reading a
+subset of columns or a time slice only touches those pages. Appends fill
+the spare capacity in place and grow it geometrically when needed.
+
+Run as a script to convert an existing 44_processed.csv into a store.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+STORE_PATH = "data/processed/44_processed.store"
+CSV_PATH = "data/processed/44_processed.csv"
+
+MANIFEST_FILE = "manifest.json"
+VALUES_FILE = "values.f32"
+TIMESTAMPS_FILE = "timestamps.i8"
+FORMAT_VERSION = 1
+
+
+# -----------------------------
+# LOW-LEVEL HELPERS
+# -----------------------------
+def _read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def _write_manifest(path, manifest):
+    tmp = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST_FILE))
+
+
+def _map(path, manifest, mode="r"):
+    capacity = manifest["capacity"]
+    n_cols = len(manifest["columns"])
+    values = np.memmap(os.path.join(path, VALUES_FILE), dtype=np.float32, mode=mode,
+                       shape=(max(capacity, 1), n_cols), order="F")
+    timestamps = np.memmap(os.path.join(path, TIMESTAMPS_FILE), dtype=np.int64, mode=mode,
+                           shape=(max(capacity, 1),))
+    return values, timestamps
+
+
+def _frame_parts(df):
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise ValueError("❌ Sensor frame must be indexed by timestamp")
+    ts = df.index.as_unit("ns").asi8 if hasattr(df.index, "as_unit") else df.index.asi8
+    return np.asarray(df.values, dtype=np.float32), ts
+
+
+# -----------------------------
+# READER
+# -----------------------------
+class SensorStore:
+    """Read-only view of a store directory."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        manifest = _read_manifest(path)
+        self.columns = manifest["columns"]
+        self.index_name = manifest.get("index_name")
+        self.n_rows = manifest["n_rows"]
+
+        values, timestamps = _map(path, manifest)
+        self.values = values[:self.n_rows]
+        self.timestamps = timestamps[:self.n_rows]
+        self._col_pos = {c: i for i, c in enumerate(self.columns)}
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.timestamps.view("datetime64[ns]"), name=self.index_name)
+
+    def row_range(self, start=None, end=None):
+        """Rows with start <= timestamp < end, found by binary search."""
+        i0 = 0 if start is None else int(np.searchsorted(self.timestamps, pd.Timestamp(start).value, side="left"))
+        i1 = self.n_rows if end is None else int(np.searchsorted(self.timestamps, pd.Timestamp(end).value, side="left"))
+        return i0, max(i0, i1)
+
+    def _rows(self, start=None, end=None, tail=None):
+        i0, i1 = self.row_range(start, end)
+        if tail is not None:
+            i0 = max(i0, i1 - int(tail))
+        return i0, i1
+
+    def read(self, columns=None, start=None, end=None, tail=None):
+        """
+        float32 array for a column subset / time slice. Without a column
+        subset this is a zero-copy view of the mapped file.
+        """
+        i0, i1 = self._rows(start, end, tail)
+        if columns is None:
+            return self.values[i0:i1]
+        idx = [self._col_pos[c] for c in columns]
+        return self.values[i0:i1, idx]
+
+    def to_frame(self, columns=None, start=None, end=None, tail=None):
+        i0, i1 = self._rows(start, end, tail)
+        cols = self.columns if columns is None else list(columns)
+        index = pd.DatetimeIndex(self.timestamps[i0:i1].view("datetime64[ns]"), name=self.index_name)
+        return pd.DataFrame(self.read(columns, start, end, tail), index=index, columns=cols, copy=False)
+
+
+def open_store(path=STORE_PATH):
+    return SensorStore(path)
+
+
+# -----------------------------
+# WRITERS
+# -----------------------------
+def _allocate(path, manifest, rows=None, old=None):
+    """
+    Create fresh data files for `manifest` beside the current ones, fill
+    them, then swap them in. Readers holding the old mapping stay valid.
+    """
+    os.makedirs(path, exist_ok=True)
+    capacity = max(manifest["capacity"], 1)
+    n_cols = len(manifest["columns"])
+    tmp_values = os.path.join(path, VALUES_FILE + ".tmp")
+    tmp_ts = os.path.join(path, TIMESTAMPS_FILE + ".tmp")
+
+    mv = np.memmap(tmp_values, dtype=np.float32, mode="w+", shape=(capacity, n_cols), order="F")
+    mt = np.memmap(tmp_ts, dtype=np.int64, mode="w+", shape=(capacity,))
+    n = 0
+    if old is not None:
+        old_values, old_ts, n = old
+        mv[:n] = old_values[:n]
+        mt[:n] = old_ts[:n]
+    if rows is not None:
+        values, ts = rows
+        mv[n:n + len(ts)] = values
+        mt[n:n + len(ts)] = ts
+    mv.flush()
+    mt.flush()
+    del mv, mt
+
+    os.replace(tmp_values, os.path.join(path, VALUES_FILE))
+    os.replace(tmp_ts, os.path.join(path, TIMESTAMPS_FILE))
+    _write_manifest(path, manifest)
+    return path
+
+
+def write_store(df, path=STORE_PATH, capacity=None):
+    """Create (or replace) a store from a timestamp-indexed frame."""
+    values, ts = _frame_parts(df)
+    manifest = {
+        "version": FORMAT_VERSION,
+        "index_name": df.index.name,
+        "columns": [str(c) for c in df.columns],
+        "n_rows": len(ts),
+        "capacity": max(len(ts), capacity or 0),
+    }
+    return _allocate(path, manifest, rows=(values, ts))
+
+
+def append_store(df, path=STORE_PATH):
+    """
+    Append rows (not older than the last stored timestamp) to a store.
+    Amortised cost is proportional to the number of appended rows.
+    """
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return write_store(df, path)
+
+    manifest = _read_manifest(path)
+    if [str(c) for c in df.columns] != manifest["columns"]:
+        raise ValueError("❌ Appended columns do not match the store")
+
+    values, ts = _frame_parts(df)
+    n, k = manifest["n_rows"], len(ts)
+    if k == 0:
+        return path
+
+    store_values, store_ts = _map(path, manifest, mode="r+")
+    if n > 0 and ts[0] < store_ts[n - 1]:
+        raise ValueError("❌ Appended rows must not be older than the store")
+
+    manifest["n_rows"] = n + k
+    if n + k > manifest["capacity"]:
+        # grow geometrically, so full rewrites stay rare
+        manifest["capacity"] = max(2 * manifest["capacity"], n + k)
+        return _allocate(path, manifest, rows=(values, ts), old=(store_values, store_ts, n))
+
+    store_values[n:n + k] = values
+    store_ts[n:n + k] = ts
+    store_values.flush()
+    store_ts.flush()
+    del store_values, store_ts
+
+    _write_manifest(path, manifest)
+    return path
+
+
+# -----------------------------
+# SHARED LOADER
+# -----------------------------
+def load_processed(columns=None, start=None, end=None, tail=None, path=STORE_PATH, csv_path=CSV_PATH):
+    """
+    Processed sensor matrix as a timestamp-indexed DataFrame - the binary
+    store when present (zero-copy over the mapped file), else the legacy CSV.
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return SensorStore(path).to_frame(columns, start, end, tail)
+
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"❌ No processed data at {path} or {csv_path}. Run preprocess.py first.")
+
+    df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    if columns is not None:
+        df = df[list(columns)]
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df.index < pd.Timestamp(end)]
+    if tail is not None:
+        df = df.tail(int(tail))
+    return df
+
+
+if __name__ == "__main__":
+    print("Converting", CSV_PATH, "→", STORE_PATH)
+    df = pd.read_csv(CSV_PATH, index_col=0, parse_dates=True)
+    write_store(df, STORE_PATH)
+    print("✅ Store written:", STORE_PATH, df.shape)
@@ -0,0 +1,47 @@
+"""
+sequence_windows.py
+
+Sliding windows over a (rows, features) matrix without copying it.
+
+Window i is X[i:i + seq_len] for i in range(len(X) - seq_len) and its
+target is y[i + seq_len] - the layout rul_train.py / rul_infer.py always
+used. The windows are a strided view, so memory stays at the size of X;
+only the batches handed to the model are materialised.
+"""
+
+import math
+
+import numpy as np
+
+
+def n_windows(n_rows, seq_len):
+    return max(0, n_rows - seq_len)
+
+
+def sliding_windows(X, seq_len):
+    """Read-only (n_windows, seq_len, features) view of X."""
+    X = np.asarray(X)
+    n = n_windows(len(X), seq_len)
+    if n == 0:
+        return np.empty((0, seq_len) + X.shape[1:], X.dtype)
+    view = np.lib.stride_tricks.sliding_window_view(X, seq_len, axis=0)
+    # sliding_window_view puts the window axis last
+    return view[:n].transpose(0, 2, 1)
+
+
+def window_targets(y, seq_len):
+    return np.asarray(y)[seq_len:]
+
+
+def time_split(n, test_size=0.2):
+    """
+    Index ranges (train, val) for a time-ordered split of n samples, same
+    sizes as sklearn's train_test_split(test_size=test_size, shuffle=False).
+    """
+    n_val = math.ceil(test_size * n)
+    return np.arange(0, n - n_val), np.arange(n - n_val, n)
+
+
+def window_batch(X, seq_len, idx):
+    """Materialise the windows starting at rows idx as (len(idx), seq_len, features)."""
+    return sliding_windows(X, seq_len)[idx]
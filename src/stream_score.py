@@ -0,0 +1,188 @@
+"""
+stream_score.py
+
+Bounded-memory autoencoder scoring over the binary sensor store.
+
+The store is consumed in fixed-size row chunks; the next chunk is paged
+in by a background thread while the current one is being predicted.
+Per-sample reconstruction errors are appended to ERROR_PATH as they are
+produced, and anomaly/RCA rows to the anomaly CSV.
+
+With a known threshold, or an OnlineThreshold state classifying each
+sample as it arrives, everything happens in one pass. Otherwise (the
+batch rule mean + 4*std) pass 1 keeps running moments and spills the
+errors to a temporary disk-backed array, and pass 2 re-reads and
+re-predicts only the anomalous rows for RCA. Memory stays flat in the
+input length either way.
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from online_threshold import merge_moments
+from rca_subsystem_mapper import anomaly_rca_frame, build_subsystem_codes
+
+ERROR_PATH = "data/processed/reconstruction_error.csv"
+OUTPUT_PATH = "data/processed/anomaly_with_root_cause.csv"
+CHUNK_SIZE = 16_384
+THRESHOLD_SIGMA = 4.0
+TOP_K_SENSORS = 5
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+def _bounds(n, size):
+    return [(i, min(i + size, n)) for i in range(0, n, size)]
+
+
+def _prefetched(store, bounds):
+    """Yields (i0, i1, X) while the next chunk is read in a background thread."""
+    def read(b):
+        # copying forces the pages in here, off the prediction thread
+        return b[0], b[1], np.ascontiguousarray(store.values[b[0]:b[1]])
+
+    if not bounds:
+        return
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(read, bounds[0])
+        for k in range(len(bounds)):
+            chunk = pending.result()
+            if k + 1 < len(bounds):
+                pending = pool.submit(read, bounds[k + 1])
+            yield chunk
+
+
+def _timestamps(store, idx):
+    return pd.DatetimeIndex(store.timestamps[idx].view("datetime64[ns]"), name=store.index_name)
+
+
+# -----------------------------
+# STREAMING SCORER
+# -----------------------------
+def score_stream(predict, store, sensor_map, chunk_size=CHUNK_SIZE, threshold=None,
+                 sigma=THRESHOLD_SIGMA, output_path=OUTPUT_PATH, error_path=ERROR_PATH,
+                 verbose=True, scorer=None):
+    """
+    Score every row of `store` with `predict` (X -> X_reconstructed).
+    `scorer` (an OnlineThreshold) takes precedence over `threshold`.
+    Returns a summary with the threshold, anomaly count and rows/sec.
+    """
+    n = len(store)
+    feature_names = list(store.columns)
+    codes, labels = build_subsystem_codes(feature_names, sensor_map)
+    bounds = _bounds(n, chunk_size)
+
+    for path in (output_path, error_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    moments = (0, 0.0, 0.0)
+    n_anomalies = 0
+    header = True
+    spill = None
+    if scorer is not None:
+        classify = scorer.update_many
+    elif threshold is not None:
+        classify = lambda e: e > threshold
+    else:
+        spill_file = tempfile.NamedTemporaryFile(suffix=".f32", delete=False)
+        spill_file.close()
+        spill = np.memmap(spill_file.name, dtype=np.float32, mode="w+", shape=(max(n, 1),))
+
+    def write_anomalies(idx, err, X, X_rec):
+        nonlocal header, n_anomalies
+        rows = anomaly_rca_frame(_timestamps(store, idx), err, np.abs(X - X_rec),
+                                 feature_names, codes, labels, TOP_K_SENSORS)
+        rows.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        n_anomalies += len(rows)
+
+    try:
+        t0 = time.perf_counter()
+        with open(error_path, "w") as err_file:
+            err_file.write("timestamp,reconstruction_error\n")
+
+            # ---------- PASS 1: score every chunk ----------
+            for i0, i1, X in _prefetched(store, bounds):
+                X_rec = predict(X)
+                err = np.mean(np.square(X - X_rec), axis=1)
+                moments = merge_moments(moments, err)
+
+                pd.DataFrame({"timestamp": _timestamps(store, slice(i0, i1)), "reconstruction_error": err}) \
+                    .to_csv(err_file, header=False, index=False)
+
+                if spill is not None:
+                    spill[i0:i1] = err
+                else:
+                    hit = np.flatnonzero(classify(err))
+                    if len(hit):
+                        write_anomalies(hit + i0, err[hit], X[hit], X_rec[hit])
+
+                if verbose:
+                    print(f"   scored {i1}/{n} rows", end="\r")
+        score_seconds = time.perf_counter() - t0
+
+        # ---------- PASS 2: batch threshold, RCA on anomalous rows only ----------
+        count, mean, m2 = moments
+        std = np.sqrt(m2 / count) if count else 0.0
+        if scorer is not None:
+            threshold = scorer.threshold
+        elif threshold is None:
+            threshold = mean + sigma * std
+            for i0, i1 in bounds:
+                err = np.asarray(spill[i0:i1])
+                hit = np.flatnonzero(err > threshold)
+                if len(hit):
+                    idx = hit + i0
+                    X = np.ascontiguousarray(store.values[idx])
+                    write_anomalies(idx, err[hit], X, predict(X))
+    finally:
+        # the spill file goes even if scoring fails part-way
+        if spill is not None:
+            del spill
+            os.remove(spill_file.name)
+
+    if header:
+        # no anomalies: still leave a file with the expected columns
+        anomaly_rca_frame([], np.empty(0), np.empty((0, len(feature_names))),
+                          feature_names, codes, labels).to_csv(output_path, index=False)
+
+    total_seconds = time.perf_counter() - t0
+    summary = {
+        "rows": n,
+        "chunk_size": chunk_size,
+        "error_path": error_path,
+        "threshold": float(threshold),
+        "error_mean": float(mean),
+        "error_std": float(std),
+        "anomalies": n_anomalies,
+        "score_seconds": score_seconds,
+        "total_seconds": total_seconds,
+        "rows_per_sec": n / max(score_seconds, 1e-9),
+    }
+    if verbose:
+        print(f"\n✅ Scored {n} rows in chunks of {chunk_size}: "
+              f"{summary['rows_per_sec']:,.0f} rows/sec, {n_anomalies} anomalies "
+              f"(threshold {threshold:.6f})")
+    return summary
+
+
+def benchmark(predict, store, sensor_map, chunk_sizes, threshold=None):
+    """Run the streaming scorer once per chunk size into a scratch dir; report rows/sec."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in chunk_sizes:
+            summary = score_stream(
+                predict, store, sensor_map, chunk_size=size, threshold=threshold,
+                output_path=os.path.join(tmp, "anomalies.csv"),
+                error_path=os.path.join(tmp, "errors.csv"), verbose=False,
+            )
+            results.append(summary)
+            print(f"chunk_size={size:>7}: {summary['rows_per_sec']:>12,.0f} rows/sec "
+                  f"(score {summary['score_seconds']:.2f}s, total {summary['total_seconds']:.2f}s)")
+    return results
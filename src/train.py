@@ -4,25 +4,21 @@ import tensorflow as tf
 from tensorflow.keras import layers, models
 import joblib
 import matplotlib.pyplot as plt
+import argparse
 import os
 
-PROCESSED_PATH = "data/processed/44_processed.csv"
-MODEL_PATH = "models/autoencoder.h5"
-
+from sensor_store import load_processed
+from warm_start import (FINETUNE_EPOCHS, FINETUNE_LR, REPLAY_RATIO, file_sha1, get_watermark,
+                        record_run, replay_sample, show_or_save)
 
-def main():
-    print("Loading processed data...")
-    df = pd.read_csv(PROCESSED_PATH, index_col=0)
-    X = df.values
+MODEL_PATH = "models/autoencoder.h5"
+PLOT_PATH = "models/autoencoder_loss.png"
+MODEL_NAME = "autoencoder"
 
-    # Train / validation split (time-based)
-    split = int(0.8 * len(X))
-    X_train, X_val = X[:split], X[split:]
 
-    input_dim = X.shape[1]
+def build_autoencoder(input_dim):
     latent_dim = max(4, input_dim // 4)
 
-    print("Building autoencoder...")
     inputs = layers.Input(shape=(input_dim,))
     x = layers.Dense(128, activation="relu")(inputs)
     x = layers.Dense(64, activation="relu")(x)
@@ -33,12 +29,73 @@ def main():
 
     autoencoder = models.Model(inputs, outputs)
     autoencoder.compile(optimizer="adam", loss="mse")
+    return autoencoder
+
+
+def finetune_data(replay_ratio=REPLAY_RATIO, seed=0):
+    """
+    Rows after the watermark (time-split 80/20 into train/val) plus a replay
+    sample of older rows added to train. Returns (X_train, X_val, info) or
+    None when nothing is new.
+    """
+    watermark = get_watermark(MODEL_NAME)
+    if watermark is None:
+        print("⚠️ No training watermark recorded; fine-tuning on all data")
+        new, old = load_processed(), None
+    else:
+        new = load_processed(start=watermark)
+        new = new[new.index > watermark]
+        old = load_processed(end=watermark)
+    if len(new) == 0:
+        return None
+
+    X_new = new.values
+    split = int(0.8 * len(X_new)) if len(X_new) >= 5 else len(X_new)
+    replay = replay_sample(len(old) if old is not None else 0, split, replay_ratio, seed)
+    X_replay = old.values[replay] if len(replay) else X_new[:0]
+
+    X_train = np.concatenate([X_new[:split], X_replay])
+    info = {"since": str(watermark) if watermark is not None else None,
+            "watermark": new.index.max(), "n_new": len(X_new), "n_replay": len(X_replay)}
+    return X_train, X_new[split:], info
+
+
+def main(finetune=False, epochs=None, replay_ratio=REPLAY_RATIO, show=None):
+    if finetune:
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"❌ {MODEL_PATH} not found; run a full training first")
+        print("Loading data since the last training watermark...")
+        data = finetune_data(replay_ratio)
+        if data is None:
+            print("✅ No new data since the last training watermark; model unchanged")
+            return None
+        X_train, X_val, info = data
+        print(f"✅ {info['n_new']} new rows since {info['since']}, {info['n_replay']} replayed")
+
+        parent_sha1 = file_sha1(MODEL_PATH)
+        autoencoder = tf.keras.models.load_model(MODEL_PATH, compile=False)
+        autoencoder.compile(optimizer=tf.keras.optimizers.Adam(FINETUNE_LR), loss="mse")
+        epochs = epochs or FINETUNE_EPOCHS
+    else:
+        print("Loading processed data...")
+        df = load_processed()
+        X = df.values
+
+        # Train / validation split (time-based)
+        split = int(0.8 * len(X))
+        X_train, X_val = X[:split], X[split:]
+        info = {"watermark": df.index.max(), "n_rows": len(X)}
+        parent_sha1 = None
+
+        print("Building autoencoder...")
+        autoencoder = build_autoencoder(X.shape[1])
+        epochs = epochs or 25
 
     print("Training...")
     history = autoencoder.fit(
         X_train, X_train,
-        validation_data=(X_val, X_val),
-        epochs=25,
+        validation_data=(X_val, X_val) if len(X_val) else None,
+        epochs=epochs,
         batch_size=256,
         shuffle=True
     )
@@ -48,11 +105,28 @@ def main():
 
     print("✅ Model saved to", MODEL_PATH)
 
+    final = {k: float(v[-1]) for k, v in history.history.items()}
+    run = record_run(MODEL_NAME, MODEL_PATH, info.pop("watermark"), "finetune" if finetune else "full",
+                     parent_sha1, epochs=epochs, **info, **final)
+    print(f"✅ Manifest: {MODEL_NAME} v{run['version']} ({run['mode']}), watermark {run['watermark']}")
+
     plt.plot(history.history["loss"], label="train")
-    plt.plot(history.history["val_loss"], label="val")
+    if "val_loss" in history.history:
+        plt.plot(history.history["val_loss"], label="val")
     plt.legend()
-    plt.show()
+    show_or_save(PLOT_PATH, show)
+    return autoencoder
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the sensor autoencoder.")
+    parser.add_argument("--finetune", action="store_true",
+                        help="warm-start from the current model on data since the last watermark")
+    parser.add_argument("--epochs", type=int, default=None,
+                        help=f"epochs (default: 25, or {FINETUNE_EPOCHS} with --finetune)")
+    parser.add_argument("--replay-ratio", type=float, default=REPLAY_RATIO,
+                        help="older rows replayed per new row when fine-tuning")
+    parser.add_argument("--no-show", action="store_true", help="save the loss plot instead of showing it")
+    args = parser.parse_args()
+
+    main(args.finetune, args.epochs, args.replay_ratio, False if args.no_show else None)
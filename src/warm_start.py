@@ -0,0 +1,102 @@
+"""
+warm_start.py
+
+Bookkeeping for incremental (fine-tune) retraining of the autoencoder and
+the RUL LSTM.
+
+models/training_manifest.json keeps, per model, the training watermark (the
+newest timestamp the model has seen) and its lineage - one entry per
+training run, full or fine-tune, with the hashes of the parent and the
+resulting model file. A fine-tune loads the current model, trains a few
+epochs on the rows after the watermark plus a random replay sample of older
+rows (so it does not forget them), then moves the watermark forward.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_PATH = "models/training_manifest.json"
+FINETUNE_EPOCHS = 3
+FINETUNE_LR = 1e-4
+REPLAY_RATIO = 1.0          # replayed old samples per new sample
+NON_INTERACTIVE = {"agg", "pdf", "ps", "svg", "cairo", "template"}
+
+
+def file_sha1(path, block=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_watermark(name, path=MANIFEST_PATH):
+    """Newest timestamp model `name` was trained on, or None."""
+    wm = load_manifest(path).get(name, {}).get("watermark")
+    return pd.Timestamp(wm) if wm is not None else None
+
+
+def record_run(name, model_path, watermark, mode, parent_sha1=None, path=MANIFEST_PATH, **info):
+    """Append a training run to the model's lineage and move its watermark."""
+    manifest = load_manifest(path)
+    entry = manifest.setdefault(name, {"watermark": None, "lineage": []})
+    run = {
+        "version": len(entry["lineage"]) + 1,
+        "mode": mode,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "watermark": str(pd.Timestamp(watermark)) if watermark is not None else None,
+        "parent_sha1": parent_sha1,
+        "model_sha1": file_sha1(model_path),
+        **info,
+    }
+    entry["lineage"].append(run)
+    entry["watermark"] = run["watermark"]
+    entry["model_path"] = model_path
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return run
+
+
+def replay_sample(n_old, n_new, ratio=REPLAY_RATIO, seed=0):
+    """Sorted random indices into the n_old older samples to replay."""
+    k = min(n_old, int(round(ratio * n_new)))
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_old, size=k, replace=False)) if k else np.empty(0, np.int64)
+
+
+def show_or_save(fig_path, show=None):
+    """
+    plt.show() on a desktop; when headless (no display, non-interactive
+    backend, or show=False) save the figure to fig_path instead of blocking.
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    if show is None:
+        no_display = sys.platform.startswith("linux") and not (
+            os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+        show = not no_display and matplotlib.get_backend().lower() not in NON_INTERACTIVE
+    if show:
+        plt.show()
+    else:
+        os.makedirs(os.path.dirname(fig_path) or ".", exist_ok=True)
+        plt.savefig(fig_path)
+        plt.close()
+        print("📁 Plot saved to:", fig_path)